@@ -0,0 +1,161 @@
+# analysis.py
+"""
+Annotates the games of a PGN file with engine evaluations. Games are read one at a time, searched on a process
+pool, and written out in their original order as they finish. Only a fixed number of games are handed to the pool
+at once (Pool.imap would read the whole file ahead), so memory stays bounded however big the file is.
+
+Each move gets a comment with the evaluation after it, in the [%eval] form GUIs display (pawns from white's point
+of view, or #n for mate in n), and the engine's choice when it differs from the move played:
+
+    1. e4 {[%eval 0.35]} 1... e5 {[%eval 0.30]} 2. Qh5 {[%eval -0.20] best: Nf3}
+"""
+from opponent import Opponent, MATE_SCORE, MATE_BOUND
+from notation import toSAN
+from pgn import readGames, writeGame, replay, startPosition
+from collections import deque
+from multiprocessing import Pool
+import argparse
+import os
+import sys
+import time
+
+ANNOTATOR = "ChessMKIII"
+
+
+def formatEval(score, whiteToMove):
+    """
+    :param score: int (search score, from the side to move's point of view)
+    :param whiteToMove: bool (side to move in the position searched)
+    :return: str (white-relative evaluation, "0.35" in pawns or "#3" / "#-3" for mate in moves)
+    """
+    if (not whiteToMove):
+        score = -score
+    if (abs(score) >= MATE_BOUND):
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        return f"#{moves if (score > 0) else -moves}"
+    return f"{score / 100:.2f}"
+
+
+def searchPosition(opponent, legalMoves):
+    """
+    :param opponent: Opponent (searcher, on the position to search)
+    :param legalMoves: arr (legal moves in the position)
+    :return: tuple (best move, score from the side to move's point of view, nodes searched)
+    """
+    move = opponent.search(legalMoves)
+    return move, opponent.info[-1]["score"] if (opponent.info) else 0, opponent.nodes
+
+
+def analyseGame(job):
+    """
+    Searches every position of a game and comments its moves, runs in the pool's worker processes
+    :param job: tuple (game number, game dict, Opponent keyword arguments)
+    :return: tuple (game number, annotated game dict, stats dict, error message or None if the game was read)
+    """
+    number, game, options = job
+    start = time.perf_counter()
+    nodes = 0
+    comments = list(game["comments"])
+
+    try:
+        # Set up inside the try, a bad FEN tag is this game's error rather than one that stops the whole file
+        engine = startPosition(game)
+        opponent = Opponent(engine, **options)
+        opponent.onInfo = lambda info: None
+        previous = None  # (ply, move played, engine's move in SAN) of the last move, waiting for the eval after it
+        for ply, move, legalMoves in replay(game, engine):
+            best, score, searched = searchPosition(opponent, legalMoves)
+            nodes += searched
+            if (previous):
+                annotate(comments, previous, formatEval(score, engine.whiteToMove))
+            previous = (ply, move, toSAN(engine, best, legalMoves) if (best != move) else None)
+
+        if (previous):
+            legalMoves = engine.findLegalMoves()
+            finalEval = None  # No evaluation once the game is over
+            if (legalMoves):
+                best, score, searched = searchPosition(opponent, legalMoves)
+                nodes += searched
+                finalEval = formatEval(score, engine.whiteToMove)
+            annotate(comments, previous, finalEval)
+        error = None
+    except ValueError as exception:
+        error = str(exception)
+
+    annotated = dict(game, headers=dict(game["headers"], Annotator=ANNOTATOR), comments=comments)
+    stats = {"plies": len(game["moves"]), "nodes": nodes, "time": time.perf_counter() - start}
+    return number, annotated, stats, error
+
+
+def annotate(comments, previous, evalText):
+    """
+    Adds the evaluation and the engine's choice to a move's comment, after any comment it already had
+    :param comments: arr (comments of the game's moves)
+    :param previous: tuple (ply, move played, engine's move in SAN or None if it agreed)
+    :param evalText: str (evaluation after the move, from formatEval, None to leave it out)
+    :return: None
+    """
+    ply, move, best = previous
+    parts = [comments[ply]] if (comments[ply]) else []
+    if (evalText is not None):
+        parts.append(f"[%eval {evalText}]")
+    if (best):
+        parts.append(f"best: {best}")
+    comments[ply] = " ".join(parts) or None
+
+
+def analyseFile(inputPath, outputPath, options, processes=None, inFlight=None):
+    """
+    Annotates every game of a PGN file, writing each one out (in order) once it and the games before it are done
+    :param inputPath: str (PGN file to read)
+    :param outputPath: str (PGN file to write)
+    :param options: dict (Opponent keyword arguments for the searches)
+    :param processes: int (pool size, None for one per CPU)
+    :param inFlight: int (most games given to the pool at once, None for twice the pool size)
+    :return: dict (games, games that couldn't be read, plies, nodes and seconds)
+    """
+    inFlight = inFlight or 2 * (processes or os.cpu_count() or 1)
+    totals = {"games": 0, "errors": 0, "plies": 0, "nodes": 0, "time": 0.0}
+    start = time.perf_counter()
+
+    with Pool(processes) as pool, open(outputPath, "w", encoding="utf-8") as output:
+        def finish(result):
+            number, game, stats, error = result
+            writeGame(output, game)
+            output.flush()
+            totals["games"] += 1
+            totals["plies"] += stats["plies"]
+            totals["nodes"] += stats["nodes"]
+            if (error):
+                totals["errors"] += 1
+                print(f"game {number}: {error}", file=sys.stderr)
+            print(f"game {number}: {stats['plies']} plies, {stats['nodes']} nodes, {stats['time']:.1f}s")
+
+        pending = deque()
+        for number, game in enumerate(readGames(inputPath), 1):
+            pending.append(pool.apply_async(analyseGame, ((number, game, options),)))
+            if (len(pending) >= inFlight):
+                finish(pending.popleft().get())
+        while pending:
+            finish(pending.popleft().get())
+
+    totals["time"] = time.perf_counter() - start
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Annotate the games of a PGN file with engine evaluations")
+    parser.add_argument("input", help="PGN file to analyse")
+    parser.add_argument("output", help="PGN file the annotated games are written to")
+    parser.add_argument("--time", type=float, default=0.2, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes per position")
+    parser.add_argument("--depth", type=int, default=64, help="maximum depth")
+    parser.add_argument("--hash", type=int, default=16, help="hash table size in megabytes for each process")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--in-flight", type=int, default=None, help="most games held in memory at once")
+    args = parser.parse_args()
+
+    options = {"timeLimit": args.time, "nodeLimit": args.nodes, "maxDepth": args.depth, "hashSizeMb": args.hash}
+    totals = analyseFile(args.input, args.output, options, args.processes, args.in_flight)
+    print(f"{totals['games']} games ({totals['errors']} unreadable), {totals['plies']} plies, "
+          f"{totals['nodes']} nodes in {totals['time']:.1f}s")
@@ -0,0 +1,214 @@
+# batcheval.py
+"""
+Evaluates large batches of positions at once with NumPy, for analysis and tuning jobs. Positions are turned into a
+one-hot tensor of 12 piece planes of 64 squares each (uint8, (N, 12, 64) or flattened to (N, 768)), the same
+encoding a tuner or network would train on, and the tapered material and piece-square score of evaluation.py is
+computed for the whole batch with matrix products. Scores match evaluation.pieceSquareScore exactly, the pawn
+structure terms of pawns.py are left out.
+
+NumPy is only needed for this module, the engine itself doesn't use it.
+"""
+from bitboard import EMPTY, PIECES_FROM_FEN
+from engine import Engine, START_FEN
+from evaluation import MG_SCORES, EG_SCORES, PHASES, MAX_PHASE
+import evaluation
+import argparse
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, reported when the module is used
+    np = None
+
+# Rewrites a FEN piece placement with one character per square, "." for empty, a valid one is 8 ranks of 8 split by "/"
+EXPAND_PLACEMENT = str.maketrans({str(count): "." * count for count in range(1, 9)})
+RANK_BREAKS = "/" * 7
+
+
+def requireNumpy():
+    """
+    :return: None (raises ImportError if NumPy isn't installed)
+    """
+    if (np is None):
+        raise ImportError("batcheval needs NumPy, install it with: pip install numpy")
+
+
+def fenCodes(fenStrings):
+    """
+    Reads the piece placements of many FENs at once, using the same piece mapping as boardFromFEN but without
+    setting up an Engine for each. The placements are expanded to one character per square, checked to be 8 ranks
+    of 8, joined, and mapped to piece codes in a single table lookup. Raises ValueError naming the first bad FEN.
+    :param fenStrings: arr (FEN or EPD lines)
+    :return: tuple (uint8 array (N, 64) of piece codes, bool array (N,) True where white is to move)
+    """
+    lookup = np.full(256, 255, dtype=np.uint8)  # 255 marks characters that aren't pieces
+    for char, code in PIECES_FROM_FEN.items():
+        lookup[ord(char)] = code
+    lookup[ord(".")] = EMPTY
+
+    fields = [fenString.split(None, 2) for fenString in fenStrings]
+    squares = [field[0].translate(EXPAND_PLACEMENT) if (field) else "" for field in fields]
+    # Each placement on its own, a short rank or FEN could otherwise be made up for by a long one elsewhere
+    for index, placement in enumerate(squares):
+        if (len(placement) != 71 or placement[8::9] != RANK_BREAKS):
+            raise ValueError(f"Bad piece placement in FEN: {fenStrings[index]!r}")
+    text = "".join(squares).replace("/", "").encode("ascii", "replace")
+    codes = lookup[np.frombuffer(text, dtype=np.uint8)].reshape(len(fenStrings), 64)
+    if ((codes == 255).any()):
+        bad = int(np.nonzero((codes == 255).any(axis=1))[0][0])
+        raise ValueError(f"Bad piece placement in FEN: {fenStrings[bad]!r}")
+    whiteToMove = np.array([len(field) > 1 and field[1] == "w" for field in fields], dtype=bool)
+    return codes, whiteToMove
+
+
+def toCodes(positions):
+    """
+    :param positions: arr (Engines and/or FEN strings)
+    :return: tuple (uint8 array (N, 64) of piece codes, bool array (N,) True where white is to move)
+    """
+    requireNumpy()
+    codes = np.empty((len(positions), 64), dtype=np.uint8)
+    whiteToMove = np.empty(len(positions), dtype=bool)
+    fenIndices = []
+    for index, position in enumerate(positions):
+        if (isinstance(position, Engine)):
+            codes[index] = position.mailbox
+            whiteToMove[index] = position.whiteToMove
+        else:
+            fenIndices.append(index)
+    if (fenIndices):
+        codes[fenIndices], whiteToMove[fenIndices] = fenCodes([positions[index] for index in fenIndices])
+    return codes, whiteToMove
+
+
+def toTensor(positions, flat=False):
+    """
+    One-hot encodes positions, plane p of position n has a 1 on every square holding piece code p
+    :param positions: arr (Engines and/or FEN strings)
+    :param flat: bool (True for shape (N, 768) rather than (N, 12, 64))
+    :return: tuple (uint8 tensor, bool array (N,) True where white is to move)
+    """
+    codes, whiteToMove = toCodes(positions)
+    planes = (codes[:, None, :] == np.arange(12, dtype=np.uint8)[None, :, None]).view(np.uint8)
+    if (flat):
+        planes = planes.reshape(len(positions), 768)
+    return planes, whiteToMove
+
+
+def weights():
+    """
+    Evaluation tables as a matrix, so a flattened tensor times it gives every position's running totals
+    :return: int32 array (768, 3) of middlegame score, endgame score and phase weight for each piece and square
+    """
+    requireNumpy()
+    matrix = np.empty((12, 64, 3), dtype=np.int32)
+    matrix[:, :, 0] = MG_SCORES[:12]
+    matrix[:, :, 1] = EG_SCORES[:12]
+    matrix[:, :, 2] = np.array(PHASES[:12])[:, None]
+    return matrix.reshape(768, 3)
+
+
+def evaluateTensor(planes, whiteToMove):
+    """
+    :param planes: uint8 array (N, 12, 64) or (N, 768) from toTensor
+    :param whiteToMove: bool array (N,)
+    :return: int32 array (N,) of scores in centipawns, from the point of view of the player to move
+    """
+    # float32 products go through BLAS and are exact here, every total is far below 2 ** 24
+    totals = (planes.reshape(len(planes), 768).astype(np.float32) @ weights().astype(np.float32)).astype(np.int32)
+    mgScore, egScore, phase = totals[:, 0], totals[:, 1], np.minimum(totals[:, 2], MAX_PHASE)
+    score = (mgScore * phase + egScore * (MAX_PHASE - phase)) // MAX_PHASE
+    return np.where(whiteToMove, score, -score)
+
+
+def evaluateBatch(positions):
+    """
+    :param positions: arr (Engines and/or FEN strings)
+    :return: int32 array (N,) of scores in centipawns, from the point of view of the player to move
+    """
+    return evaluateTensor(*toTensor(positions))
+
+
+# --- Benchmark --- #
+def randomPositions(count, seed=0, maxPlies=80):
+    """
+    Plays random games from the start position and picks a position from each
+    :param count: int (number of positions)
+    :param seed: int (random seed)
+    :param maxPlies: int (longest game played)
+    :return: arr (list of FEN strings)
+    """
+    generator = random.Random(seed)
+    engine = Engine()
+    positions = []
+    while (len(positions) < count):
+        engine.loadFEN(START_FEN)
+        for ply in range(generator.randint(0, maxPlies)):
+            legalMoves = engine.findLegalMoves()
+            if (not legalMoves):
+                break
+            engine.makeMove(generator.choice(legalMoves))
+        positions.append(engine.toFEN())
+    return positions
+
+
+def scalarEvaluate(positions):
+    """
+    Evaluates one position at a time with the engine's piece-square evaluator, the baseline the batch path is measured
+    against
+    :param positions: arr (FEN strings)
+    :return: arr (list of scores)
+    """
+    engine = Engine()
+    scores = []
+    for fenString in positions:
+        engine.loadFEN(fenString)
+        scores.append(evaluation.pieceSquareScore(engine))
+    return scores
+
+
+def benchmark(count, seed=0):
+    """
+    Times the scalar and batch evaluators on the same positions and checks they agree
+    :param count: int (number of positions)
+    :param seed: int (random seed for the positions)
+    :return: dict (seconds and positions per second for each path, and the tensor conversion on its own)
+    """
+    positions = randomPositions(count, seed)
+
+    start = time.perf_counter()
+    expected = scalarEvaluate(positions)
+    scalarTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    planes, whiteToMove = toTensor(positions)
+    convertTime = time.perf_counter() - start
+    scores = evaluateTensor(planes, whiteToMove)
+    batchTime = time.perf_counter() - start
+
+    if (scores.tolist() != expected):
+        raise AssertionError("Batch and scalar evaluations disagree")
+    return {
+        "positions": count,
+        "scalarTime": scalarTime,
+        "scalarRate": int(count / scalarTime),
+        "batchTime": batchTime,
+        "batchRate": int(count / batchTime),
+        "convertTime": convertTime,
+        "speedup": scalarTime / batchTime
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark batch evaluation against the scalar evaluator")
+    parser.add_argument("--positions", type=int, default=100000, help="number of random positions")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    requireNumpy()
+    print(f"generating {args.positions} positions...")
+    results = benchmark(args.positions, args.seed)
+    print(f"scalar  {results['scalarTime']:.3f}s  {results['scalarRate']} positions/s")
+    print(f"batch   {results['batchTime']:.3f}s  {results['batchRate']} positions/s  "
+          f"(encoding {results['convertTime']:.3f}s)  speedup {results['speedup']:.1f}x")
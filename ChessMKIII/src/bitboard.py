@@ -0,0 +1,178 @@
+# bitboard.py
+"""
+Bitboard helpers for the engine's position representation
+
+Squares are numbered the same way as Engine.virtualBoard is indexed: square = rank * 8 + file, with rank 0 being
+black's back rank. So a8 is square 0, h8 is square 7 and h1 is square 63. Bit n of a bitboard is set when square n
+is in the set.
+"""
+
+# --- Piece Codes --- #
+# Index into Engine.pieceBitboards, colour = piece // 6, type = piece % 6
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+EMPTY = 12
+
+PIECE_NAMES = (
+    "pawn_white", "knight_white", "bishop_white", "rook_white", "queen_white", "King_white",
+    "pawn_black", "knight_black", "bishop_black", "rook_black", "queen_black", "King_black",
+    "0"
+)
+PIECE_CODES = {name: code for code, name in enumerate(PIECE_NAMES)}
+
+PIECES_FROM_FEN = {
+    "P": PAWN, "N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING,
+    "p": PAWN + 6, "n": KNIGHT + 6, "b": BISHOP + 6, "r": ROOK + 6, "q": QUEEN + 6, "k": KING + 6
+}
+FEN_FROM_PIECES = {code: char for char, code in PIECES_FROM_FEN.items()}
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+
+def lsb(bitboard):
+    """
+    Index of the lowest set bit
+    :param bitboard: int (non-zero bitboard)
+    :return: int (square index)
+    """
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def msb(bitboard):
+    """
+    Index of the highest set bit
+    :param bitboard: int (non-zero bitboard)
+    :return: int (square index)
+    """
+    return bitboard.bit_length() - 1
+
+
+def squares(bitboard):
+    """
+    Lists the squares in a bitboard, lowest first
+    :param bitboard: int
+    :return: arr (list of square indices)
+    """
+    result = []
+    while bitboard:
+        bit = bitboard & -bitboard
+        result.append(bit.bit_length() - 1)
+        bitboard ^= bit
+    return result
+
+
+# --- Precomputed Attack Tables --- #
+def leaperAttacks(offsets):
+    """
+    Builds an attack table for a piece that jumps by fixed (rank, file) offsets
+    :param offsets: arr (list of (rank, file) offsets)
+    :return: arr (64 bitboards, indexed by square)
+    """
+    table = []
+    for square in range(64):
+        rank, file = divmod(square, 8)
+        attacks = 0
+        for rankOffset, fileOffset in offsets:
+            endRank = rank + rankOffset
+            endFile = file + fileOffset
+            if (0 <= endRank < 8 and 0 <= endFile < 8):
+                attacks |= 1 << (endRank * 8 + endFile)
+        table.append(attacks)
+    return table
+
+
+KNIGHT_ATTACKS = leaperAttacks([(2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1)])
+KING_ATTACKS = leaperAttacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+
+# Squares a pawn standing on a square attacks, white pawns move towards rank 0
+PAWN_ATTACKS = (
+    leaperAttacks([(-1, -1), (-1, 1)]),
+    leaperAttacks([(1, -1), (1, 1)])
+)
+
+
+def rayTable(rankStep, fileStep):
+    """
+    Builds the table of rays leaving each square in one direction, up to the edge of the board
+    :param rankStep, fileStep: int (direction of the ray)
+    :return: arr (64 bitboards, indexed by square)
+    """
+    table = []
+    for square in range(64):
+        rank, file = divmod(square, 8)
+        ray = 0
+        for i in range(1, 8):
+            endRank = rank + rankStep * i
+            endFile = file + fileStep * i
+            if (not (0 <= endRank < 8 and 0 <= endFile < 8)):
+                break
+            ray |= 1 << (endRank * 8 + endFile)
+        table.append(ray)
+    return table
+
+
+# (ray table, True if the ray runs towards higher square indices)
+ORTHOGONAL_RAYS = [
+    (rayTable(-1, 0), False),  # Up
+    (rayTable(1, 0), True),  # Down
+    (rayTable(0, -1), False),  # Left
+    (rayTable(0, 1), True)  # Right
+]
+DIAGONAL_RAYS = [
+    (rayTable(-1, 1), False),  # Up and Right
+    (rayTable(1, 1), True),  # Down and Right
+    (rayTable(1, -1), True),  # Down and Left
+    (rayTable(-1, -1), False)  # Up and Left
+]
+
+
+def slidingAttacks(square, occupied, rays):
+    """
+    Squares a sliding piece attacks, each ray stops at (and includes) the first occupied square
+    :param square: int (square of the sliding piece)
+    :param occupied: int (bitboard of all pieces)
+    :param rays: arr (ORTHOGONAL_RAYS and/or DIAGONAL_RAYS)
+    :return attacks: int (bitboard)
+    """
+    attacks = 0
+    for table, increasing in rays:
+        ray = table[square]
+        blockers = ray & occupied
+        if (blockers):
+            if (increasing):
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def bishopAttacks(square, occupied):
+    """
+    Squares a bishop on the square attacks
+    :param square: int (square of the bishop)
+    :param occupied: int (bitboard of all pieces)
+    :return: int (bitboard)
+    """
+    return slidingAttacks(square, occupied, DIAGONAL_RAYS)
+
+
+def rookAttacks(square, occupied):
+    """
+    Squares a rook on the square attacks
+    :param square: int (square of the rook)
+    :param occupied: int (bitboard of all pieces)
+    :return: int (bitboard)
+    """
+    return slidingAttacks(square, occupied, ORTHOGONAL_RAYS)
+
+
+def queenAttacks(square, occupied):
+    """
+    Squares a queen on the square attacks, a rook and a bishop combined
+    :param square: int (square of the queen)
+    :param occupied: int (bitboard of all pieces)
+    :return: int (bitboard)
+    """
+    return slidingAttacks(square, occupied, DIAGONAL_RAYS) | slidingAttacks(square, occupied, ORTHOGONAL_RAYS)
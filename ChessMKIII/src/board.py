@@ -1,6 +1,31 @@
 # board.py
 import pygame
 
+PIECE_IMAGES = ["pawn_white", "rook_white", "knight_white", "bishop_white", "queen_white", "King_white",
+                "pawn_black", "rook_black", "knight_black", "bishop_black", "queen_black", "King_black"]
+IMAGE_PATH = "ChessMKIII/src/assets/ChessPieces/"
+
+# Decoded and scaled piece images, keyed by square size so every board of the same size shares them
+_atlasCache = {}
+
+
+def loadAtlas(squareSize):
+    """
+    Loads the piece images scaled to the square size, the first call for each size reads the PNGs and later calls
+    return the cached surfaces
+    :param squareSize: int (width and height of a square in pixels)
+    :return: dict (piece name: pygame Surface)
+    """
+    if (squareSize not in _atlasCache):
+        atlas = {}
+        for piece in PIECE_IMAGES:
+            image = pygame.image.load(IMAGE_PATH + piece + ".png")
+            if (pygame.display.get_surface()):  # Converting needs a display mode, it makes blitting much faster
+                image = image.convert_alpha()
+            atlas[piece] = pygame.transform.scale(image, (squareSize, squareSize))
+        _atlasCache[squareSize] = atlas
+    return _atlasCache[squareSize]
+
 
 # --- Colour Class --- #
 class Colour:
@@ -31,6 +56,10 @@ class Colour:
 
 # --- Board Class --- #
 class Board:
+    """
+    Draws the board with dirty rectangles: only squares whose piece changed, and the squares under last frame's
+    overlays (held piece, highlights), are redrawn and pushed to the display
+    """
     def __init__(self, screen):
         # Board Dimensions
         self.dimension = 8
@@ -47,55 +76,122 @@ class Board:
 
         # Images
         self.images = {}
+        self.background = pygame.Surface((self.w, self.h))
+        self.createBoard()
+
+        # --- Dirty Rectangles --- #
+        self.drawnBoard = None  # Pieces on the screen, as last drawn
+        self.overlays = []  # Rects drawn over the board last frame, cleaned up at the start of the next
+        self.dirty = []  # Rects changed this frame
 
     def createBoard(self):
         """
-        Creates and Draws the 64 squares
+        Draws the 64 squares onto the background surface, once
         :return: None
         """
         for rank in range(self.dimension):
             for file in range(self.dimension):
                 squareColours = self.boardColours[((rank + file) % 2)]
 
-                pygame.draw.rect(self.screen, squareColours, (rank * self.squareSize, file * self.squareSize,
-                                                              self.squareSize, self.squareSize))
+                pygame.draw.rect(self.background, squareColours, (file * self.squareSize, rank * self.squareSize,
+                                                                  self.squareSize, self.squareSize))
 
     def loadImages(self):
         """
-        Loads images for the chess pieces
+        Loads images for the chess pieces, from the shared atlas
         :return: None
         """
-        pieces = ["pawn_white", "rook_white", "knight_white", "bishop_white", "queen_white", "King_white",
-                  "pawn_black", "rook_black", "knight_black", "bishop_black", "queen_black", "King_black"]
-        for piece in pieces:
-            self.images[piece] = pygame.transform.scale(pygame.image.load("ChessMKIII/src/assets/ChessPieces/" + piece + ".png"),
-                                                        (self.squareSize, self.squareSize))
+        self.images = loadAtlas(self.squareSize)
+
+    def squareRect(self, rank, file):
+        """
+        Screen area of a square
+        :param rank, file: int (square on the board)
+        :return: pygame Rect
+        """
+        return pygame.Rect(file * self.squareSize, rank * self.squareSize, self.squareSize, self.squareSize)
+
+    def drawSquare(self, rank, file, piece):
+        """
+        Redraws one square from the background and the piece on it
+        :param rank, file: int (square on the board)
+        :param piece: str (piece name, "0" for an empty square)
+        :return: pygame Rect (area drawn)
+        """
+        rect = self.squareRect(rank, file)
+        self.screen.blit(self.background, rect, rect)
+        if (piece != "0"):
+            self.screen.blit(self.images[piece], rect)
+        return rect
 
     def drawPieces(self, virtual_board):
         """
-        Draws each piece on the board, according to the board representation's virtual board
+        Draws the whole board and each piece on it, according to the board representation's virtual board
         :param virtual_board: arr (2D array representing the current board state)
         :return: None
         """
+        self.screen.blit(self.background, (0, 0))
         for rank in range(self.dimension):
             for file in range(self.dimension):
-                piece = virtual_board[file][rank]
+                piece = virtual_board[rank][file]
                 if (piece != "0"):
-                    self.screen.blit(self.images[piece], pygame.Rect(rank * self.squareSize, file * self.squareSize,
-                                                                     self.squareSize, self.squareSize))
+                    self.screen.blit(self.images[piece], self.squareRect(rank, file))
 
     def drawGame(self, virtual_board):
         """
-        Main function for drawing chess game, calls above helper functions
+        Main function for drawing chess game, brings the screen up to date with the virtual board. Overlays are then
+        drawn on top with addOverlay, and present pushes the changes to the display.
         :param virtual_board: arr (2D array representing the current board state)
         :return: None
         """
-        self.loadImages()
-        self.createBoard()
-        self.drawPieces(virtual_board)
-        pieces = ["pawn_white", "rook_white", "knight_white", "bishop_white", "queen_white", "King_white",
-                  "pawn_black", "rook_black", "knight_black", "bishop_black", "queen_black", "King_black"]
-        for piece in pieces:
-            self.images[piece] = pygame.transform.scale(
-                pygame.image.load("ChessMKIII/src/assets/ChessPieces/" + piece + ".png"),
-                (self.squareSize, self.squareSize))
+        if (not self.images):
+            self.loadImages()
+
+        if (self.drawnBoard is None):
+            self.drawPieces(virtual_board)
+            self.dirty.append(self.screen.get_rect())
+        else:
+            # Squares under last frame's overlays, and squares whose piece has changed
+            redraw = set()
+            for rect in self.overlays:
+                rect = rect.clip(self.screen.get_rect())
+                for rank in range(rect.top // self.squareSize, (rect.bottom - 1) // self.squareSize + 1):
+                    for file in range(rect.left // self.squareSize, (rect.right - 1) // self.squareSize + 1):
+                        redraw.add((rank, file))
+            for rank in range(self.dimension):
+                for file in range(self.dimension):
+                    if (virtual_board[rank][file] != self.drawnBoard[rank][file]):
+                        redraw.add((rank, file))
+
+            for rank, file in redraw:
+                if (0 <= rank < self.dimension and 0 <= file < self.dimension):
+                    self.dirty.append(self.drawSquare(rank, file, virtual_board[rank][file]))
+
+        self.drawnBoard = [list(row) for row in virtual_board]
+        self.overlays = []
+
+    def addOverlay(self, rect):
+        """
+        Records an area drawn over the board this frame, so it is pushed now and cleaned up next frame
+        :param rect: pygame Rect (area drawn)
+        :return: None
+        """
+        rect = pygame.Rect(rect)
+        self.overlays.append(rect)
+        self.dirty.append(rect)
+
+    def present(self):
+        """
+        Pushes this frame's changed areas to the display, nothing is pushed if nothing changed
+        :return: None
+        """
+        if (self.dirty):
+            pygame.display.update(self.dirty)
+            self.dirty = []
+
+    def invalidate(self):
+        """
+        Forces the next drawGame to redraw the whole board, e.g. after the window has been covered
+        :return: None
+        """
+        self.drawnBoard = None
@@ -0,0 +1,71 @@
+# coldstart.py
+"""
+Measures what importing the engine costs a fresh process, for batch jobs that start many short lived workers.
+Each module is imported in a new interpreter, timed from inside it (so interpreter start up isn't counted), and
+checked for pulling in pygame.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must import without a display, and their import time budget in milliseconds
+HEADLESS_MODULES = {
+    "engine": 15,
+    "opponent": 25,
+    "perft": 15,
+    "worker": 40,
+    "uci": 40,
+}
+
+PROBE = "import sys, time\nstart = time.perf_counter()\n{imports}\n" \
+        "print((time.perf_counter() - start) * 1000, 'pygame' in sys.modules)"
+
+
+def timeImport(module, runs=10):
+    """
+    Imports a module in fresh interpreters
+    :param module: str (module name)
+    :param runs: int (number of interpreters to start)
+    :return: tuple (median import time in milliseconds, True if pygame was imported along the way)
+    """
+    code = PROBE.format(imports=f"import {module}")
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    loadedPygame = False
+    for i in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        elapsed, pygameLoaded = output.stdout.split()
+        times.append(float(elapsed))
+        loadedPygame = loadedPygame or pygameLoaded == "True"
+    return statistics.median(times), loadedPygame
+
+
+def checkColdStart(runs=10, budgets=None):
+    """
+    Times every headless module against its budget and prints the results
+    :param runs: int (interpreters to start per module)
+    :param budgets: dict (module name: budget in milliseconds, defaults to HEADLESS_MODULES)
+    :return: bool (True if every module was within budget and none imported pygame)
+    """
+    budgets = budgets or HEADLESS_MODULES
+    passed = True
+    for module, budget in budgets.items():
+        elapsed, loadedPygame = timeImport(module, runs)
+        status = "ok"
+        if (loadedPygame):
+            status = "FAIL (imports pygame)"
+        elif (elapsed > budget):
+            status = f"FAIL (budget {budget} ms)"
+        passed = passed and status == "ok"
+        print(f"import {module:<10} {elapsed:7.2f} ms  {status}")
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold start import time check for headless use")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per module (median is reported)")
+    args = parser.parse_args()
+
+    sys.exit(0 if checkColdStart(args.runs) else 1)
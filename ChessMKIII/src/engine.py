@@ -1,17 +1,54 @@
 # engine.py
+from bitboard import (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, EMPTY, FULL, PIECE_NAMES, PIECE_CODES,
+                      PIECES_FROM_FEN, FEN_FROM_PIECES, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ORTHOGONAL_RAYS, DIAGONAL_RAYS, lsb,
+                      squares, bishopAttacks, rookAttacks)
+from zobrist import PIECE_KEYS, PAWN_KEYS, CASTLING_KEYS, EN_PASSANT_KEYS, SIDE_KEY
+from evaluation import MG_SCORES, EG_SCORES, PHASES
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# --- Castling Rights --- #
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+
+# Castling rights that survive a move from or to each square, a king or rook leaving home (or a rook being
+# captured there) clears its rights
+CASTLING_MASKS = [15] * 64
+CASTLING_MASKS[0] = 15 ^ BLACK_QUEENSIDE
+CASTLING_MASKS[4] = 15 ^ (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASKS[7] = 15 ^ BLACK_KINGSIDE
+CASTLING_MASKS[56] = 15 ^ WHITE_QUEENSIDE
+CASTLING_MASKS[60] = 15 ^ (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[63] = 15 ^ WHITE_KINGSIDE
+
+
 class Engine:
     """
-    TODO: Castling
     TODO: Checkmate
-    TODO: En Passant
+
+    The position is stored as bitboards, one 64-bit integer per piece type and colour (see bitboard.py for the
+    square numbering), plus a mailbox of piece codes for looking up what stands on a square. virtualBoard is only
+    a view of this, derived on demand for drawing.
 
     Saved FEN positions
     - start position: rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1
     - endgame: 8/8/8/8/5R2/2pk4/5K2/8 b - - 0 1
     """
-    def __init__(self):
+    def __init__(self, fenString=None):
         # --- Board Representation --- #
-        self.fenString = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        self.fenString = START_FEN  # Position the game started from, moveLog holds the moves since
+        if (fenString):
+            self.fenString = fenString
+
+        self.pieceBitboards = [0] * 12  # Indexed by piece code
+        self.colourBitboards = [0, 0]  # White pieces, black pieces
+        self.occupied = 0
+        self.mailbox = [EMPTY] * 64  # Piece code on each square
+        self.hash = 0  # Zobrist key of the position, see zobrist.py
+        self.pawnHash = 0  # Zobrist key of the pawns alone, for the pawn hash table in pawns.py
+        self.mgScore = 0  # White-relative evaluation totals and game phase, see evaluation.py
+        self.egScore = 0
+        self.phase = 0
+        self._virtualBoard = None  # Cached view, rebuilt after the position changes
 
         # --- Turns --- #
         self.whiteToMove = True
@@ -24,109 +61,223 @@ class Engine:
         self.whiteKingCoords = (7, 4)
         self.blackKingCoords = (0, 4)
 
-        self.whiteCastling = {"kingside": False, "queenside": False}
-        self.blackCastling = {"kingside": False, "queenside": False}
+        self.castlingRights = 0  # WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
 
-        # --- Google En Passant --- #
-        self.enPassantPossibleWhite = False
-        self.enPassantPossibleBlack = False
+        # --- En Passant --- #
+        self.enPassantSquare = None  # Square a pawn skipped over with a two square advance last move
 
         # --- Game Conditions --- #
+        self.halfmoveClock = 0  # Plies since the last capture or pawn move
+        self.fullmoveNumber = 1  # Starts at 1, goes up after each black move
         self.isMate = False
         self.isStalemate = False
 
+        # --- Move Tracker --- #
+        self.moveLog = []
+        self.undoStack = []  # State before each move in moveLog that the move itself can't restore
+
         # --- Set Up Board --- #
-        self.virtualBoard = self.boardFromFEN()
+        self.boardFromFEN()
 
-        # --- Move Tracker --- #
+    def loadFEN(self, fenString):
+        """
+        Sets up a new position, forgetting the current game entirely. EPD lines are accepted too, anything after the
+        four position fields that isn't a pair of move counters (e.g. EPD operations) is ignored.
+        :param fenString: str (FEN or EPD line)
+        :return: None
+        """
+        self.fenString = fenString.strip()
         self.moveLog = []
+        self.undoStack = []
+        self.isMate = False
+        self.isStalemate = False
+        self.boardFromFEN()
+
+    @property
+    def virtualBoard(self):
+        """
+        2D array view of the position ("0" for empty squares, otherwise names like "knight_white"), built from the
+        mailbox the first time it is asked for after a move
+        :return: arr (8x8 list of piece names, indexed [rank][file])
+        """
+        if (self._virtualBoard is None):
+            names = [PIECE_NAMES[piece] for piece in self.mailbox]
+            self._virtualBoard = [names[rank * 8:rank * 8 + 8] for rank in range(8)]
+        return self._virtualBoard
+
+    def putPiece(self, piece, square):
+        """
+        Places a piece on an empty square
+        :param piece: int (piece code)
+        :param square: int (square index)
+        :return: None
+        """
+        bit = 1 << square
+        self.pieceBitboards[piece] |= bit
+        self.colourBitboards[piece // 6] |= bit
+        self.occupied |= bit
+        self.mailbox[square] = piece
+        self.hash ^= PIECE_KEYS[piece][square]
+        self.pawnHash ^= PAWN_KEYS[piece][square]
+        self.mgScore += MG_SCORES[piece][square]
+        self.egScore += EG_SCORES[piece][square]
+        self.phase += PHASES[piece]
+
+    def removePiece(self, piece, square):
+        """
+        Lifts a piece off its square
+        :param piece: int (piece code)
+        :param square: int (square index)
+        :return: None
+        """
+        bit = 1 << square
+        self.pieceBitboards[piece] ^= bit
+        self.colourBitboards[piece // 6] ^= bit
+        self.occupied ^= bit
+        self.mailbox[square] = EMPTY
+        self.hash ^= PIECE_KEYS[piece][square]
+        self.pawnHash ^= PAWN_KEYS[piece][square]
+        self.mgScore -= MG_SCORES[piece][square]
+        self.egScore -= EG_SCORES[piece][square]
+        self.phase -= PHASES[piece]
 
     def makeMove(self, move):
         """
-        Makes a move on the board, updating the board state accordingly
+        Makes a move on the board, updating the board state accordingly. Everything the move can't restore by itself
+        is pushed onto the undo stack first, so takeback is constant time.
         :param move: Move (move object to make)
         :return: None
         """
-        if (move.startRank != move.endRank or move.startFile != move.endFile):
+        start = move.start
+        end = move.end
+        if (start != end):
+            piece = self.mailbox[start]
+
+            # En passant captures the pawn beside the moving pawn
+            captureSquare = (start & ~7) + (end & 7) if (move.enPassant) else end
+            captured = self.mailbox[captureSquare]
+
+            self.undoStack.append((captured, self.castlingRights, self.enPassantSquare, self.whiteKingCoords,
+                                   self.blackKingCoords, self.halfmoveClock, self.hash))
+
             # Basic Move Making
-            self.virtualBoard[move.startRank][move.startFile] = "0"
-            self.virtualBoard[move.endRank][move.endFile] = move.pieceMoved
+            if (captured != EMPTY):
+                self.removePiece(captured, captureSquare)
+            self.removePiece(piece, start)
+            if (move.promotionPiece is not None):
+                self.putPiece(piece - PAWN + move.promotionPiece, end)
+            else:
+                self.putPiece(piece, end)
             self.moveLog.append(move)
 
             # Handle castling
             if (move.isCastle):
-                if (move.endFile == 6):  # Kingside castling
-                    self.virtualBoard[move.endRank][5] = self.virtualBoard[move.endRank][7]
-                    self.virtualBoard[move.endRank][7] = "0"
+                if (end & 7 == 6):  # Kingside castling
+                    rookFrom, rookTo = end + 1, end - 1
                 else:  # Queenside castling
-                    self.virtualBoard[move.endRank][3] = self.virtualBoard[move.endRank][0]
-                    self.virtualBoard[move.endRank][0] = "0"
+                    rookFrom, rookTo = end - 2, end + 1
+                rook = self.mailbox[rookFrom]
+                self.removePiece(rook, rookFrom)
+                self.putPiece(rook, rookTo)
 
             # Switch Turns
             self.whiteToMove = not self.whiteToMove
-
-            # Pawn Promotion
-            if (move.pawnPromotion):
-                if (self.whiteToMove):
-                    self.virtualBoard[move.endRank][move.endFile] = "queen_black"
-                else:
-                    self.virtualBoard[move.endRank][move.endFile] = "queen_white"
+            self.hash ^= SIDE_KEY
+            if (self.whiteToMove):
+                self.fullmoveNumber += 1
 
             # En Passant
-            if (move.enPassant):
-                print("possible en passant")
+            if (self.enPassantSquare is not None):
+                self.hash ^= EN_PASSANT_KEYS[self.enPassantSquare & 7]
+            twoSquareAdvance = piece % 6 == PAWN and (end - start == 16 or start - end == 16)
+            self.enPassantSquare = (start + end) // 2 if (twoSquareAdvance) else None
+            if (self.enPassantSquare is not None):
+                self.hash ^= EN_PASSANT_KEYS[self.enPassantSquare & 7]
 
             # King Moves
-            self.updateKings(move)
+            if (piece == KING):
+                self.whiteKingCoords = (end >> 3, end & 7)
+            elif (piece == KING + 6):
+                self.blackKingCoords = (end >> 3, end & 7)
 
             # Update castling rights
-            self.updateCastlingRights(move)
+            castlingRights = self.castlingRights & CASTLING_MASKS[start] & CASTLING_MASKS[end]
+            if (castlingRights != self.castlingRights):
+                self.hash ^= CASTLING_KEYS[self.castlingRights] ^ CASTLING_KEYS[castlingRights]
+                self.castlingRights = castlingRights
+
+            # Fifty move rule
+            if (piece % 6 == PAWN or captured != EMPTY):
+                self.halfmoveClock = 0
+            else:
+                self.halfmoveClock += 1
 
+            self._virtualBoard = None
 
     def takeback(self):
         """
-        Takes back the previously taken move, and updates the board state accordingly, uses the move log to refer
-        to previous moves
+        Takes back the previously taken move, using the move log for the pieces that moved and the undo stack for
+        the rest of the state
         :return: None
         """
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
-            self.virtualBoard[move.startRank][move.startFile] = move.pieceMoved
-            self.virtualBoard[move.endRank][move.endFile] = move.pieceCaptured
-            self.whiteToMove = not self.whiteToMove
+            (captured, self.castlingRights, self.enPassantSquare, self.whiteKingCoords, self.blackKingCoords,
+             self.halfmoveClock, previousHash) = self.undoStack.pop()
+            start = move.start
+            end = move.end
+
+            # The piece on the end square may be a promoted pawn
+            self.removePiece(self.mailbox[end], end)
+            self.putPiece(move.pieceMoved, start)
+            if (captured != EMPTY):
+                self.putPiece(captured, (start & ~7) + (end & 7) if (move.enPassant) else end)
+
+            # Put the castled rook back
+            if (move.isCastle):
+                if (end & 7 == 6):  # Kingside castling
+                    rookFrom, rookTo = end + 1, end - 1
+                else:  # Queenside castling
+                    rookFrom, rookTo = end - 2, end + 1
+                rook = self.mailbox[rookTo]
+                self.removePiece(rook, rookTo)
+                self.putPiece(rook, rookFrom)
 
-            # Update King locations
-            self.updateKings(move)
+            self.whiteToMove = not self.whiteToMove
+            if (not self.whiteToMove):
+                self.fullmoveNumber -= 1
+            self.hash = previousHash
+            self._virtualBoard = None
         else:
             print("No moves to undo")
 
     def findPieceLegalMoves(self):
         """
-        Finds the moves that each piece can make according to the rules for each piece in isolation
+        Finds the moves that each piece can make according to the rules for each piece in isolation. Together with
+        generateMoves this is the slow reference for findLegalMoves.
         :return legalMoves: arr (list of moves the player could make)
         """
         legalMoves = []
 
-        for file in range(len(self.virtualBoard)):
-            for rank in range(len(self.virtualBoard[file])):
-                self.player = self.virtualBoard[rank][file][-1]
-
-                # White ends in an e, black in a k
-                if self.player == "e" and self.whiteToMove or self.player == "k" and not self.whiteToMove:
-                    pieceType = self.virtualBoard[rank][file][0]  # p-pawn, k-knight, b-bishop, r-rook, q-queen, K-king
-
-                    if pieceType == "p":
-                        self.getPawnMoves(rank, file, legalMoves)
-                    elif pieceType == "k":
-                        self.getKnightMoves(rank, file, legalMoves)
-                    elif pieceType == "b":
-                        self.getBishopMoves(rank, file, legalMoves)
-                    elif pieceType == "r":
-                        self.getRookMoves(rank, file, legalMoves)
-                    elif pieceType == "q":
-                        self.getQueenMoves(rank, file, legalMoves)
-                    elif pieceType == "K":
-                        self.getKingMoves(rank, file, legalMoves)
+        # White ends in an e, black in a k
+        self.player = "e" if self.whiteToMove else "k"
+        offset = 0 if self.whiteToMove else 6
+
+        pieceMoves = (
+            (PAWN, self.getPawnMoves),
+            (KNIGHT, self.getKnightMoves),
+            (BISHOP, self.getBishopMoves),
+            (ROOK, self.getRookMoves),
+            (QUEEN, self.getQueenMoves),
+            (KING, self.getKingMoves)
+        )
+        for pieceType, getMoves in pieceMoves:
+            bitboard = self.pieceBitboards[pieceType + offset]
+            while bitboard:
+                bit = bitboard & -bitboard
+                bitboard ^= bit
+                rank, file = divmod(bit.bit_length() - 1, 8)
+                getMoves(rank, file, legalMoves)
 
         return legalMoves
 
@@ -145,7 +296,7 @@ class Engine:
 
         for move in psuedoLegal:
             self.makeMove(move)
-            if (not self.inCheck()):
+            if (not self.kingInCheck(not self.whiteToMove)):  # The player who just moved
                 legal.append(move)
             self.takeback()
         
@@ -153,191 +304,307 @@ class Engine:
 
     def inCheck(self):
         """
-        Determines if the king is in check in the current position
+        Determines if the king of the player to move is in check in the current position
         :return: bool (True if king is in check, False otherwise)
         """
-        if self.whiteToMove:
-            return self.squareUnderAttack(self.blackKingCoords[0], self.blackKingCoords[1])
-        else:
-            return self.squareUnderAttack(self.whiteKingCoords[0], self.whiteKingCoords[1])
-    
+        return self.kingInCheck(self.whiteToMove)
+
+    def kingInCheck(self, white):
+        """
+        Determines if a particular player's king is attacked
+        :param white: bool (True for the white king, False for the black king)
+        :return: bool (True if king is in check, False otherwise)
+        """
+        rank, file = self.whiteKingCoords if white else self.blackKingCoords
+        return self.isSquareAttacked(rank * 8 + file, not white)
+
     def squareUnderAttack(self, rank, file):
         """
-        Determines if a particular square is under attack
+        Determines if a particular square is attacked by the opponent of the player to move
         :param rank: int (rank of the square)
         :param file: int (file of the square)
         :return: bool (True if square is under attack, False otherwise)
         """
-        self.whiteToMove = not self.whiteToMove  # Switch to opponent's turn
-        opponentMoves = self.findPieceLegalMoves()  # Find opponent's legal moves
-        self.whiteToMove = not self.whiteToMove  # Switch back to original player's turn
+        return self.isSquareAttacked(rank * 8 + file, not self.whiteToMove)
 
-        for move in opponentMoves:
-            if move.endRank == rank and move.endFile == file:
-                return True
+    def isSquareAttacked(self, square, byWhite, occupied=None):
+        """
+        Looks outwards from the square for an attacker, rather than generating the attacker's moves. A piece of
+        each type standing on the square attacks exactly the squares that piece type could attack it from.
+        :param square: int (square index, rank * 8 + file)
+        :param byWhite: bool (True to look for white attackers, False for black)
+        :param occupied: int (bitboard of blocking pieces, defaults to every piece on the board)
+        :return: bool (True if square is under attack, False otherwise)
+        """
+        pieces = self.pieceBitboards
+        offset = 0 if byWhite else 6
+        if (occupied is None):
+            occupied = self.occupied
+
+        # Pawns attack diagonally forwards, so look diagonally backwards from the square
+        if (PAWN_ATTACKS[BLACK if byWhite else WHITE][square] & pieces[PAWN + offset]):
+            return True
+        if (KNIGHT_ATTACKS[square] & pieces[KNIGHT + offset]):
+            return True
+        if (KING_ATTACKS[square] & pieces[KING + offset]):
+            return True
+
+        queens = pieces[QUEEN + offset]
+        if (bishopAttacks(square, occupied) & (pieces[BISHOP + offset] | queens)):
+            return True
+        if (rookAttacks(square, occupied) & (pieces[ROOK + offset] | queens)):
+            return True
         return False
 
     def findLegalMoves(self):
         """
-        Returns legal moves in a position using above helper functions
+        Returns legal moves in a position without trying them on the board
+        1. Looks outwards from the king once for checking pieces and for friendly pieces pinned against it
+        2. In double check only the king can move
+        3. Otherwise every other piece is limited to squares that capture or block the checker (if in check), and
+            to the ray it is pinned along (if pinned)
+        4. The king may only step to squares that are not attacked
+        En passant can expose the king along the rank the two pawns leave, so those rare moves are still made and
+        taken back to test them.
         :return: arr (legal moves)
         """
-        return self.generateMoves(self.findPieceLegalMoves())
+        moves = []
+        white = self.whiteToMove
+        self.player = "e" if white else "k"
+        offset = 0 if white else 6
+        enemyOffset = 6 - offset
+        pieces = self.pieceBitboards
+        occupied = self.occupied
+        friendly = self.colourBitboards[WHITE if white else BLACK]
+        kingSquare = lsb(pieces[KING + offset])
+
+        # --- Checkers and Pins --- #
+        # A pawn of our colour on the king's square attacks the squares enemy pawns give check from
+        checkers = (KNIGHT_ATTACKS[kingSquare] & pieces[KNIGHT + enemyOffset]) | \
+                   (PAWN_ATTACKS[WHITE if white else BLACK][kingSquare] & pieces[PAWN + enemyOffset])
+        evasionMask = checkers  # Squares that capture or block the checking piece
+        pins = {}  # Pinned square: squares it may still move to
+
+        enemyQueens = pieces[QUEEN + enemyOffset]
+        for rays, sliders in ((ORTHOGONAL_RAYS, pieces[ROOK + enemyOffset] | enemyQueens),
+                              (DIAGONAL_RAYS, pieces[BISHOP + enemyOffset] | enemyQueens)):
+            for table, increasing in rays:
+                ray = table[kingSquare]
+                if (not ray & sliders):
+                    continue
+
+                blockers = ray & occupied
+                first = lsb(blockers) if (increasing) else blockers.bit_length() - 1
+                firstBit = 1 << first
+                if (firstBit & sliders):  # Slider with a clear line to the king
+                    checkers |= firstBit
+                    evasionMask |= ray ^ table[first]
+                elif (firstBit & friendly):
+                    blockers ^= firstBit
+                    if (blockers):
+                        second = lsb(blockers) if (increasing) else blockers.bit_length() - 1
+                        if ((1 << second) & sliders):  # Only our piece stands between the slider and the king
+                            pins[first] = ray ^ table[second]
+
+        # --- Piece Moves --- #
+        if (not checkers & (checkers - 1)):  # Not double check
+            mask = evasionMask if (checkers) else FULL
+
+            pieceMoves = (
+                (PAWN, self.getPawnMoves),
+                (KNIGHT, self.getKnightMoves),
+                (BISHOP, self.getBishopMoves),
+                (ROOK, self.getRookMoves),
+                (QUEEN, self.getQueenMoves)
+            )
+            for pieceType, getMoves in pieceMoves:
+                bitboard = pieces[pieceType + offset]
+                while bitboard:
+                    bit = bitboard & -bitboard
+                    bitboard ^= bit
+                    square = bit.bit_length() - 1
+                    pieceMask = mask & pins[square] if (square in pins) else mask
+                    if (pieceType == PAWN):
+                        getMoves(square >> 3, square & 7, moves, pieceMask, enPassant=False)
+                    else:
+                        getMoves(square >> 3, square & 7, moves, pieceMask)
+
+            self.getEnPassantMoves(moves)
+
+        # --- King Moves --- #
+        self.getSafeKingMoves(kingSquare >> 3, kingSquare & 7, moves, checkers != 0)
+
+        return moves
+
+    def addPawnMoves(self, rank, file, targets, moves):
+        """
+        Adds pawn moves from the given square to every square in a target bitboard, a move onto the back rank is
+        added once for each piece the pawn can promote to
+        :param rank: int (rank of the chessboard)
+        :param file: int (file on the chessboard)
+        :param targets: int (bitboard of destination squares)
+        :param moves: arr (list of move objects the player could make in isolation)
+        :return: None
+        """
+        pieceMoved = self.mailbox[rank * 8 + file]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            end = bit.bit_length() - 1
+            pieceCaptured = self.mailbox[end]
+            if (end < 8 or end >= 56):
+                for promotionPiece in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    moves.append(Move(rank, file, end >> 3, end & 7, pieceMoved=pieceMoved,
+                                      pieceCaptured=pieceCaptured, promotionPiece=promotionPiece))
+            else:
+                moves.append(Move(rank, file, end >> 3, end & 7, pieceMoved=pieceMoved, pieceCaptured=pieceCaptured))
+
+    def addMoves(self, rank, file, targets, moves):
+        """
+        Adds a move from the given square to every square in a target bitboard
+        :param rank: int (rank of the chessboard)
+        :param file: int (file on the chessboard)
+        :param targets: int (bitboard of destination squares)
+        :param moves: arr (list of move objects the player could make in isolation)
+        :return: None
+        """
+        pieceMoved = self.mailbox[rank * 8 + file]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            end = bit.bit_length() - 1
+            moves.append(Move(rank, file, end >> 3, end & 7, pieceMoved=pieceMoved, pieceCaptured=self.mailbox[end]))
+
+    def friendlyPieces(self):
+        """
+        Bitboard of the pieces belonging to the player to move
+        :return: int (bitboard)
+        """
+        return self.colourBitboards[WHITE if self.whiteToMove else BLACK]
 
     # --- Sliding Pieces --- #
-    def getBishopMoves(self, rank, file, moves):
+    def getBishopMoves(self, rank, file, moves, mask=FULL):
         """
-        Need to check each direction, one square at a time, extending away from the piece, stopping when it hits a piece
+        Looks up the diagonals from the bishop, stopping at the first piece in each direction
         :param rank: int (rank of the chessboard)
         :param file: int (file on the chessboard)
         :param moves: arr (list of move objects the player could make in isolation)
+        :param mask: int (bitboard of squares the piece is allowed to move to)
         :return: None
         """
-        diagonal_directions = [
-            (-1, 1),  # Up and Right
-            (1, 1),  # Down and Right
-            (1, -1),  # Down and Left
-            (-1, -1)  # Up and Left
-        ]
-
-        for direction in diagonal_directions:
-            for i in range(1, 8):
-                end_file = file + direction[1] * i
-                end_rank = rank + direction[0] * i
-
-                if 0 <= end_file < 8 and 0 <= end_rank < 8:  # If the bishop stays on the board
-                    end_piece = self.virtualBoard[end_rank][end_file]
-
-                    if end_piece == "0":  # Square is empty
-                        moves.append(Move(rank, file, end_rank, end_file, self.virtualBoard))
-                    elif end_piece[-1] != self.player:  # Square doesn't contain a friendly piece
-                        moves.append(Move(rank, file, end_rank, end_file, self.virtualBoard))
-                        break
-                    else:
-                        break
-                else:
-                    break
+        targets = bishopAttacks(rank * 8 + file, self.occupied) & ~self.friendlyPieces() & mask
+        self.addMoves(rank, file, targets, moves)
 
-    def getRookMoves(self, rank, file, moves):
+    def getRookMoves(self, rank, file, moves, mask=FULL):
         """
-        Need to check each direction, one square at a time, extending away from the piece, stopping when it hits a piece
+        Looks up the ranks and files from the rook, stopping at the first piece in each direction
         :param rank: int (rank of the chessboard)
         :param file: int (file on the chessboard)
         :param moves: arr (list of move objects the player could make in isolation)
+        :param mask: int (bitboard of squares the piece is allowed to move to)
         :return: None
         """
-        orthogonal_directions = [
-            (-1, 0),  # Up
-            (1, 0),  # Down
-            (0, -1),  # Left
-            (0, 1)  # Right
-        ]
-
-        for direction in orthogonal_directions:
-            for i in range(1, 8):
-                end_file = file + direction[1] * i
-                end_rank = rank + direction[0] * i
-
-                if 0 <= end_file < 8 and 0 <= end_rank < 8:  # If the rook stays on the board
-                    end_piece = self.virtualBoard[end_rank][end_file]
-
-                    if end_piece == "0":  # Square is empty
-                        moves.append(Move(rank, file, end_rank, end_file, self.virtualBoard))
-                    elif end_piece[-1] != self.player:  # Square doesn't contain a friendly piece
-                        moves.append(Move(rank, file, end_rank, end_file, self.virtualBoard))
-                        break
-                    else:  # Friendly piece, invalid
-                        break
-                else:  # Off board, invalid
-                    break
-
-    def getQueenMoves(self, rank, file, moves):
+        targets = rookAttacks(rank * 8 + file, self.occupied) & ~self.friendlyPieces() & mask
+        self.addMoves(rank, file, targets, moves)
+
+    def getQueenMoves(self, rank, file, moves, mask=FULL):
         """
         Moves like a rook and a bishop, so let's just reuse those methods.
         :param rank: int (rank of the chessboard)
         :param file: int (file on the chessboard)
         :param moves: arr (list of move objects the player could make in isolation)
+        :param mask: int (bitboard of squares the piece is allowed to move to)
         :return: None
         """
-        self.getBishopMoves(rank, file, moves)
-        self.getRookMoves(rank, file, moves)
+        self.getBishopMoves(rank, file, moves, mask)
+        self.getRookMoves(rank, file, moves, mask)
 
     # --- Different Moving Pieces --- #
-    def getPawnMoves(self, rank, file, moves):
+    def getPawnMoves(self, rank, file, moves, mask=FULL, enPassant=True):
         """
         Get all of the possible pawn moves, based on the pawn at the inputted rank and file, and then add those moves
         to the moves list
         :param rank: int (rank of the chessboard)
         :param file: int (file on the chessboard)
         :param moves: arr (list of move objects the player could make in isolation)
+        :param mask: int (bitboard of squares the pawn is allowed to move to)
+        :param enPassant: bool (also add an en passant capture, if there is one)
         :return: None
         """
+        square = rank * 8 + file
+        empty = ~self.occupied
 
         # --- White Pawns --- #
         if self.whiteToMove:
-            if self.virtualBoard[rank - 1][file] == "0":  # Checks the square in front of the pawn is empty
-                moves.append(Move(rank, file, rank - 1, file, self.virtualBoard))
+            targets = 0
+            if (empty >> (square - 8)) & 1:  # Checks the square in front of the pawn is empty
+                targets |= 1 << (square - 8)
                 # Checks if a 2 square pawn move is possible
-                if rank == 6 and self.virtualBoard[rank - 2][file] == "0":
-                    moves.append(Move(rank, file, rank - 2, file, self.virtualBoard))
+                if rank == 6 and (empty >> (square - 16)) & 1:
+                    targets |= 1 << (square - 16)
 
             # Adds the pawn captures to the legal moves list
-            if file + 1 < 8:
-                # Pawn captures right
-                if self.virtualBoard[rank - 1][file + 1][-1] == "k":
-                    moves.append(Move(rank, file, rank - 1, file + 1, self.virtualBoard))
-
-            if file - 1 > -1:
-                # Pawn captures left
-                if self.virtualBoard[rank - 1][file - 1][-1] == "k":
-                    moves.append(Move(rank, file, rank - 1, file - 1, self.virtualBoard))
+            targets |= PAWN_ATTACKS[WHITE][square] & self.colourBitboards[BLACK]
 
         # --- Black Pawns --- #
-        if not self.whiteToMove:
-            if self.virtualBoard[rank + 1][file] == "0":  # Checks the square in front of the pawn is empty
-                moves.append(Move(rank, file, rank + 1, file, self.virtualBoard))
+        else:
+            targets = 0
+            if (empty >> (square + 8)) & 1:  # Checks the square in front of the pawn is empty
+                targets |= 1 << (square + 8)
                 # Checks if a 2 square pawn move is possible
-                if rank == 1 and self.virtualBoard[rank + 2][file] == "0":
-                    moves.append(Move(rank, file, rank + 2, file, self.virtualBoard))
-                    self.enPassantPossibleWhite = True
+                if rank == 1 and (empty >> (square + 16)) & 1:
+                    targets |= 1 << (square + 16)
 
             # Adds the pawn captures to the legal moves list
-            if file + 1 < 8:
-                # Pawn captures right
-                if self.virtualBoard[rank + 1][file + 1][-1] == "e":
-                    moves.append(Move(rank, file, rank + 1, file + 1, self.virtualBoard))
+            targets |= PAWN_ATTACKS[BLACK][square] & self.colourBitboards[WHITE]
 
-            if file - 1 > -1:
-                # Pawn captures left
-                if self.virtualBoard[rank + 1][file - 1][-1] == "e":
-                    moves.append(Move(rank, file, rank + 1, file - 1, self.virtualBoard))
+        self.addPawnMoves(rank, file, targets & mask, moves)
 
-    def getKnightMoves(self, rank, file, moves):
+        ep = self.enPassantSquare
+        if (enPassant and ep is not None and PAWN_ATTACKS[WHITE if self.whiteToMove else BLACK][square] >> ep & 1):
+            moves.append(Move(rank, file, ep >> 3, ep & 7, enPassant=True,
+                              pieceMoved=self.mailbox[square], pieceCaptured=self.mailbox[rank * 8 + (ep & 7)]))
+
+    def getEnPassantMoves(self, moves):
+        """
+        Adds the legal en passant captures, if there are any. Both pawns leave the same rank, which can uncover an
+        attack on the king that a pin check on one piece misses, so each capture is made and taken back to test it.
+        :param moves: arr (list of legal moves)
+        :return: None
+        """
+        ep = self.enPassantSquare
+        if (ep is None):
+            return
+
+        white = self.whiteToMove
+        # Our pawns that attack the en passant square sit where an enemy pawn on it would attack
+        capturers = PAWN_ATTACKS[BLACK if white else WHITE][ep] & self.pieceBitboards[PAWN if white else PAWN + 6]
+        candidates = []
+        while capturers:
+            bit = capturers & -capturers
+            capturers ^= bit
+            square = bit.bit_length() - 1
+            candidates.append(Move(square >> 3, square & 7, ep >> 3, ep & 7, enPassant=True,
+                                   pieceMoved=self.mailbox[square],
+                                   pieceCaptured=self.mailbox[(square & ~7) + (ep & 7)]))
+
+        for move in candidates:
+            self.makeMove(move)
+            if (not self.kingInCheck(white)):
+                moves.append(move)
+            self.takeback()
+
+    def getKnightMoves(self, rank, file, moves, mask=FULL):
         """
         Finds all possible knight moves in the position.
         :param rank: int (rank of the chessboard)
         :param file: int (file on the chessboard)
         :param moves: arr (list of move objects the player could make in isolation)
+        :param mask: int (bitboard of squares the piece is allowed to move to)
         :return: None
         """
-        knight_moves = [
-            (2, 1),
-            (1, 2),
-            (-1, 2),
-            (-2, 1),
-            (-2, -1),
-            (-1, -2),
-            (1, -2),
-            (2, -1)
-        ]
-        for move in knight_moves:
-            end_rank = rank + move[0]
-            end_file = file + move[1]
-
-            if 0 <= end_rank < 8 and 0 <= end_file < 8:  # If the Knight stays on the board
-                end_piece = self.virtualBoard[end_rank][end_file]
-                if end_piece[-1] != self.player:  # Not the same colour piece
-                    moves.append(Move(rank, file, end_rank, end_file, self.virtualBoard))
+        targets = KNIGHT_ATTACKS[rank * 8 + file] & ~self.friendlyPieces() & mask
+        self.addMoves(rank, file, targets, moves)
 
     def getKingMoves(self, rank, file, moves):
         """
@@ -347,220 +614,337 @@ class Engine:
         :param moves: arr (list of move objects the player could make in isolation)
         :return: None
         """
-        king_moves = [
-            (1, 0),
-            (1, 1),
-            (0, 1),
-            (-1, 1),
-            (-1, 0),
-            (-1, -1),
-            (0, -1),
-            (1, -1)
-        ]
-        for move in king_moves:
-            endRank = rank + move[0]
-            endFile = file + move[1]
-
-            if (0 <= endRank <= 7 and 0 <= endFile <= 7):  # If the King stays on the board
-                end_piece = self.virtualBoard[endRank][endFile]
-
-                if (end_piece[-1] != self.player):  # Not the same colour piece
-                    moves.append(Move(rank, file, endRank, endFile, self.virtualBoard))
-
-        # Castling
-        if (self.whiteToMove):
-            if (self.whiteCastling["kingside"] and self.virtualBoard[7][5] == "0" and self.virtualBoard[7][6] == "0" and not self.squareUnderAttack(7, 4) and not self.squareUnderAttack(7, 5) and not self.squareUnderAttack(7, 6)):
-                moves.append(Move(rank, file, 7, 6, self.virtualBoard, isCastle=True))
-            if (self.whiteCastling["queenside"] and self.virtualBoard[7][1] == "0" and self.virtualBoard[7][2] == "0" and self.virtualBoard[7][3] == "0" and not self.squareUnderAttack(7, 4) and not self.squareUnderAttack(7, 2) and not self.squareUnderAttack(7, 3)):
-                moves.append(Move(rank, file, 7, 2, self.virtualBoard, isCastle=True))
-        else:
-            if (self.blackCastling["kingside"] and self.virtualBoard[0][5] == "0" and self.virtualBoard[0][6] == "0" and not self.squareUnderAttack(0, 4) and not self.squareUnderAttack(0, 5) and not self.squareUnderAttack(0, 6)):
-                moves.append(Move(rank, file, 0, 6, self.virtualBoard, isCastle=True))
-            if (self.blackCastling["queenside"] and self.virtualBoard[0][1] == "0" and self.virtualBoard[0][2] == "0" and self.virtualBoard[0][3] == "0" and not self.squareUnderAttack(0, 4) and not self.squareUnderAttack(0, 2) and not self.squareUnderAttack(0, 3)):
-                moves.append(Move(rank, file, 0, 2, self.virtualBoard, isCastle=True))
-        
-
+        targets = KING_ATTACKS[rank * 8 + file] & ~self.friendlyPieces()
+        self.addMoves(rank, file, targets, moves)
+        self.getCastlingMoves(rank, file, moves)
 
-    def updateKings(self, move):
-        """
-        Updates the position of the Kings every move (inefficient, but it works)
+    def getSafeKingMoves(self, rank, file, moves, inCheck):
         """
-        for rank in range(8):
-            for file in range(8):
-                if self.virtualBoard[rank][file] == "King_white":
-                    self.whiteKingCoords = (rank, file)
-                if self.virtualBoard[rank][file] == "King_black":
-                    self.blackKingCoords = (rank, file)
-
-    def updateCastlingRights(self, move):
-        """
-        Method to track the castling rights of each player, specifically the movement of the Kings and Rooks
-        :param move: Move (move object to make)
+        Finds the king moves that do not step onto an attacked square. The king is lifted off the board first, so
+        it cannot hide from a slider by stepping backwards along the slider's line.
+        :param rank: int (rank of the chessboard)
+        :param file: int (file on the chessboard)
+        :param moves: arr (list of legal moves)
+        :param inCheck: bool (True if the king is in check, which rules out castling)
         :return: None
         """
-        if (move.pieceMoved == "King_white"):
-            self.whiteCastling["kingside"] = False
-            self.whiteCastling["queenside"] = False
-            print("king moved")
-        elif (move.pieceMoved == "King_black"):
-            self.blackCastling["kingside"] = False
-            self.blackCastling["queenside"] = False
-            print("king moved")
+        square = rank * 8 + file
+        byWhite = not self.whiteToMove
+        occupied = self.occupied ^ (1 << square)
 
-        elif (move.pieceMoved == "rook_white"):
-            if (move.startRank == 7):
-                if (move.startFile == 0):
-                    self.whiteCastling["queenside"] = False
-                    print("rook moved")
+        targets = KING_ATTACKS[square] & ~self.friendlyPieces()
+        safe = 0
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            if (not self.isSquareAttacked(bit.bit_length() - 1, byWhite, occupied)):
+                safe |= bit
+        self.addMoves(rank, file, safe, moves)
 
-                elif (move.startFile == 7):
-                    self.whiteCastling["kingside"] = False
-                    print("rook moved")
+        if (not inCheck):
+            self.getCastlingMoves(rank, file, moves)
 
-        elif (move.pieceMoved == "rook_black"):
-            if (move.startRank == 0):
-                if (move.startFile == 0):
-                    self.blackCastling["queenside"] = False
-                    print("rook moved")
+    def getCastlingMoves(self, rank, file, moves):
+        """
+        Adds castling moves, the squares between the king and rook must be empty and the king may not be in check,
+        pass through an attacked square or land on one
+        :param rank: int (rank of the chessboard)
+        :param file: int (file on the chessboard)
+        :param moves: arr (list of move objects the player could make)
+        :return: None
+        """
+        pieceMoved = self.mailbox[rank * 8 + file]
+        occupied = self.occupied
+        if (self.whiteToMove):
+            if (self.castlingRights & WHITE_KINGSIDE and not occupied & (1 << 61 | 1 << 62) and not self.squareUnderAttack(7, 4) and not self.squareUnderAttack(7, 5) and not self.squareUnderAttack(7, 6)):
+                moves.append(Move(rank, file, 7, 6, isCastle=True, pieceMoved=pieceMoved))
+            if (self.castlingRights & WHITE_QUEENSIDE and not occupied & (1 << 57 | 1 << 58 | 1 << 59) and not self.squareUnderAttack(7, 4) and not self.squareUnderAttack(7, 2) and not self.squareUnderAttack(7, 3)):
+                moves.append(Move(rank, file, 7, 2, isCastle=True, pieceMoved=pieceMoved))
+        else:
+            if (self.castlingRights & BLACK_KINGSIDE and not occupied & (1 << 5 | 1 << 6) and not self.squareUnderAttack(0, 4) and not self.squareUnderAttack(0, 5) and not self.squareUnderAttack(0, 6)):
+                moves.append(Move(rank, file, 0, 6, isCastle=True, pieceMoved=pieceMoved))
+            if (self.castlingRights & BLACK_QUEENSIDE and not occupied & (1 << 1 | 1 << 2 | 1 << 3) and not self.squareUnderAttack(0, 4) and not self.squareUnderAttack(0, 2) and not self.squareUnderAttack(0, 3)):
+                moves.append(Move(rank, file, 0, 2, isCastle=True, pieceMoved=pieceMoved))
 
-                elif (move.startFile == 7):
-                    self.blackCastling["kingside"] = False
-                    print("rook moved")
+    def isRepetition(self):
+        """
+        Determines if the position has already occurred since the last capture or pawn move, using the keys saved on
+        the undo stack (only positions with the same player to move can match)
+        :return: bool (True if the position is a repetition)
+        """
+        history = self.undoStack
+        for i in range(len(history) - 2, max(len(history) - self.halfmoveClock, 0) - 1, -2):
+            if (history[i][-1] == self.hash):
+                return True
+        return False
 
+    def computeHash(self):
+        """
+        Computes the Zobrist key of the position from scratch, makeMove and takeback keep self.hash up to date
+        incrementally so this is only needed when setting up a position (or to check the incremental key)
+        :return key: int (64-bit Zobrist key)
+        """
+        key = CASTLING_KEYS[self.castlingRights]
+        for square in range(64):
+            if (self.mailbox[square] != EMPTY):
+                key ^= PIECE_KEYS[self.mailbox[square]][square]
+        if (self.enPassantSquare is not None):
+            key ^= EN_PASSANT_KEYS[self.enPassantSquare & 7]
+        if (not self.whiteToMove):
+            key ^= SIDE_KEY
+        return key
 
+    def computePawnHash(self):
+        """
+        Computes the pawn key from scratch, putPiece and removePiece keep self.pawnHash up to date (promotions and en
+        passant captures included, they lift the pawn off like any other move)
+        :return key: int (64-bit Zobrist key of the pawns)
+        """
+        key = 0
+        for piece in (PAWN, PAWN + 6):
+            for square in squares(self.pieceBitboards[piece]):
+                key ^= PIECE_KEYS[piece][square]
+        return key
 
     def boardFromFEN(self):
         """
-        Function to create a virtual board based on a Forsyth Edwards Notation (or FEN) string representation.
+        Function to set up the bitboards based on a Forsyth Edwards Notation (or FEN) string representation. The
+        halfmove and fullmove counters are optional, so EPD positions load as well. Raises ValueError for a FEN that
+        can't be read, or a position move generation can't work with: not exactly one king each, or the side not to
+        move in check.
         :return virtualBoard: arr (2D array representation of a chessboard)
         """
-        piecesFromFEN = {
-            "K": "King_white",
-            "k": "King_black",
+        fields = self.fenString.split()
+        if (len(fields) < 4):
+            raise ValueError(f"FEN needs at least 4 fields: {self.fenString!r}")
+        placement, side, castling, enPassant = fields[:4]
+        tempRank = placement.split("/")
+        if (len(tempRank) != 8):
+            raise ValueError(f"FEN needs 8 ranks: {self.fenString!r}")
+
+        self.pieceBitboards = [0] * 12
+        self.colourBitboards = [0, 0]
+        self.occupied = 0
+        self.mailbox = [EMPTY] * 64
+        self.hash = 0
+        self.pawnHash = 0
+        self.mgScore = self.egScore = self.phase = 0
 
-            "Q": "queen_white",
-            "q": "queen_black",
+        # --- Set Up Pieces --- #
+        for i in range(8):
+            file = 0
+            for char in tempRank[i]:
+                if (char.isdigit()):
+                    file += int(char)
+                elif (char in PIECES_FROM_FEN and file < 8):
+                    self.putPiece(PIECES_FROM_FEN[char], i * 8 + file)
+                    file += 1
+                else:
+                    raise ValueError(f"Bad rank {tempRank[i]!r} in FEN: {self.fenString!r}")
+            if (file != 8):
+                raise ValueError(f"Bad rank {tempRank[i]!r} in FEN: {self.fenString!r}")
+
+        # Find Kings, move generation needs exactly one of each
+        for piece, colour in ((KING, "white"), (KING + 6, "black")):
+            count = self.pieceBitboards[piece].bit_count()
+            if (count != 1):
+                raise ValueError(f"FEN needs one {colour} king, not {count}: {self.fenString!r}")
+        self.whiteKingCoords = divmod(lsb(self.pieceBitboards[KING]), 8)
+        self.blackKingCoords = divmod(lsb(self.pieceBitboards[KING + 6]), 8)
 
-            "R": "rook_white",
-            "r": "rook_black",
+        # --- Update Stats --- #
+        # Turns
+        if (side not in ("w", "b")):
+            raise ValueError(f"Bad side to move {side!r} in FEN: {self.fenString!r}")
+        self.whiteToMove = side == "w"
+        self.player = "e" if (self.whiteToMove) else "k"
+
+        # The side that just moved can't have left its king in check
+        if (self.kingInCheck(not self.whiteToMove)):
+            raise ValueError(f"Side not to move is in check in FEN: {self.fenString!r}")
+
+        # Castling, rights whose king or rook isn't at home are dropped
+        self.castlingRights = 0
+        if (castling != "-"):
+            for char, right, king, rook in (("K", WHITE_KINGSIDE, 60, 63), ("Q", WHITE_QUEENSIDE, 60, 56),
+                                            ("k", BLACK_KINGSIDE, 4, 7), ("q", BLACK_QUEENSIDE, 4, 0)):
+                kingPiece, rookPiece = (KING, ROOK) if (char.isupper()) else (KING + 6, ROOK + 6)
+                if (char in castling and self.mailbox[king] == kingPiece and self.mailbox[rook] == rookPiece):
+                    self.castlingRights |= right
+
+        # En Passant, only a square just behind a pawn of the side that moved can be one
+        self.enPassantSquare = None
+        if (enPassant != "-"):
+            if (len(enPassant) != 2 or enPassant[0] not in FILE_LETTERS or enPassant[1] not in "36"):
+                raise ValueError(f"Bad en passant square {enPassant!r} in FEN: {self.fenString!r}")
+            square = (8 - int(enPassant[1])) * 8 + FILE_LETTERS.index(enPassant[0])
+            pawnSquare = square + 8 if (self.whiteToMove) else square - 8
+            if (enPassant[1] == ("6" if (self.whiteToMove) else "3")
+                    and self.mailbox[pawnSquare] == (PAWN + 6 if (self.whiteToMove) else PAWN)
+                    and self.mailbox[square] == EMPTY):
+                self.enPassantSquare = square
 
-            "B": "bishop_white",
-            "b": "bishop_black",
+        # Move counters, optional (EPD leaves them out)
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        if (len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit()):
+            self.halfmoveClock = int(fields[4])
+            self.fullmoveNumber = max(int(fields[5]), 1)
 
-            "N": "knight_white",
-            "n": "knight_black",
+        self.hash = self.computeHash()
 
-            "P": "pawn_white",
-            "p": "pawn_black"
-        }
-        virtualBoard = []
+        self._virtualBoard = None
+        return self.virtualBoard
+
+    def toFEN(self):
+        """
+        :return: str (FEN of the current position)
+        """
+        ranks = []
+        for rank in range(8):
+            row = ""
+            empty = 0
+            for square in range(rank * 8, rank * 8 + 8):
+                piece = self.mailbox[square]
+                if (piece == EMPTY):
+                    empty += 1
+                    continue
+                if (empty):
+                    row += str(empty)
+                    empty = 0
+                row += FEN_FROM_PIECES[piece]
+            ranks.append(row + (str(empty) if (empty) else ""))
+
+        castling = "".join(char for char, right in (("K", WHITE_KINGSIDE), ("Q", WHITE_QUEENSIDE),
+                                                    ("k", BLACK_KINGSIDE), ("q", BLACK_QUEENSIDE))
+                           if (self.castlingRights & right))
+        enPassant = "-"
+        if (self.enPassantSquare is not None):
+            enPassant = FILE_LETTERS[self.enPassantSquare & 7] + str(8 - (self.enPassantSquare >> 3))
+        return (f"{'/'.join(ranks)} {'w' if (self.whiteToMove) else 'b'} {castling or '-'} {enPassant} "
+                f"{self.halfmoveClock} {self.fullmoveNumber}")
 
-        tempRank = self.fenString.split("/")
 
-        # --- Set Up Pieces --- #
-        for i in range(8):
-            rank = []
-            for char in tempRank[i]:
-                if (char == " "):
-                    break
-                elif (char.isdigit()):
-                    rank += ["0"] * int(char)
-                else:
-                    rank.append(piecesFromFEN[char])
+# --- Move Class --- #
+# Notation tables, shared by every move
+FILE_LETTERS = "abcdefgh"
+PIECE_LETTERS = ("", "N", "B", "R", "Q", "K")
 
-                # Find Kings
-                if (char == "K"):
-                    self.whiteKingCoords = (i, len(rank) - 1)
-                if (char == "k"):
-                    self.blackKingCoords = (i, len(rank) - 1)
+# Move id layout: bits 0-5 start square, 6-11 end square, 12-14 promotion piece type (0 for none),
+# 15 special (castling for a king, en passant for a pawn), 16-19 piece moved, 20-23 piece captured
+SPECIAL_FLAG = 1 << 15
 
-            virtualBoard.append(rank)
 
-        # --- Update Stats --- #
-        gameState = tempRank[-1].split(" ")
+class Move:
+    """
+    A move, identified by a single integer (moveId) so moves compare and hash exactly. The squares, pieces and flags
+    are also kept in slots for the move generator and makeMove to read directly.
+    """
+    __slots__ = ("moveId", "start", "end", "pieceMoved", "pieceCaptured", "promotionPiece", "isCastle", "enPassant")
+
+    def __init__(self, startRank, startFile, endRank, endFile, virtualBoard=None, isCastle=False, pieceMoved=EMPTY,
+                 pieceCaptured=EMPTY, enPassant=False, promotionPiece=QUEEN):
+        """
+        :param startRank, startFile, endRank, endFile: int (squares the move goes from and to)
+        :param virtualBoard: arr (2D board of piece names to read the moved and captured pieces from, castling and en
+            passant are worked out from the board as well)
+        :param isCastle: bool (True if the move is a castling king move)
+        :param pieceMoved, pieceCaptured: int (piece codes, used instead of reading them from a virtualBoard)
+        :param enPassant: bool (True if the move is an en passant capture, pieceCaptured is then the passed pawn)
+        :param promotionPiece: int (piece type a pawn reaching the back rank becomes)
+        """
+        start = startRank * 8 + startFile
+        end = endRank * 8 + endFile
+
+        # Piece Identifiers
+        if (virtualBoard is not None):
+            try:
+                pieceMoved = PIECE_CODES[virtualBoard[startRank][startFile]]
+                pieceCaptured = PIECE_CODES[virtualBoard[endRank][endFile]]
+            except (IndexError):
+                print("Cannot move piece off of board.")
+                raise
+            if (pieceMoved % 6 == KING and abs(endFile - startFile) == 2):
+                isCastle = True
+            if (pieceMoved % 6 == PAWN and startFile != endFile and pieceCaptured == EMPTY):
+                enPassant = True
+                pieceCaptured = PIECE_CODES[virtualBoard[startRank][endFile]]
+
+        self.start = start
+        self.end = end
+        self.pieceMoved = pieceMoved
+        self.pieceCaptured = pieceCaptured
+        self.isCastle = isCastle
+        self.enPassant = enPassant
 
-        # Turns
-        if (gameState[1] == "w"):
-            self.whiteToMove = True
-        else:
-            self.whiteToMove = False
-
-        # Castling
-        castlingRights = gameState[2]
-        if (castlingRights != "-"):
-            if ("K" in castlingRights):
-                self.whiteCastling["kingside"] = True
-            if ("Q" in castlingRights):
-                self.whiteCastling["queenside"] = True
-            if ("k" in castlingRights):
-                self.blackCastling["kingside"] = True
-            if ("q" in castlingRights):
-                self.blackCastling["queenside"] = True
+        # Special Moves
+        moveId = start | end << 6 | pieceMoved << 16 | pieceCaptured << 20
+        if ((pieceMoved == PAWN and end < 8) or (pieceMoved == PAWN + 6 and end >= 56)):
+            self.promotionPiece = promotionPiece
+            moveId |= promotionPiece << 12
         else:
-            pass
+            self.promotionPiece = None
+        if (isCastle or enPassant):
+            moveId |= SPECIAL_FLAG
+        self.moveId = moveId
 
-        # En Passant
-        enPassant = gameState[3]
-        if (enPassant != "-"):
-            self.enPassantPossible = True
-            self.enPassantCoords = enPassant
-        else:
-            pass
+    # --- Derived Attributes --- #
+    @property
+    def startRank(self):
+        """
+        Rank the move starts on
+        :return: int
+        """
+        return self.start >> 3
 
-        return virtualBoard
+    @property
+    def startFile(self):
+        """
+        File the move starts on
+        :return: int
+        """
+        return self.start & 7
 
+    @property
+    def endRank(self):
+        """
+        Rank the move ends on
+        :return: int
+        """
+        return self.end >> 3
 
-# --- Move Class --- #
-class Move:
-    def __init__(self, startRank, startFile, endRank, endFile, virtualBoard, isCastle=False):
-        try:
-            # Start and End Position of the Move
-            self.startRank = startRank
-            self.startFile = startFile
-            self.endRank = endRank
-            self.endFile = endFile
-
-            # Piece Identifiers
-            self.pieceMoved = virtualBoard[self.startRank][self.startFile]
-            self.pieceCaptured = virtualBoard[self.endRank][self.endFile]
-            self.moveId = self.startRank * 1 + self.startFile * 0.1 + self.endRank * 0.01 + self.endFile * 0.001
-        except (IndexError):
-            print("Cannot move piece off of board.")
+    @property
+    def endFile(self):
+        """
+        File the move ends on
+        :return: int
+        """
+        return self.end & 7
 
-        # Special Moves
-        self.pawnPromotion = False
-        if (self.pieceMoved[-1] == "e" and self.pieceMoved[0] == "p" and self.endRank == 0) or \
-                (self.pieceMoved[-1] == "k" and self.pieceMoved[0] == "p" and self.endRank == 7):
-            self.pawnPromotion = True
+    @property
+    def pawnPromotion(self):
+        """
+        True if a pawn reaches the back rank
+        :return: bool
+        """
+        return self.promotionPiece is not None
 
-        self.enPassant = False
-        self.isCastle = isCastle
+    @property
+    def twoSquareAdvance(self):
+        """
+        True if a pawn moves two squares forwards
+        :return: bool
+        """
+        return self.pieceMoved % 6 == PAWN and abs(self.end - self.start) == 16
 
-        self.twoSquareAdvance = False
-        if (self.pieceMoved[-1] == "e" and self.pieceMoved[0] == "p" and self.startRank - self.endRank == 2) or \
-                (self.pieceMoved[-1] == "k" and self.pieceMoved[0] == "p" and self.endRank - self.startRank == 2):
-            self.twoSquareAdvance = True
-
-        # --- Piece/File/Rank Adjustment for Notation --- #
-        self.pieceCast = {
-            "0": "",
-            "p": "",
-            "k": "N",
-            "b": "B",
-            "r": "R",
-            "q": "Q",
-            "K": "K"
-        }
-        self.intToLetter = {
-            0: "a",
-            1: "b",
-            2: "c",
-            3: "d",
-            4: "e",
-            5: "f",
-            6: "g",
-            7: "h",
-        }
+    def coordinates(self):
+        """
+        Long algebraic name of the move (from square, to square, promotion piece), unambiguous unlike __str__
+        :return: str (e.g. "e2e4", "e7e8q")
+        """
+        promotion = "pnbrq"[self.promotionPiece] if (self.promotionPiece is not None) else ""
+        return f"{FILE_LETTERS[self.start & 7]}{8 - (self.start >> 3)}" \
+               f"{FILE_LETTERS[self.end & 7]}{8 - (self.end >> 3)}{promotion}"
 
     def __eq__(self, other):
         """
@@ -572,19 +956,30 @@ class Move:
             return self.moveId == other.moveId
         return False
 
+    def __hash__(self):
+        """
+        Hashes the same as the moveId, so equal moves hash equal
+        :return: int
+        """
+        return hash(self.moveId)
+
     def __str__(self):
         """
-        Overloading string method
+        Overloading string method, only built when a move is printed
         :return: str (string representation of a chess move)
         """
         if (self.isCastle):
-            if (self.endFile == 6):
+            if (self.end & 7 == 6):
                 return "O-O"
             else:
                 return "O-O-O"
-        if (self.pieceCaptured != "0"):
-            if (self.pieceMoved[0] == "p"):
-                return f"{self.intToLetter[self.startFile]}x{self.intToLetter[self.endFile]}{8 - self.endRank}"
+        promotion = ""
+        if (self.promotionPiece is not None):
+            promotion = "=" + "PNBRQ"[self.promotionPiece]
+        destination = f"{FILE_LETTERS[self.end & 7]}{8 - (self.end >> 3)}"
+        if (self.pieceCaptured != EMPTY):
+            if (self.pieceMoved % 6 == PAWN):
+                return f"{FILE_LETTERS[self.start & 7]}x{destination}{promotion}"
             else:
-                return f"{self.pieceCast[self.pieceMoved[0]]}x{self.intToLetter[self.endFile]}{8 - self.endRank}"
-        return f"{self.pieceCast[self.pieceMoved[0]]}{self.intToLetter[self.endFile]}{8 - self.endRank}"
+                return f"{PIECE_LETTERS[self.pieceMoved % 6]}x{destination}"
+        return f"{PIECE_LETTERS[self.pieceMoved % 6]}{destination}{promotion}"
@@ -0,0 +1,240 @@
+# epd.py
+"""
+Runs test suites in Extended Position Description (EPD) format, e.g. tactical suites like WAC or the Bratko-Kopec
+test. Each line is a position followed by operations, bm (best moves) and am (moves to avoid) decide whether the
+engine's choice is correct:
+
+    1k1r4/pp1b1R2/3q2pp/4p3/2B5/4Q3/PPP2B2/2K5 b - - bm Qd1+; id "BK.01";
+
+The file is read one line at a time, and each result is printed as soon as the position is done. A line that can't
+be read, or a position that can't be set up, is recorded as that position's failed result and the suite carries on.
+"""
+from engine import Engine
+from opponent import Opponent
+from notation import parseSAN
+import argparse
+import json
+import time
+
+
+def parseOperations(text):
+    """
+    Splits the operations after the position fields, quoted operands may contain spaces and semicolons
+    :param text: str (e.g. 'bm Qd1+; id "BK.01";')
+    :return: dict (opcode: list of operand strings)
+    """
+    operations = {}
+    tokens = []
+    token = ""
+    quoted = False
+    for char in text + ";":
+        if (quoted):
+            if (char == '"'):
+                quoted = False
+            else:
+                token += char
+        elif (char == '"'):
+            quoted = True
+        elif (char in " ;"):
+            if (token):
+                tokens.append(token)
+                token = ""
+            if (char == ";" and tokens):
+                operations[tokens[0]] = tokens[1:]
+                tokens = []
+        else:
+            token += char
+    return operations
+
+
+def parseEPD(line):
+    """
+    :param line: str (one EPD line)
+    :return: tuple (FEN of the position, dict of operations) or None for a blank or comment line
+    """
+    line = line.strip()
+    if (not line or line.startswith("#")):
+        return None
+    fields = line.split(None, 4)
+    if (len(fields) < 4):
+        raise ValueError(f"EPD needs at least 4 fields: {line!r}")
+    operations = parseOperations(fields[4]) if (len(fields) > 4) else {}
+
+    counters = f"{operations.get('hmvc', ['0'])[0]} {operations.get('fmvn', ['1'])[0]}"
+    return " ".join(fields[:4]) + " " + counters, operations
+
+
+def readEPD(path):
+    """
+    Reads a suite lazily, one position at a time. Lines are parsed by the caller, so a bad one doesn't end the
+    generator.
+    :param path: str (EPD file)
+    :return: generator (yields (line number, line) for every line that isn't blank or a comment)
+    """
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if (line and not line.startswith("#")):
+                yield number, line
+
+
+def errorResult(number, operations, error):
+    """
+    :param number: int (line number)
+    :param operations: dict (EPD operations, empty if the line couldn't be parsed)
+    :param error: str (why the position couldn't be searched)
+    :return: dict (unsolved result, in the same form as SuiteRunner.solve's)
+    """
+    return {
+        "id": operations.get("id", [str(number)])[0],
+        "solved": False,
+        "move": "0000",
+        "expected": {"bm": operations.get("bm", []), "am": operations.get("am", [])},
+        "time": 0.0,
+        "nodes": 0,
+        "depth": 0,
+        "solvedTime": None,
+        "solvedNodes": None,
+        "solvedDepth": None,
+        "error": error
+    }
+
+
+class SuiteRunner:
+    """
+    Searches each position of a suite with one engine and opponent, loading every position with Engine.loadFEN and
+    clearing the opponent's tables in between so positions don't help each other
+    """
+    def __init__(self, timeLimit=5.0, nodeLimit=None, maxDepth=64, hashSizeMb=16):
+        """
+        :param timeLimit: float (seconds per position)
+        :param nodeLimit: int (nodes per position, None for no limit)
+        :param maxDepth: int (deepest iteration)
+        :param hashSizeMb: int (size of the transposition table)
+        """
+        self.engine = Engine()
+        self.opponent = Opponent(self.engine, timeLimit=timeLimit, nodeLimit=nodeLimit, maxDepth=maxDepth,
+                                 hashSizeMb=hashSizeMb)
+        self.results = []
+
+    def solve(self, number, fenString, operations):
+        """
+        Searches one position. The time to solution is when the search settled on a correct move for good: the
+        first iteration after which every iteration's best move was correct.
+        :param number: int (line number, identifies the position if it has no id)
+        :param fenString: str (position)
+        :param operations: dict (EPD operations, bm and am are used)
+        :return: dict (result: id, solved, move, expected, time, nodes, depth, and the time, nodes and depth at
+            which it was solved, None if it wasn't, and error, None for a position that was searched)
+        """
+        self.engine.loadFEN(fenString)
+        self.opponent.newGame()
+        legalMoves = self.engine.findLegalMoves()
+
+        best = [parseSAN(self.engine, name, legalMoves) for name in operations.get("bm", [])]
+        avoid = [parseSAN(self.engine, name, legalMoves) for name in operations.get("am", [])]
+        best = [move.coordinates() for move in best if (move)]
+        avoid = [move.coordinates() for move in avoid if (move)]
+
+        def correct(name):
+            return (not best or name in best) and name not in avoid
+
+        solution = {}
+
+        def onInfo(info):
+            if (not correct(info["pv"][0])):
+                solution.clear()
+            elif (not solution):
+                solution.update(time=info["time"], nodes=info["nodes"], depth=info["depth"])
+        self.opponent.onInfo = onInfo
+
+        start = time.perf_counter()
+        self.opponent.nodes = 0
+        self.opponent.info = []  # Only search() refills it, a book or only move mustn't report the last position's
+        move = self.opponent.getMove(legalMoves)
+        elapsed = time.perf_counter() - start
+        name = move.coordinates() if (move) else "0000"
+        solved = bool(move) and correct(name) and bool(best or avoid)
+        if (solved and not solution):  # Only move, no search was needed
+            solution.update(time=elapsed, nodes=self.opponent.nodes, depth=0)
+
+        return {
+            "id": operations.get("id", [str(number)])[0],
+            "solved": solved,
+            "move": name,
+            "expected": {"bm": best, "am": avoid},
+            "time": elapsed,
+            "nodes": self.opponent.nodes,
+            "depth": self.opponent.info[-1]["depth"] if (self.opponent.info) else 0,
+            "solvedTime": solution.get("time") if (solved) else None,
+            "solvedNodes": solution.get("nodes") if (solved) else None,
+            "solvedDepth": solution.get("depth") if (solved) else None,
+            "error": None
+        }
+
+    def run(self, path, output=None):
+        """
+        Runs every position of a suite, printing each result as it finishes
+        :param path: str (EPD file)
+        :param output: str (JSON lines file each result is appended to, None to skip)
+        :return: dict (summary, see summary())
+        """
+        self.results = []
+        resultFile = open(output, "a") if (output) else None
+        try:
+            for number, line in readEPD(path):
+                operations = {}
+                try:
+                    fenString, operations = parseEPD(line)
+                    result = self.solve(number, fenString, operations)
+                except ValueError as error:
+                    result = errorResult(number, operations, str(error))
+                self.results.append(result)
+                if (resultFile):
+                    resultFile.write(json.dumps(result) + "\n")
+                    resultFile.flush()
+                if (result["error"]):
+                    print(f"{result['id']:<12} ERROR  {result['error']}")
+                    continue
+                status = f"solved in {result['solvedTime']:.2f}s" if (result["solved"]) else "FAILED"
+                print(f"{result['id']:<12} {result['move']:<6} {status:<18} depth {result['depth']:<3} "
+                      f"nodes {result['nodes']}")
+        finally:
+            if (resultFile):
+                resultFile.close()
+        return self.summary()
+
+    def summary(self):
+        """
+        :return: dict (positions, solved, positions that couldn't be searched, solve rate, mean and total time to
+            solution of the solved positions, nodes and time over every position, nps)
+        """
+        solved = [result for result in self.results if (result["solved"])]
+        totalTime = sum(result["time"] for result in self.results)
+        totalNodes = sum(result["nodes"] for result in self.results)
+        solvedTime = sum(result["solvedTime"] for result in solved)
+        return {
+            "positions": len(self.results),
+            "solved": len(solved),
+            "errors": sum(1 for result in self.results if (result["error"])),
+            "solveRate": len(solved) / len(self.results) if (self.results) else 0.0,
+            "meanTimeToSolution": solvedTime / len(solved) if (solved) else 0.0,
+            "totalTimeToSolution": solvedTime,
+            "nodes": totalNodes,
+            "time": totalTime,
+            "nps": int(totalNodes / totalTime) if (totalTime) else 0
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run an EPD test suite")
+    parser.add_argument("suite", help="EPD file with bm and/or am operations")
+    parser.add_argument("--time", type=float, default=5.0, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes per position")
+    parser.add_argument("--depth", type=int, default=64, help="maximum depth")
+    parser.add_argument("--hash", type=int, default=16, help="hash table size in megabytes")
+    parser.add_argument("--output", help="JSON lines file each result is appended to")
+    args = parser.parse_args()
+
+    runner = SuiteRunner(args.time, args.nodes, args.depth, args.hash)
+    print(json.dumps(runner.run(args.suite, args.output), indent=2))
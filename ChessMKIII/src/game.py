@@ -1,36 +1,59 @@
 # game.py
 from board import Board, Colour
 from engine import Engine, Move
+from instrumentation import EngineStats, profileCall
+from notation import toSAN
 from opponent import Opponent
+from worker import SearchWorker
 import pygame
-
-pygame.init()
+import sys
+import time
 
 # --- Screen Variables --- #
 frame = True
 w, h = 800, 800
 caption = "Chess"
-fps = 60
-
-if frame:
-    screen = pygame.display.set_mode((w, h))
-else:
-    screen = pygame.display.set_mode((w, h), pygame.NOFRAME)
-
-pygame.display.set_caption(caption)
-pygame.display.set_icon(pygame.image.load("ChessMKIII/src/assets/CHESSICON.png"))
+fps = 60  # Frame rate cap, and the polling rate when not event driven
+idleTimeout = 1000  # Longest wait for an event in milliseconds, when event driven
 
-clock = pygame.time.Clock()
+SEARCH_EVENT = pygame.USEREVENT + 1  # Posted by the search worker, wakes the loop to collect its messages
 
 
 # --- Main Game Class --- #
 class Game:
-    def __init__(self):
+    def __init__(self, eventDriven=True, statsPath=None, profilePath=None):
+        """
+        :param eventDriven: bool (sleep until there is input while idle, instead of polling at a fixed frame rate)
+        :param statsPath: str (file engine and frame statistics are written to as JSON when the game closes, None to
+            leave the engine uninstrumented)
+        :param profilePath: str (file a cProfile and tracemalloc report of every computer move is appended to, None
+            for no profiling)
+        """
+        # --- Display --- #
+        # Set up here rather than on import, so importing the game doesn't open a window
+        pygame.init()
+        if frame:
+            self.screen = pygame.display.set_mode((w, h))
+        else:
+            self.screen = pygame.display.set_mode((w, h), pygame.NOFRAME)
+
+        pygame.display.set_caption(caption)
+        pygame.display.set_icon(pygame.image.load("ChessMKIII/src/assets/CHESSICON.png"))
+
+        self.clock = pygame.time.Clock()
+
         self.running = True
         self.singlePlayer = True
+        self.eventDriven = eventDriven
+        self.needsRedraw = True  # Set by anything that changes what is on screen
+
+        # --- Frame Timing --- #
+        self.frames = 0
+        self.frameTime = 0.0  # Seconds spent drawing, across all frames
+        self.longestFrame = 0.0
 
         # --- ChessBoard --- #
-        self.board = Board(screen)
+        self.board = Board(self.screen)
         self.fileTranslations = {
             0: "a",
             1: "b",
@@ -53,6 +76,11 @@ class Game:
         }
         self.pieceOffset = w // (w // 50)
 
+        # Translucent square drawn over the kings, made once rather than every frame
+        self.checkSurface = pygame.Surface((self.board.squareSize, self.board.squareSize))
+        self.checkSurface.set_alpha(100)  # Transparency value 0 --> High, 255 --> None
+        self.checkSurface.fill(Colour.HIGHLIGHT_CHECK)
+
         # --- Player --- #
         self.holding = False
         self.heldPiece = None
@@ -71,7 +99,22 @@ class Game:
         self.whiteInCheck = False
         self.blackInCheck = False
 
-        self.opponent = Opponent()
+        self.opponent = Opponent(self.engine)
+
+        # --- Instrumentation --- #
+        self.statsPath = statsPath
+        self.stats = EngineStats() if (statsPath) else None
+        if (self.stats):
+            self.stats.enable()
+        if (profilePath):
+            open(profilePath, "w").close()  # Each computer move's report is appended
+            getMove = self.opponent.getMove
+            self.opponent.getMove = lambda legal: profileCall(profilePath, getMove, legal, append=True)
+
+        # The opponent searches on a background thread, searchId is the search whose result the game is waiting on
+        self.worker = SearchWorker(self.opponent, notify=lambda: pygame.event.post(pygame.event.Event(SEARCH_EVENT)))
+        self.searchId = None
+        self.failedKey = None  # Zobrist key of the position the last search failed on, it isn't searched again
 
     def highlightLegalMoves(self, rank, file):
         """
@@ -79,19 +122,21 @@ class Game:
         :param rank, file: location of the piece on the board
         :return: None
         """
-        pygame.draw.rect(screen, Colour.DARK_GREY, ((file * self.board.squareSize),
-                                                    (rank * self.board.squareSize),
-                                                    self.board.squareSize, self.board.squareSize), w // 256)
+        self.board.addOverlay(pygame.draw.rect(self.screen, Colour.DARK_GREY, ((file * self.board.squareSize),
+                                                                               (rank * self.board.squareSize),
+                                                                               self.board.squareSize,
+                                                                               self.board.squareSize), w // 256))
 
         # Circles
         # Highlight Moves
         if (self.legalMoves):
             for move in self.legalMoves:
                 if (move.startFile == file and move.startRank == rank):
-                    pygame.draw.circle(screen, Colour.HIGHLIGHT_COLOUR,
-                                       ((move.endFile * self.board.squareSize + self.board.squareSize / 2),
-                                        (move.endRank * self.board.squareSize + self.board.squareSize / 2)),
-                                       self.board.squareSize / 6)
+                    self.board.addOverlay(pygame.draw.circle(
+                        self.screen, Colour.HIGHLIGHT_COLOUR,
+                        ((move.endFile * self.board.squareSize + self.board.squareSize / 2),
+                         (move.endRank * self.board.squareSize + self.board.squareSize / 2)),
+                        self.board.squareSize / 6))
 
     def highlightChecks(self, move):
         """
@@ -100,38 +145,124 @@ class Game:
         :param move: Move Object
         :return: None
         """
-
-        surface = pygame.Surface((self.board.squareSize, self.board.squareSize))
-        surface.set_alpha(100)  # Transparency value 0 --> High, 255 --> None
-        surface.fill(Colour.HIGHLIGHT_CHECK)
-        screen.blit(surface, (self.engine.blackKingCoords[1] * self.board.squareSize,
-                                self.engine.blackKingCoords[0] * self.board.squareSize))
-        
-        surface = pygame.Surface((self.board.squareSize, self.board.squareSize))
-        surface.set_alpha(100)  # Transparency value 0 --> High, 255 --> None
-        surface.fill(Colour.HIGHLIGHT_CHECK)
-        screen.blit(surface, (self.engine.whiteKingCoords[1] * self.board.squareSize,
-                                self.engine.whiteKingCoords[0] * self.board.squareSize))
+        for rank, file in (self.engine.blackKingCoords, self.engine.whiteKingCoords):
+            position = (file * self.board.squareSize, rank * self.board.squareSize)
+            self.board.addOverlay(self.screen.blit(self.checkSurface, position))
 
     def draw(self, startRank, startFile):
         """
         Draws the board
         :return: None
         """
+        frameStart = time.perf_counter()
         self.board.drawGame(self.engine.virtualBoard)
 
         if (self.holding and self.heldPiece != "0"):
-                mousePos = pygame.mouse.get_pos()
-                screen.blit(self.board.images[self.heldPiece], pygame.Rect(mousePos[0] - self.pieceOffset,
-                                                                           mousePos[1] - self.pieceOffset,
-                                                                           self.board.squareSize,
-                                                                           self.board.squareSize))
-                self.highlightLegalMoves(startRank, startFile)
-                if (self.engine.moveLog):
-                    self.highlightChecks(self.engine.moveLog[-1])
-
-        pygame.display.update()
-        clock.tick(fps)
+            mousePos = pygame.mouse.get_pos()
+            self.board.addOverlay(self.screen.blit(self.board.images[self.heldPiece],
+                                                   pygame.Rect(mousePos[0] - self.pieceOffset,
+                                                               mousePos[1] - self.pieceOffset,
+                                                               self.board.squareSize,
+                                                               self.board.squareSize)))
+            self.highlightLegalMoves(startRank, startFile)
+            if (self.engine.moveLog):
+                self.highlightChecks(self.engine.moveLog[-1])
+
+        # Only the squares that changed are pushed to the display
+        self.board.present()
+
+        elapsed = time.perf_counter() - frameStart
+        self.frames += 1
+        self.frameTime += elapsed
+        self.longestFrame = max(self.longestFrame, elapsed)
+        self.clock.tick(fps)
+
+    def frameStats(self):
+        """
+        Drawing statistics for the session, to check the game is not redrawing while idle
+        :return: dict
+        """
+        return {
+            "frames": self.frames,
+            "averageMs": self.frameTime / self.frames * 1000 if (self.frames) else 0.0,
+            "longestMs": self.longestFrame * 1000,
+            "drawSeconds": self.frameTime
+        }
+
+    def getEvents(self, waiting):
+        """
+        Collects the events to handle this iteration. When event driven and waiting on the human, the loop sleeps in
+        pygame.event.wait until an event arrives (or the idle timeout passes), otherwise it just drains the queue.
+        :param waiting: bool (True if the game is waiting on the human player)
+        :return: arr (list of pygame events)
+        """
+        if (self.eventDriven and waiting and not self.needsRedraw):
+            event = pygame.event.wait(idleTimeout)
+            if (event.type == pygame.NOEVENT):
+                return []
+            return [event] + pygame.event.get()
+        return pygame.event.get()
+
+    # --- Computer Opponent --- #
+    def startSearch(self):
+        """
+        Starts the opponent thinking about the current position
+        :return: None
+        """
+        self.searchId = self.worker.start(self.engine)
+        pygame.display.set_caption(f"{caption} - thinking")
+
+    def cancelSearch(self):
+        """
+        Stops the opponent thinking, the position is about to change under it
+        :return: None
+        """
+        if (self.searchId is not None):
+            self.worker.cancel()
+            self.searchId = None
+            pygame.display.set_caption(caption)
+
+    def handleSearchMessage(self, message):
+        """
+        Shows the search's progress, or plays its move. A move is only played if it belongs to the search the game
+        is waiting on and the position is still the one that was searched.
+        :param message: tuple (message from SearchWorker.poll)
+        :return: None
+        """
+        kind, searchId = message[0], message[1]
+        if (searchId != self.searchId):
+            return
+
+        if (kind == "info"):
+            info = message[2]
+            pygame.display.set_caption(f"{caption} - thinking (depth {info['depth']}, score {info['score']}, "
+                                       f"{' '.join(info['pv'][:3])})")
+        elif (kind == "error"):
+            print(message[2], file=sys.stderr)
+            self.failedKey = self.engine.hash
+        elif (kind == "move"):
+            move, key = message[2], message[3]
+            self.searchId = None
+            pygame.display.set_caption(caption if (self.failedKey != key) else f"{caption} - search failed")
+            if (move and key == self.engine.hash and move in self.legalMoves):
+                self.playMove(move)
+
+    def playMove(self, move):
+        """
+        Makes a move and prints it in SAN, so the console shows the game's movetext (pgn.engineGame turns the whole
+        game into a PGN record)
+        :param move: Move (legal move in the current position)
+        :return: None
+        """
+        san = toSAN(self.engine, move, self.legalMoves)
+        if (self.engine.whiteToMove):
+            print(f"{self.engine.fullmoveNumber}. {san}", end=" ", flush=True)
+        elif (not self.engine.moveLog):
+            print(f"{self.engine.fullmoveNumber}... {san}")
+        else:
+            print(san)
+        self.engine.makeMove(move)
+        self.moveMade = True
 
     def run(self):
         """
@@ -141,26 +272,42 @@ class Game:
         startRank = startFile = -1
 
         while (self.running):
-            self.draw(startRank, startFile)
-                        
+            if (self.needsRedraw or not self.eventDriven):
+                self.draw(startRank, startFile)
+                self.needsRedraw = False
+
             humanTurn = (self.engine.whiteToMove and self.whitePlayer) or (not self.engine.whiteToMove and self.blackPlayer) if (self.singlePlayer) else True
 
-            for event in pygame.event.get():
+            # With no legal moves left nobody is to move, so wait for a takeback or reset like on the human's turn.
+            # While the opponent thinks, its messages arrive as events too.
+            for event in self.getEvents(humanTurn or not self.legalMoves or self.searchId is not None):
+                # Pointer movement only changes the screen while a piece is being dragged
+                if (event.type != pygame.MOUSEMOTION or self.holding):
+                    self.needsRedraw = True
+
                 if (event.type == pygame.QUIT):
                     self.running = False
+                if (event.type == SEARCH_EVENT):
+                    for message in self.worker.poll():
+                        self.handleSearchMessage(message)
+                if (event.type == pygame.VIDEOEXPOSE):  # The window was uncovered, the whole board needs redrawing
+                    self.board.invalidate()
                 if (event.type == pygame.KEYDOWN):
                     # --- Key Events --- #
                     if (event.key == pygame.K_ESCAPE):
                         self.running = False
 
                     if (event.key == pygame.K_LEFT):
+                        self.cancelSearch()
                         self.engine.takeback()
                         self.moveMade = True
 
                     if (event.key == pygame.K_r):
+                        self.cancelSearch()
                         for i in range(len(self.engine.moveLog)):
                             self.engine.takeback()
                             self.moveMade = True
+                        self.worker.newGame()
 
                 # --- Piece Movement --- #
                 if (humanTurn):
@@ -192,32 +339,30 @@ class Game:
                                 currentMove = Move(startRank, startFile, endRank, endFile, self.engine.virtualBoard)
 
                                 if (currentMove in self.legalMoves):
-                                    self.engine.makeMove(currentMove)
-                                    self.moveMade = True
-
-                                    if (self.whiteInCheck or self.blackInCheck):
-                                        print(f"CHECK! {self.fileTranslations[endFile]}{self.rankTranslations[endRank]}+")
-                                    else:
-                                        if (not self.engine.whiteToMove):
-                                            print(f"{(len(self.engine.moveLog) + 1) // 2}. {currentMove}", end=", ")
-                                        else:
-                                            print(f"{currentMove}")
+                                    self.playMove(currentMove)
 
                             self.heldPiece = None
 
-                else:
-                    computerMove = self.opponent.getMove(self.legalMoves)
-                    if (computerMove):
-                        self.engine.makeMove(computerMove)
-                        self.moveMade = True
-                    else:
-                        print("checkmate")
+            # --- Computer Move --- #
+            if (not humanTurn and self.running and self.legalMoves and self.searchId is None and not self.moveMade
+                    and self.engine.hash != self.failedKey):
+                self.startSearch()
 
             if (self.moveMade):
                 # Check for legal moves
                 self.legalMoves = self.engine.findLegalMoves()
                 self.moveMade = False
+                self.needsRedraw = True
+                if (not self.legalMoves):
+                    print("checkmate" if (self.engine.inCheck()) else "stalemate")
                 # print(f"White\nCoords: {self.engine.whiteKingCoords}\nBlack\nCoords: {self.engine.blackKingCoords}\n")
-                # print(f"W: {self.engine.whiteCastling} B: {self.engine.blackCastling}\n")
+                # print(f"Castling: {self.engine.castlingRights:04b}\n")
 
+        self.cancelSearch()
+        self.worker.close()
         pygame.quit()
+
+        if (self.stats):
+            self.stats.disable()
+            self.stats.dump(self.statsPath, {"frames": self.frameStats()})
+            print(self.stats.report())
@@ -0,0 +1,278 @@
+# instrumentation.py
+"""
+Shows where the engine spends its time. EngineStats counts the calls to, and the time spent in, the engine's hot
+methods, and adds up the search statistics (nodes, cutoffs, hash and pawn table hits) of every search made while
+it is on:
+
+    with EngineStats() as stats:
+        opponent.getMove(legalMoves)
+    stats.dump("stats.json")
+
+It works by swapping counting wrappers onto the classes while enabled and putting the original methods back
+afterwards, so while it's off the engine runs its normal code and pays nothing. Times are inclusive (makeMove
+calls made by generateMoves count towards both), and counts from the UI and search threads share the same
+counters, unlocked, so they can be a call or two out.
+
+profileCall and profileSearch run a call under cProfile, and tracemalloc, and write the report to a file.
+"""
+from engine import Engine, Move
+from opponent import Opponent
+import evaluation
+import cProfile
+import functools
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+# Methods counted, as (owner, attribute name)
+TARGETS = (
+    (Engine, "findLegalMoves"),
+    (Engine, "findPieceLegalMoves"),
+    (Engine, "generateMoves"),
+    (Engine, "squareUnderAttack"),
+    (Engine, "isSquareAttacked"),
+    (Engine, "makeMove"),
+    (Engine, "takeback"),
+    (Move, "__init__"),
+    (evaluation, "evaluate")
+)
+
+SEARCH_COUNTERS = ("searches", "nodes", "time", "cutoffs", "firstMoveCutoffs", "hashProbes", "hashHits",
+                   "pawnProbes", "pawnHits")
+
+active = None  # The EngineStats that is enabled, only one can be at a time as the wrappers are installed globally
+
+
+class EngineStats:
+    """
+    Call counts and times for the engine's hot methods, and search totals, gathered while enabled
+    """
+    def __init__(self, timing=True):
+        """
+        :param timing: bool (time every call as well as counting it, counting alone costs less)
+        """
+        self.timing = timing
+        self.counters = {}  # Method name: [calls, seconds]
+        self.search = dict.fromkeys(SEARCH_COUNTERS, 0)
+        self.originals = []  # (owner, attribute, original) of the wrappers installed
+        self.enabledAt = None
+        self.enabledSeconds = 0.0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.disable()
+        return False
+
+    @staticmethod
+    def methodName(owner, attribute):
+        """
+        :param owner: class or module
+        :param attribute: str
+        :return: str (e.g. "Engine.makeMove")
+        """
+        return f"{owner.__name__}.{attribute}"
+
+    def enable(self):
+        """
+        Installs the counting wrappers
+        :return: None
+        """
+        global active
+        if (active is self):
+            return
+        if (active is not None):
+            raise RuntimeError("Another EngineStats is already enabled")
+        for owner, attribute in TARGETS:
+            original = getattr(owner, attribute)
+            setattr(owner, attribute, self.wrap(original, self.methodName(owner, attribute)))
+            self.originals.append((owner, attribute, original))
+        self.originals.append((Opponent, "search", Opponent.search))
+        Opponent.search = self.wrapSearch(Opponent.search)
+        active = self
+        self.enabledAt = time.perf_counter()
+
+    def disable(self):
+        """
+        Puts the original methods back, the counts are kept
+        :return: None
+        """
+        global active
+        if (active is not self):
+            return
+        for owner, attribute, original in reversed(self.originals):
+            setattr(owner, attribute, original)
+        self.originals = []
+        active = None
+        self.enabledSeconds += time.perf_counter() - self.enabledAt
+        self.enabledAt = None
+
+    def reset(self):
+        """
+        Zeroes every count
+        :return: None
+        """
+        for counter in self.counters.values():
+            counter[0] = 0
+            counter[1] = 0.0
+        for key in self.search:  # Zeroed in place, the search wrapper holds on to the dict
+            self.search[key] = 0
+        self.enabledSeconds = 0.0
+        if (self.enabledAt is not None):
+            self.enabledAt = time.perf_counter()
+
+    def wrap(self, function, name):
+        """
+        :param function: function (method to count)
+        :param name: str (name the counts are kept under)
+        :return: function (counting version)
+        """
+        counter = self.counters.setdefault(name, [0, 0.0])
+        clock = time.perf_counter
+
+        if (self.timing):
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    counter[0] += 1
+                    counter[1] += clock() - start
+            return functools.update_wrapper(timed, function)
+
+        def counted(*args, **kwargs):
+            counter[0] += 1
+            return function(*args, **kwargs)
+        return functools.update_wrapper(counted, function)
+
+    def wrapSearch(self, search):
+        """
+        :param search: function (Opponent.search)
+        :return: function (version that adds each search's statistics to the totals when it finishes)
+        """
+        totals = self.search
+
+        def recorded(opponent, *args, **kwargs):
+            try:
+                return search(opponent, *args, **kwargs)
+            finally:
+                # The opponent and its tables reset their counters at the start of every search
+                totals["searches"] += 1
+                totals["nodes"] += opponent.nodes
+                totals["time"] += time.perf_counter() - opponent.startTime
+                totals["cutoffs"] += opponent.orderer.cutoffs
+                totals["firstMoveCutoffs"] += opponent.orderer.firstMoveCutoffs
+                totals["hashProbes"] += opponent.table.probes
+                totals["hashHits"] += opponent.table.hits
+                totals["pawnProbes"] += opponent.pawnTable.probes
+                totals["pawnHits"] += opponent.pawnTable.hits
+        return functools.update_wrapper(recorded, search)
+
+    def asDict(self):
+        """
+        :return: dict (per method calls, seconds and microseconds per call, search totals and rates, and the
+            seconds the stats were enabled for)
+        """
+        methods = {}
+        for name, (calls, seconds) in self.counters.items():
+            methods[name] = {"calls": calls}
+            if (self.timing):
+                methods[name].update(seconds=seconds, usPerCall=seconds / calls * 1e6 if (calls) else 0.0)
+
+        search = dict(self.search)
+        search["nps"] = int(search["nodes"] / search["time"]) if (search["time"]) else 0
+        search["firstMoveRate"] = search["firstMoveCutoffs"] / search["cutoffs"] if (search["cutoffs"]) else 0.0
+        search["hashHitRate"] = search["hashHits"] / search["hashProbes"] if (search["hashProbes"]) else 0.0
+        search["pawnHitRate"] = search["pawnHits"] / search["pawnProbes"] if (search["pawnProbes"]) else 0.0
+
+        enabledSeconds = self.enabledSeconds
+        if (self.enabledAt is not None):
+            enabledSeconds += time.perf_counter() - self.enabledAt
+        return {"enabledSeconds": enabledSeconds, "timing": self.timing, "methods": methods, "search": search}
+
+    def dump(self, path, extra=None):
+        """
+        Writes the statistics as JSON
+        :param path: str (file to write)
+        :param extra: dict (more sections to add, e.g. frame timings)
+        :return: None
+        """
+        stats = self.asDict()
+        stats.update(extra or {})
+        with open(path, "w") as file:
+            json.dump(stats, file, indent=2)
+
+    def report(self):
+        """
+        :return: str (table of the method counts, busiest first, and the search totals)
+        """
+        stats = self.asDict()
+        lines = [f"{'method':<30} {'calls':>12} {'seconds':>10} {'us/call':>9}"]
+        busiest = sorted(stats["methods"].items(), key=lambda item: -item[1].get("seconds", item[1]["calls"]))
+        for name, method in busiest:
+            lines.append(f"{name:<30} {method['calls']:>12} {method.get('seconds', 0.0):>10.3f} "
+                         f"{method.get('usPerCall', 0.0):>9.2f}")
+        search = stats["search"]
+        lines.append(f"searches {search['searches']}  nodes {search['nodes']}  nps {search['nps']}  "
+                     f"fmc {search['firstMoveRate']:.2f}  hash hits {search['hashHitRate']:.2f}  "
+                     f"pawn hits {search['pawnHitRate']:.2f}")
+        return "\n".join(lines)
+
+
+# --- Profiling --- #
+def profileCall(path, function, *args, memory=True, sortBy="cumulative", limit=40, append=False, **kwargs):
+    """
+    Runs a call under cProfile, and tracemalloc if memory is True, and writes both reports to a file. cProfile only
+    sees the thread it's called from.
+    :param path: str (report file)
+    :param function: function (to call with the remaining arguments)
+    :param memory: bool (trace allocations too, slows the call down a lot more than cProfile)
+    :param sortBy: str (pstats sort key for the profile)
+    :param limit: int (functions and allocation sites listed)
+    :param append: bool (add to the end of the report file rather than replacing it)
+    :return: the call's return value
+    """
+    profiler = cProfile.Profile()
+    tracing = memory and not tracemalloc.is_tracing()
+    if (tracing):
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        elapsed = time.perf_counter() - start
+        report = io.StringIO()
+        report.write(f"=== {getattr(function, '__qualname__', function)} {elapsed:.3f}s "
+                     f"at {time.strftime('%Y-%m-%d %H:%M:%S')} ===\n")
+        pstats.Stats(profiler, stream=report).sort_stats(sortBy).print_stats(limit)
+        if (memory):
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            report.write(f"memory: {current / 1024:.1f} KiB now, {peak / 1024:.1f} KiB peak\n")
+            for line in snapshot.statistics("lineno")[:limit]:
+                report.write(f"{line}\n")
+            if (tracing):
+                tracemalloc.stop()
+        with open(path, "a" if (append) else "w") as file:
+            file.write(report.getvalue() + "\n")
+
+
+def profileSearch(opponent, legalMoves, path, memory=True, append=False):
+    """
+    Profiles one move choice of an opponent
+    :param opponent: Opponent (on the position to search)
+    :param legalMoves: arr (legal moves in the position)
+    :param path: str (report file)
+    :param memory: bool (trace allocations too)
+    :param append: bool (add to the end of the report file rather than replacing it)
+    :return: Move (the move chosen)
+    """
+    return profileCall(path, opponent.getMove, legalMoves, memory=memory, append=append)
@@ -1,7 +1,14 @@
 from game import Game
+import argparse
 
 
 if __name__ == '__main__':
-    chess = Game()
+    parser = argparse.ArgumentParser(description="Play chess against the engine")
+    parser.add_argument("--stats",
+                        help="JSON file the engine call counts, timings and search totals are written to on exit")
+    parser.add_argument("--profile", help="file a cProfile and tracemalloc report of every computer move is written to")
+    args = parser.parse_args()
+
+    chess = Game(statsPath=args.stats, profilePath=args.profile)
     chess.run()
     quit()
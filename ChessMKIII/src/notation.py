@@ -0,0 +1,113 @@
+# notation.py
+"""
+Standard Algebraic Notation (SAN), the move names used by EPD and PGN files, e.g. "Nf3", "exd5", "O-O", "e8=Q+".
+"""
+from engine import FILE_LETTERS, PIECE_LETTERS
+from bitboard import PAWN, EMPTY
+
+ANNOTATIONS = "+#!?"
+
+
+def squareName(square):
+    """
+    :param square: int (square index)
+    :return: str (e.g. "e4")
+    """
+    return f"{FILE_LETTERS[square & 7]}{8 - (square >> 3)}"
+
+
+def toSAN(engine, move, legalMoves=None):
+    """
+    Names a move in SAN, with the file, rank or square it moves from added when another piece of the same type
+    could move to the same square, and + or # when it gives check or mate
+    :param engine: Engine (position before the move, left unchanged)
+    :param move: Move (legal move in the position)
+    :param legalMoves: arr (legal moves in the position, generated if None)
+    :return: str (SAN of the move)
+    """
+    if (legalMoves is None):
+        legalMoves = engine.findLegalMoves()
+    pieceType = move.pieceMoved % 6
+
+    if (move.isCastle):
+        san = "O-O" if (move.end & 7 == 6) else "O-O-O"
+    elif (pieceType == PAWN):
+        san = ""
+        if (move.pieceCaptured != EMPTY):
+            san = FILE_LETTERS[move.start & 7] + "x"
+        san += squareName(move.end)
+        if (move.promotionPiece is not None):
+            san += "=" + PIECE_LETTERS[move.promotionPiece]
+    else:
+        # Other pieces of the same type that could go to the same square
+        rivals = [other.start for other in legalMoves if (other.pieceMoved == move.pieceMoved
+                                                           and other.end == move.end and other.start != move.start)]
+        origin = ""
+        if (rivals):
+            if (all((start & 7) != (move.start & 7) for start in rivals)):
+                origin = FILE_LETTERS[move.start & 7]
+            elif (all((start >> 3) != (move.start >> 3) for start in rivals)):
+                origin = str(8 - (move.start >> 3))
+            else:
+                origin = squareName(move.start)
+        capture = "x" if (move.pieceCaptured != EMPTY) else ""
+        san = PIECE_LETTERS[pieceType] + origin + capture + squareName(move.end)
+
+    engine.makeMove(move)
+    if (engine.inCheck()):
+        san += "#" if (not engine.findLegalMoves()) else "+"
+    engine.takeback()
+    return san
+
+
+def parseSAN(engine, text, legalMoves=None):
+    """
+    Finds the legal move a SAN string names. Check marks, annotations and a missing "=" before the promotion piece
+    are tolerated, and so is coordinate notation ("e2e4").
+    :param engine: Engine (position the move is played in)
+    :param text: str (move name)
+    :param legalMoves: arr (legal moves in the position, generated if None)
+    :return: Move (the move named) or None if no legal move, or more than one, matches
+    """
+    if (legalMoves is None):
+        legalMoves = engine.findLegalMoves()
+    text = text.strip().rstrip(ANNOTATIONS).replace("0", "O")
+
+    # Castling
+    if (text in ("O-O", "O-O-O")):
+        kingside = text == "O-O"
+        for move in legalMoves:
+            if (move.isCastle and (move.end & 7 == 6) == kingside):
+                return move
+        return None
+
+    # Coordinate notation
+    lowered = text.lower()
+    for move in legalMoves:
+        if (move.coordinates() == lowered):
+            return move
+
+    # Promotion
+    promotion = None
+    if (text[-1:] in "NBRQ" and len(text) > 2 and (text[-2] == "=" or text[-2].isdigit())):
+        promotion = PIECE_LETTERS.index(text[-1])
+        text = text[:-1].rstrip("=")
+
+    pieceType = PAWN
+    if (text[:1] and text[:1] in "NBRQK"):
+        pieceType = PIECE_LETTERS.index(text[0])
+        text = text[1:]
+    text = text.replace("x", "").replace("-", "")
+    if (len(text) < 2 or text[-2] not in FILE_LETTERS or text[-1] not in "12345678"):
+        return None
+    end = (8 - int(text[-1])) * 8 + FILE_LETTERS.index(text[-2])
+    origin = text[:-2]  # Disambiguating file, rank or square
+
+    matches = []
+    for move in legalMoves:
+        if (move.end != end or move.pieceMoved % 6 != pieceType or move.promotionPiece != promotion):
+            continue
+        start = squareName(move.start)
+        if (all(char in start for char in origin)):
+            matches.append(move)
+    return matches[0] if (len(matches) == 1) else None
@@ -1,22 +1,355 @@
 # opponent.py
+from bitboard import EMPTY
+from transposition import TranspositionTable, EXACT, LOWER, UPPER, encodeMove
+from ordering import MoveOrderer
+from pawns import PawnTable
+from tablebase import MAX_PIECES, WIN, LOSS
+import evaluation
 import random
+import time
+
+# --- Search Constants --- #
+MATE_SCORE = 100000  # Mate in n plies scores MATE_SCORE - n
+MATE_BOUND = MATE_SCORE - 1000  # Scores beyond this are mates
+INFINITY = 1000000
+CHECK_INTERVAL = 128  # Nodes between clock and stop checks, a few milliseconds at this engine's speed
+ITERATION_CUTOFF = 0.5  # Share of the time budget after which no new iteration is started, as it wouldn't finish
+
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when the time or node budget runs out, or stop() is called
+    """
+    pass
 
 
 class Opponent:
     """
     Opponent to play against
     Lvl 1: Random moves
+    Lvl 2: Negamax alpha-beta search with iterative deepening
     """
-    def __init__(self):
-        pass
+    def __init__(self, engine=None, level=2, timeLimit=1.0, nodeLimit=None, maxDepth=64, onInfo=None, hashSizeMb=16,
+                 table=None, book=None, tablebases=None):
+        """
+        :param engine: Engine (position to search, moves are made and taken back on it during the search)
+        :param level: int (1 plays random moves, 2 searches)
+        :param timeLimit: float (seconds per move, None for no limit)
+        :param nodeLimit: int (nodes per move, None for no limit)
+        :param maxDepth: int (deepest iteration to start)
+        :param onInfo: function (called with a dict after every completed iteration, prints it if None)
+        :param hashSizeMb: int (memory budget of the transposition table)
+        :param table: TranspositionTable (table to use instead of allocating one, e.g. one shared between processes)
+        :param book: OpeningBook (book moves are played without searching while the position is in it, None for
+            no book)
+        :param tablebases: Tablebases (endgame tables probed once few enough pieces are left, None for none)
+        """
+        self.engine = engine
+        self.level = level if (engine) else 1
+        self.timeLimit = timeLimit
+        self.nodeLimit = nodeLimit
+        self.maxDepth = maxDepth
+        self.onInfo = onInfo
+        self.table = table
+        if (self.table is None and self.level > 1):
+            self.table = TranspositionTable(hashSizeMb)
+        self.orderer = MoveOrderer()
+        self.pawnTable = PawnTable()
+        self.book = book
+        self.tablebases = tablebases
+
+        # --- Search State --- #
+        self.nodes = 0
+        self.startTime = 0.0
+        self.stopped = False
+        self.info = []  # Reports of the completed iterations of the last search
 
     def getMove(self, legal):
         """
-        Chooses a random legal move to play
+        Chooses a legal move to play
         :param legal: arr (list of legal moves in the current position)
         :return move: move object (computer's move, False if no legal moves found)
         """
-        n = len(legal) - 1
-        if (n > 0):
+        if (not legal):
+            return False
+        if (len(legal) == 1):
+            return legal[0]
+        if (self.book and self.engine):
+            move = self.book.pickMove(self.engine, legal)
+            if (move):
+                return move
+        if (self.level == 1):
             return legal[random.randint(0, len(legal) - 1)]
-        return False
+        return self.search(legal)
+
+    def newGame(self):
+        """
+        Forgets everything learned from the previous game
+        :return: None
+        """
+        if (self.table):
+            self.table.clear()
+        self.orderer.clear()
+
+    def stop(self):
+        """
+        Asks a running search to finish, it returns the best move of the last completed iteration
+        :return: None
+        """
+        self.stopped = True
+
+    # --- Search --- #
+    def search(self, rootMoves, startDepth=1):
+        """
+        Iterative deepening: searches to depth 1, 2, 3... until the time or node budget runs out, searching the
+        best move of the previous iteration first each time
+        :param rootMoves: arr (legal moves in the current position)
+        :param startDepth: int (depth of the first iteration, parallel helpers start at different depths)
+        :return bestMove: Move (best move of the deepest completed iteration)
+        """
+        self.nodes = 0
+        self.startTime = time.perf_counter()
+        self.stopped = False
+        self.info = []
+        self.table.newSearch()
+        self.table.resetStats()
+        self.orderer.newSearch()
+        self.orderer.resetStats()
+        self.pawnTable.resetStats()
+
+        rootMoves = self.orderer.orderMoves(list(rootMoves), 0, self.engine.whiteToMove)
+        bestMove = rootMoves[0]
+
+        for depth in range(startDepth, self.maxDepth + 1):
+            pv = []
+            try:
+                score = self.searchRoot(rootMoves, depth, pv)
+            except SearchAborted:
+                break
+
+            bestMove = pv[0]
+            rootMoves.remove(bestMove)
+            rootMoves.insert(0, bestMove)
+            self.report(depth, score, pv)
+
+            # A forced mate has been found, searching deeper won't change the move
+            if (abs(score) >= MATE_BOUND):
+                break
+            # Each iteration takes several times as long as the last, one started this late would only be aborted
+            elapsed = time.perf_counter() - self.startTime
+            if (self.timeLimit is not None and elapsed >= self.timeLimit * ITERATION_CUTOFF):
+                break
+
+        return bestMove
+
+    def searchRoot(self, rootMoves, depth, pv):
+        """
+        Searches every root move to the given depth
+        :param rootMoves: arr (legal moves in the current position, the move searched first goes first)
+        :param depth: int (plies to search)
+        :param pv: arr (filled with the principal variation)
+        :return alpha: int (score of the best move, from the point of view of the player to move)
+        """
+        alpha = -INFINITY
+        for move in rootMoves:
+            childPv = []
+            self.engine.makeMove(move)
+            try:
+                score = -self.negamax(depth - 1, -INFINITY, -alpha, 1, childPv)
+            finally:
+                self.engine.takeback()
+
+            if (score > alpha):
+                alpha = score
+                pv[:] = [move] + childPv
+        return alpha
+
+    def negamax(self, depth, alpha, beta, ply, pv):
+        """
+        Alpha-beta search, scores are always from the point of view of the player to move
+        :param depth: int (plies left to search)
+        :param alpha: int (score the player to move is already guaranteed)
+        :param beta: int (score the opponent is already guaranteed, anything at or above it is refuted)
+        :param ply: int (distance from the root)
+        :param pv: arr (filled with the principal variation from this node)
+        :return best: int (score of the position)
+        """
+        engine = self.engine
+        if (engine.halfmoveClock >= 100 or engine.isRepetition()):
+            return 0
+
+        # --- Endgame Tables --- #
+        if (self.tablebases and ply > 0 and engine.occupied.bit_count() <= MAX_PIECES):
+            entry = self.tablebases.probe(engine)
+            if (entry):
+                result, dtm = entry
+                if (result == WIN):
+                    return MATE_SCORE - ply - dtm
+                if (result == LOSS):
+                    return -MATE_SCORE + ply + dtm
+                return 0
+
+        if (depth <= 0):
+            return self.quiescence(alpha, beta, ply)
+
+        self.countNode()
+
+        # --- Transposition Table --- #
+        hashMove = 0
+        entry = self.table.probe(engine.hash)
+        if (entry):
+            entryDepth, bound, score, hashMove = entry
+            if (entryDepth >= depth):
+                score = self.scoreFromTable(score, ply)
+                if (bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha)):
+                    return score
+
+        moves = engine.findLegalMoves()
+        if (not moves):
+            return -MATE_SCORE + ply if (engine.inCheck()) else 0
+
+        self.orderer.orderMoves(moves, ply, engine.whiteToMove, hashMove)
+
+        alphaOriginal = alpha
+        best = -INFINITY
+        bestMove = None
+        for index, move in enumerate(moves):
+            childPv = []
+            engine.makeMove(move)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1, childPv)
+            finally:
+                engine.takeback()
+
+            if (score > best):
+                best = score
+                bestMove = move
+                if (score > alpha):
+                    alpha = score
+                    pv[:] = [move] + childPv
+                    if (alpha >= beta):
+                        self.orderer.recordCutoff(move, index, ply, depth, engine.whiteToMove)
+                        break
+
+        if (best >= beta):
+            bound = LOWER
+        elif (best > alphaOriginal):
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.table.store(engine.hash, depth, bound, self.scoreToTable(best, ply),
+                         encodeMove(bestMove) if (bound != UPPER) else 0)
+        return best
+
+    @staticmethod
+    def scoreToTable(score, ply):
+        """
+        Mate scores count plies from the root, the table stores them as plies from the stored position instead
+        :param score: int (search score)
+        :param ply: int (distance from the root)
+        :return: int (score to store)
+        """
+        if (score >= MATE_BOUND):
+            return score + ply
+        if (score <= -MATE_BOUND):
+            return score - ply
+        return score
+
+    @staticmethod
+    def scoreFromTable(score, ply):
+        """
+        Reverses scoreToTable
+        :param score: int (stored score)
+        :param ply: int (distance from the root)
+        :return: int (search score)
+        """
+        if (score >= MATE_BOUND):
+            return score - ply
+        if (score <= -MATE_BOUND):
+            return score + ply
+        return score
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        Searches captures and promotions only, until the position is quiet, so the search doesn't stop in the
+        middle of an exchange
+        :param alpha, beta: int (search window, see negamax)
+        :param ply: int (distance from the root)
+        :return best: int (score of the position)
+        """
+        self.countNode()
+        engine = self.engine
+
+        # The player to move can usually do at least as well as the static score by not capturing
+        best = self.evaluate()
+        if (best >= beta):
+            return best
+        if (best > alpha):
+            alpha = best
+
+        captures = [move for move in engine.findLegalMoves()
+                    if (move.pieceCaptured != EMPTY or move.promotionPiece is not None)]
+        for move in self.orderer.orderCaptures(captures):
+            engine.makeMove(move)
+            try:
+                score = -self.quiescence(-beta, -alpha, ply + 1)
+            finally:
+                engine.takeback()
+
+            if (score > best):
+                best = score
+                if (score > alpha):
+                    alpha = score
+                    if (alpha >= beta):
+                        break
+        return best
+
+    def evaluate(self):
+        """
+        Tapered material, piece-square and pawn structure score, see evaluation.py
+        :return score: int (centipawns, from the point of view of the player to move)
+        """
+        return evaluation.evaluate(self.engine, self.pawnTable)
+
+    def countNode(self):
+        """
+        Counts a node and checks the budget every CHECK_INTERVAL nodes, aborting the search if it has run out
+        :return: None
+        """
+        self.nodes += 1
+        if (self.nodes % CHECK_INTERVAL == 0):
+            if (self.stopped):
+                raise SearchAborted()
+            if (self.nodeLimit is not None and self.nodes >= self.nodeLimit):
+                raise SearchAborted()
+            if (self.timeLimit is not None and time.perf_counter() - self.startTime >= self.timeLimit):
+                raise SearchAborted()
+
+    def report(self, depth, score, pv):
+        """
+        Records (and prints, or hands to onInfo) the result of a completed iteration
+        :param depth: int (depth of the iteration)
+        :param score: int (score of the best move)
+        :param pv: arr (principal variation)
+        :return: None
+        """
+        elapsed = time.perf_counter() - self.startTime
+        info = {
+            "depth": depth,
+            "score": score,
+            "nodes": self.nodes,
+            "time": elapsed,
+            "nps": int(self.nodes / max(elapsed, 1e-9)),
+            "pv": [move.coordinates() for move in pv],
+            "hashfull": self.table.hashfull(),
+            "firstMoveRate": self.orderer.stats()["firstMoveRate"],
+            "pawnHitRate": self.pawnTable.hitRate()
+        }
+        self.info.append(info)
+
+        if (self.onInfo):
+            self.onInfo(info)
+        else:
+            print(f"depth {depth}  score {score}  nodes {self.nodes}  time {elapsed:.2f}s  nps {info['nps']}  "
+                  f"hashfull {info['hashfull']}  fmc {info['firstMoveRate']:.2f}  pawn hits {info['pawnHitRate']:.2f}  "
+                  f"pv {' '.join(info['pv'])}")
@@ -0,0 +1,157 @@
+# ordering.py
+from bitboard import EMPTY, KING
+from transposition import encodeMove
+
+# --- Ordering Scores --- #
+# Moves are searched highest score first: hash move, captures (most valuable victim, least valuable attacker),
+# promotions, killers, then quiet moves by their history score
+HASH_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+PROMOTION_SCORE = 1 << 27
+KILLER_SCORES = (1 << 26, (1 << 26) - 1)
+HISTORY_LIMIT = 1 << 24  # History scores are halved once one of them reaches this, so they stay below the killers
+
+MAX_PLY = 128
+
+
+def mvvLva(move):
+    """
+    Capture score, the victim counts for more than the attacker so PxQ comes before QxQ comes before QxP
+    :param move: Move (a capture)
+    :return: int
+    """
+    return (move.pieceCaptured % 6 + 1) * 8 + KING - move.pieceMoved % 6
+
+
+class MoveOrderer:
+    """
+    Orders moves for the alpha-beta search so the move most likely to cause a cutoff is tried first, and counts how
+    often the first move tried was the one that cut off
+    """
+    def __init__(self):
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]  # Encoded quiet moves that caused a cutoff at each ply
+        self.history = [[0] * 4096 for colour in range(2)]  # Butterfly table [colour][from * 64 + to]
+
+        # --- Statistics --- #
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.cutoffIndexTotal = 0  # Sum of the move numbers that cut off, for the average
+
+    def clear(self):
+        """
+        Forgets killers and history, e.g. between games
+        :return: None
+        """
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]
+        self.history = [[0] * 4096 for colour in range(2)]
+        self.resetStats()
+
+    def resetStats(self):
+        """
+        Zeroes the cutoff counters
+        :return: None
+        """
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.cutoffIndexTotal = 0
+
+    def newSearch(self):
+        """
+        Clears the killers, which belong to the previous position, and ages the history so it favours recent results
+        :return: None
+        """
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]
+        self.ageHistory()
+
+    def ageHistory(self):
+        """
+        Halves every history score
+        :return: None
+        """
+        for table in self.history:
+            for i in range(4096):
+                table[i] >>= 1
+
+    # --- Ordering --- #
+    def orderMoves(self, moves, ply, white, hashMove=0):
+        """
+        Sorts moves best first in place
+        :param moves: arr (legal moves)
+        :param ply: int (distance from the root, selects the killers)
+        :param white: bool (True if white is to move, selects the history table)
+        :param hashMove: int (encoded best move from the transposition table, 0 if none)
+        :return moves: arr (the same list)
+        """
+        killers = self.killers[ply] if (ply < MAX_PLY) else (0, 0)
+        history = self.history[0 if (white) else 1]
+        scores = {}
+        for move in moves:
+            code = encodeMove(move)
+            if (code == hashMove):
+                score = HASH_SCORE
+            elif (move.pieceCaptured != EMPTY):
+                score = CAPTURE_SCORE + mvvLva(move)
+            elif (move.promotionPiece is not None):
+                score = PROMOTION_SCORE + move.promotionPiece
+            elif (code == killers[0]):
+                score = KILLER_SCORES[0]
+            elif (code == killers[1]):
+                score = KILLER_SCORES[1]
+            else:
+                score = history[code & 0xFFF]
+            scores[id(move)] = score
+        moves.sort(key=lambda move: scores[id(move)], reverse=True)
+        return moves
+
+    @staticmethod
+    def orderCaptures(moves):
+        """
+        Sorts captures and promotions for the quiescence search, by MVV-LVA with promotions after captures
+        :param moves: arr (captures and promotions)
+        :return moves: arr (the same list)
+        """
+        moves.sort(key=lambda move: mvvLva(move) if (move.pieceCaptured != EMPTY) else -1, reverse=True)
+        return moves
+
+    # --- Learning From Cutoffs --- #
+    def recordCutoff(self, move, index, ply, depth, white):
+        """
+        Called when a move fails high, quiet moves become killers and gain history
+        :param move: Move (move that caused the cutoff)
+        :param index: int (position of the move in the ordered list, 0 if it was searched first)
+        :param ply: int (distance from the root)
+        :param depth: int (remaining depth, deeper cutoffs earn more history)
+        :param white: bool (True if white made the move)
+        :return: None
+        """
+        self.cutoffs += 1
+        self.cutoffIndexTotal += index
+        if (index == 0):
+            self.firstMoveCutoffs += 1
+
+        if (move.pieceCaptured != EMPTY or move.promotionPiece is not None):
+            return
+
+        code = encodeMove(move)
+        if (ply < MAX_PLY):
+            killers = self.killers[ply]
+            if (killers[0] != code):
+                killers[1] = killers[0]
+                killers[0] = code
+
+        history = self.history[0 if (white) else 1]
+        history[code & 0xFFF] += depth * depth
+        if (history[code & 0xFFF] >= HISTORY_LIMIT):
+            self.ageHistory()
+
+    def stats(self):
+        """
+        Cutoff statistics, firstMoveRate is the share of cutoffs made by the first move searched
+        :return: dict
+        """
+        return {
+            "cutoffs": self.cutoffs,
+            "firstMoveCutoffs": self.firstMoveCutoffs,
+            "firstMoveRate": self.firstMoveCutoffs / self.cutoffs if (self.cutoffs) else 0.0,
+            "averageCutoffIndex": self.cutoffIndexTotal / self.cutoffs if (self.cutoffs) else 0.0
+        }
@@ -0,0 +1,177 @@
+# pawns.py
+"""
+Pawn structure: doubled, isolated, backward and passed pawns, scored from the two pawn bitboards alone. The same
+pawn structures come up again and again in a search tree (most moves don't move a pawn), so results are cached in
+a PawnTable keyed by Engine.pawnHash, the Zobrist key of the pawns, which putPiece and removePiece keep up to date.
+"""
+from bitboard import PAWN, WHITE, BLACK, PAWN_ATTACKS
+
+# --- Pawn Structure Scores --- #
+# (middlegame, endgame), per pawn, white-relative and negated for black
+DOUBLED = (-10, -25)  # Each pawn behind another of the same colour on its file
+ISOLATED = (-10, -15)  # No pawns of the same colour on the files beside it
+BACKWARD = (-8, -12)  # Behind its neighbours and can't advance safely, its stop square is attacked by a pawn
+PASSED_MG = (0, 5, 10, 15, 30, 50, 80, 0)  # By rank counted from the pawn's own side, rank 2 is 1
+PASSED_EG = (0, 10, 20, 35, 60, 100, 150, 0)
+KING_PROXIMITY = (5, 2)  # Endgame, per square the enemy king is from a passed pawn's stop square, and our king
+
+DEFAULT_ENTRIES = 1 << 14
+
+
+# --- Masks --- #
+def buildMasks():
+    """
+    :return: tuple (adjacent files of each file, and [colour][square] bitboards of the squares ahead on the file,
+        ahead on the file and the files beside it, and beside it on the same rank or behind)
+    """
+    files = [sum(1 << (rank * 8 + file) for rank in range(8)) for file in range(8)]
+    adjacent = [(files[file - 1] if (file > 0) else 0) | (files[file + 1] if (file < 7) else 0) for file in range(8)]
+    forward = ([0] * 64, [0] * 64)
+    passed = ([0] * 64, [0] * 64)
+    support = ([0] * 64, [0] * 64)
+    for square in range(64):
+        rank, file = divmod(square, 8)
+        for colour, ahead, behind in ((WHITE, range(rank), range(rank, 8)),
+                                      (BLACK, range(rank + 1, 8), range(rank + 1))):
+            aheadRanks = sum(0xFF << (row * 8) for row in ahead)
+            behindRanks = sum(0xFF << (row * 8) for row in behind)
+            forward[colour][square] = aheadRanks & files[file]
+            passed[colour][square] = aheadRanks & (files[file] | adjacent[file])
+            support[colour][square] = behindRanks & adjacent[file]
+    return adjacent, forward, passed, support
+
+
+ADJACENT_FILES, FORWARD_MASKS, PASSED_MASKS, SUPPORT_MASKS = buildMasks()
+
+
+def evaluatePawns(whitePawns, blackPawns):
+    """
+    Scores the pawn structure from scratch
+    :param whitePawns, blackPawns: int (pawn bitboards)
+    :return: tuple (white-relative middlegame score, endgame score, bitboard of the passed pawns of both colours)
+    """
+    mgScore = egScore = 0
+    passedPawns = 0
+    for colour, own, enemy, sign in ((WHITE, whitePawns, blackPawns, 1), (BLACK, blackPawns, whitePawns, -1)):
+        step = -8 if (colour == WHITE) else 8
+        pawns = own
+        while pawns:
+            bit = pawns & -pawns
+            pawns ^= bit
+            square = bit.bit_length() - 1
+            mg = eg = 0
+
+            if (FORWARD_MASKS[colour][square] & own):
+                mg += DOUBLED[0]
+                eg += DOUBLED[1]
+            if (not ADJACENT_FILES[square & 7] & own):
+                mg += ISOLATED[0]
+                eg += ISOLATED[1]
+            elif (not SUPPORT_MASKS[colour][square] & own and PAWN_ATTACKS[colour][square + step] & enemy):
+                mg += BACKWARD[0]
+                eg += BACKWARD[1]
+
+            # Passed, no enemy pawn can block or take it on the way, and it isn't behind a pawn of its own
+            if (not PASSED_MASKS[colour][square] & enemy and not FORWARD_MASKS[colour][square] & own):
+                passedPawns |= bit
+                rank = 7 - (square >> 3) if (colour == WHITE) else square >> 3
+                mg += PASSED_MG[rank]
+                eg += PASSED_EG[rank]
+
+            mgScore += sign * mg
+            egScore += sign * eg
+    return mgScore, egScore, passedPawns
+
+
+def kingProximity(passedPawns, whitePawns, whiteKing, blackKing):
+    """
+    Endgame term for how close the kings are to the passed pawns, it depends on the king squares so it is worked
+    out on every evaluation rather than cached, from the cached passed pawn bitboard
+    :param passedPawns: int (bitboard of the passed pawns of both colours)
+    :param whitePawns: int (white pawn bitboard, tells the colours apart)
+    :param whiteKing, blackKing: int (king squares)
+    :return: int (white-relative endgame score)
+    """
+    score = 0
+    while passedPawns:
+        bit = passedPawns & -passedPawns
+        passedPawns ^= bit
+        square = bit.bit_length() - 1
+        if (bit & whitePawns):
+            stop, own, enemy, sign = square - 8, whiteKing, blackKing, 1
+        else:
+            stop, own, enemy, sign = square + 8, blackKing, whiteKing, -1
+        enemyDistance = max(abs((enemy >> 3) - (stop >> 3)), abs((enemy & 7) - (stop & 7)))
+        ownDistance = max(abs((own >> 3) - (stop >> 3)), abs((own & 7) - (stop & 7)))
+        score += sign * (KING_PROXIMITY[0] * enemyDistance - KING_PROXIMITY[1] * ownDistance)
+    return score
+
+
+class PawnTable:
+    """
+    Fixed size cache of pawn structure results, one entry per slot, indexed by the low bits of the pawn key. An
+    entry is always replaced by the newest structure, results never go stale so the table survives between searches
+    and games.
+    """
+    def __init__(self, entries=DEFAULT_ENTRIES):
+        """
+        :param entries: int (number of slots, rounded down to a power of two)
+        """
+        self.size = 1 << max(entries, 1).bit_length() - 1
+        self.mask = self.size - 1
+        self.entries = [None] * self.size  # (pawn key, middlegame score, endgame score, passed pawns)
+
+        # --- Statistics --- #
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """
+        Empties the table
+        :return: None
+        """
+        self.entries = [None] * self.size
+        self.resetStats()
+
+    def resetStats(self):
+        """
+        Zeroes the hit counters
+        :return: None
+        """
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, engine):
+        """
+        Looks up the engine's pawn structure, scoring and storing it on a miss
+        :param engine: Engine (position)
+        :return: tuple (white-relative middlegame score, endgame score, bitboard of the passed pawns)
+        """
+        self.probes += 1
+        key = engine.pawnHash
+        entry = self.entries[key & self.mask]
+        if (entry is not None and entry[0] == key):
+            self.hits += 1
+            return entry[1:]
+        result = evaluatePawns(engine.pieceBitboards[PAWN], engine.pieceBitboards[PAWN + 6])
+        self.entries[key & self.mask] = (key,) + result
+        return result
+
+    def hitRate(self):
+        """
+        :return: float (share of probes since the last reset that found their structure in the table)
+        """
+        return self.hits / self.probes if (self.probes) else 0.0
+
+    def stats(self):
+        """
+        Usage statistics for sizing the table
+        :return: dict
+        """
+        return {
+            "entries": self.size,
+            "used": sum(1 for entry in self.entries if (entry is not None)),
+            "probes": self.probes,
+            "hits": self.hits,
+            "hitRate": self.hitRate()
+        }
@@ -0,0 +1,159 @@
+# perft.py
+from engine import Engine
+import sys
+import time
+
+
+# --- Standard Test Positions --- #
+# (name, FEN, {depth: expected leaf nodes})
+SUITE = [
+    ("start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238}),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467}),
+    ("middlegame", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379}),
+    ("endgame", "8/8/8/8/5R2/2pk4/5K2/8 b - - 0 1",
+     {1: 3, 2: 55, 3: 340, 4: 6353, 5: 47435}),
+]
+
+
+def perft(engine, depth):
+    """
+    Counts the leaf nodes of the legal move tree to the given depth
+    :param engine: Engine (position to walk, restored before returning)
+    :param depth: int (number of plies to walk)
+    :return nodes: int (number of leaf nodes)
+    """
+    if (depth == 0):
+        return 1
+
+    moves = engine.findLegalMoves()
+    if (depth == 1):
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        engine.makeMove(move)
+        nodes += perft(engine, depth - 1)
+        engine.takeback()
+    return nodes
+
+
+def perftRootMove(job):
+    """
+    Worker for the process pool, walks the subtree below a single root move
+    :param job: tuple (FEN string, index of the root move in findLegalMoves order, depth)
+    :return: int (leaf nodes below the root move)
+    """
+    fenString, index, depth = job
+    engine = Engine(fenString)
+    engine.makeMove(engine.findLegalMoves()[index])
+    return perft(engine, depth - 1)
+
+
+def divide(fenString, depth, processes=1):
+    """
+    Splits the perft count of a position by root move
+    :param fenString: str (FEN of the position to walk)
+    :param depth: int (number of plies to walk, at least 1)
+    :param processes: int (worker processes to split the root moves across, 1 walks in this process)
+    :return: arr (list of (move name, leaf nodes) tuples in move generation order)
+    """
+    engine = Engine(fenString)
+    rootMoves = engine.findLegalMoves()
+    names = [move.coordinates() for move in rootMoves]
+
+    if (processes > 1 and depth > 1):
+        from multiprocessing import Pool  # Imported here, it is slow to import and only the parallel path needs it
+        jobs = [(fenString, i, depth) for i in range(len(rootMoves))]
+        with Pool(processes) as pool:
+            counts = pool.map(perftRootMove, jobs)
+    else:
+        counts = []
+        for move in rootMoves:
+            engine.makeMove(move)
+            counts.append(perft(engine, depth - 1))
+            engine.takeback()
+
+    return list(zip(names, counts))
+
+
+def runPerft(fenString, depth, processes=1, showDivide=False):
+    """
+    Runs perft on a position and prints the node count and speed
+    :param fenString: str (FEN of the position to walk)
+    :param depth: int (number of plies to walk)
+    :param processes: int (worker processes to split the root moves across)
+    :param showDivide: bool (print the per root move counts)
+    :return nodes: int (number of leaf nodes)
+    """
+    start = time.perf_counter()
+    results = divide(fenString, depth, processes)
+    elapsed = time.perf_counter() - start
+
+    if (showDivide):
+        for name, count in results:
+            print(f"{name}: {count}")
+        print()
+
+    nodes = sum(count for name, count in results)
+    print(f"depth {depth}  nodes {nodes}  time {elapsed:.3f}s  nps {nodes / max(elapsed, 1e-9):.0f}")
+    return nodes
+
+
+def runSuite(maxDepth, processes=1):
+    """
+    Walks every position in the suite and compares against the stored node counts
+    :param maxDepth: int (deepest depth to run for each position)
+    :param processes: int (worker processes to split the root moves across)
+    :return: bool (True if every count matched)
+    """
+    passed = True
+    totalNodes = 0
+    totalTime = 0.0
+
+    for name, fenString, expected in SUITE:
+        print(f"{name}: {fenString}")
+        for depth in sorted(expected):
+            if (depth > maxDepth):
+                break
+
+            start = time.perf_counter()
+            try:
+                nodes = sum(count for _, count in divide(fenString, depth, processes))
+            except (RecursionError, IndexError, KeyError) as error:
+                print(f"  depth {depth}  ERROR {type(error).__name__}: {error}")
+                passed = False
+                break
+            elapsed = time.perf_counter() - start
+            totalNodes += nodes
+            totalTime += elapsed
+
+            status = "ok" if (nodes == expected[depth]) else f"FAIL (expected {expected[depth]})"
+            if (nodes != expected[depth]):
+                passed = False
+            print(f"  depth {depth}  nodes {nodes}  time {elapsed:.3f}s  nps {nodes / max(elapsed, 1e-9):.0f}  {status}")
+
+    print(f"\ntotal nodes {totalNodes}  time {totalTime:.3f}s  nps {totalNodes / max(totalTime, 1e-9):.0f}")
+    print("all counts match" if passed else "MISMATCHES FOUND")
+    return passed
+
+
+if __name__ == '__main__':
+    import argparse  # Only the command line needs it, kept out of the import cost of using perft as a module
+    parser = argparse.ArgumentParser(description="Perft move generation driver and benchmark")
+    parser.add_argument("--fen", default=Engine().fenString, help="position to walk (default: start position)")
+    parser.add_argument("--depth", type=int, default=3, help="plies to walk (max depth with --suite)")
+    parser.add_argument("--divide", action="store_true", help="print node counts for each root move")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to split root moves across")
+    parser.add_argument("--suite", action="store_true", help="run the standard positions against stored counts")
+    args = parser.parse_args()
+
+    if (args.suite):
+        sys.exit(0 if runSuite(args.depth, args.processes) else 1)
+    runPerft(args.fen, args.depth, args.processes, args.divide)
@@ -0,0 +1,239 @@
+# pgn.py
+"""
+Reads and writes games in Portable Game Notation (PGN). Files are streamed a game at a time, the reader is a
+generator that only holds the game being read, so files of any size can be worked through in constant memory.
+
+A game is a dict:
+    {"headers": {tag: value}, "moves": [SAN strings], "comments": [comment after each move, or None], "result": str}
+Only the main line is kept, variations and numeric annotation glyphs ($1, $2...) are skipped when reading.
+"""
+from engine import Engine, START_FEN
+from notation import toSAN, parseSAN
+import re
+import textwrap
+
+SEVEN_TAG_ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+TAG_DEFAULTS = {"Date": "????.??.??"}  # "?" for the rest
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+LINE_WIDTH = 80
+
+HEADER = re.compile(r'\[\s*(\w+)\s*"(.*)"\s*\]')  # Lenient, some writers don't escape quotes in values
+# Brace and rest of line comments, glyphs, variation brackets, and everything else (move numbers, moves, results)
+TOKENS = re.compile(r"\{[^}]*\}?|;[^\n]*|\$\d+|[()]|[^\s(){};$]+")
+MOVE_NUMBER = re.compile(r"^\d*\.+")
+
+
+def newGame(headers=None):
+    """
+    :param headers: dict (tags of the game, None for none)
+    :return: dict (game with no moves)
+    """
+    headers = dict(headers or {})
+    return {"headers": headers, "moves": [], "comments": [], "result": headers.get("Result", "*")}
+
+
+def parseMovetext(game, text):
+    """
+    Adds the main line moves, comments and result of a game's movetext to it
+    :param game: dict (game to add to)
+    :param text: str (movetext)
+    :return: dict (the game)
+    """
+    moves, comments = game["moves"], game["comments"]
+    depth = 0  # Variation nesting
+    for token in TOKENS.findall(text):
+        first = token[0]
+        if (first == "("):
+            depth += 1
+        elif (first == ")"):
+            depth = max(depth - 1, 0)
+        elif (depth or first == "$"):
+            continue
+        elif (first == "{" or first == ";"):
+            comment = " ".join(token.strip("{};").split())
+            if (moves and comment):
+                comments[-1] = comment if (comments[-1] is None) else comments[-1] + " " + comment
+        elif (token in RESULTS):
+            game["result"] = token
+        else:
+            token = MOVE_NUMBER.sub("", token)
+            if (token):
+                moves.append(token)
+                comments.append(None)
+    return game
+
+
+def endsInComment(line, inComment):
+    """
+    Follows brace comments through a line of movetext, they don't nest and a ; comment runs to the end of the line
+    :param line: str (line of movetext)
+    :param inComment: bool (True if a brace comment was open at the start of the line)
+    :return: bool (True if a brace comment is still open at the end of the line)
+    """
+    position = 0
+    while True:
+        if (inComment):
+            position = line.find("}", position)
+            if (position < 0):
+                return True
+            inComment = False
+        else:
+            opening = line.find("{", position)
+            semicolon = line.find(";", position)
+            if (opening < 0 or 0 <= semicolon < opening):
+                return False
+            position = opening
+            inComment = True
+        position += 1
+
+
+def iterGames(lines):
+    """
+    Splits a stream of PGN lines into games, a game ends where the next one's tag pairs start
+    :param lines: iterable (lines of PGN text)
+    :return: generator (yields game dicts)
+    """
+    headers = {}
+    movetext = []
+    inComment = False  # A tag-like line inside a brace comment is movetext
+    for line in lines:
+        if (line.startswith("%")):  # Escaped line
+            continue
+        stripped = line.strip()
+        if (stripped.startswith("[") and not inComment):
+            if (movetext):
+                yield parseMovetext(newGame(headers), " ".join(movetext))
+                headers = {}
+                movetext = []
+            match = HEADER.match(stripped)
+            if (match):
+                headers[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+        elif (stripped):
+            movetext.append(stripped)
+            inComment = endsInComment(stripped, inComment)
+    if (movetext or headers):
+        yield parseMovetext(newGame(headers), " ".join(movetext))
+
+
+def readGames(path):
+    """
+    Reads a PGN file lazily, one game at a time
+    :param path: str (PGN file)
+    :return: generator (yields game dicts)
+    """
+    with open(path, encoding="utf-8", errors="replace") as file:
+        yield from iterGames(file)
+
+
+def startPosition(game):
+    """
+    :param game: dict (game)
+    :return: Engine (set up at the game's starting position, from its FEN tag if it has one)
+    """
+    return Engine(game["headers"].get("FEN", START_FEN))
+
+
+def replay(game, engine=None):
+    """
+    Plays through a game's moves. Each move is yielded with the engine still on the position before it, and is
+    made when the generator is resumed.
+    :param game: dict (game)
+    :param engine: Engine (set up at the game's starting position, made from the game if None)
+    :return: generator (yields (ply, Move, legal moves in the position))
+    """
+    if (engine is None):
+        engine = startPosition(game)
+    for ply, san in enumerate(game["moves"]):
+        legalMoves = engine.findLegalMoves()
+        move = parseSAN(engine, san, legalMoves)
+        if (not move):
+            white, black = game["headers"].get("White", "?"), game["headers"].get("Black", "?")
+            raise ValueError(f"Illegal or ambiguous move {san!r} at ply {ply + 1} of {white} - {black}")
+        yield ply, move, legalMoves
+        engine.makeMove(move)
+
+
+def engineGame(engine, headers=None, result=None):
+    """
+    Turns an engine's move log into a game, naming the moves in SAN from the position the engine started from
+    :param engine: Engine (game to record, left unchanged)
+    :param headers: dict (tags to add, e.g. White and Black)
+    :param result: str (result, None to work it out: decided if the side to move is mated or stalemated, else "*")
+    :return: dict (game)
+    """
+    game = newGame(headers)
+    if (engine.fenString != START_FEN):
+        game["headers"].update(SetUp="1", FEN=engine.fenString)
+
+    board = Engine(engine.fenString)
+    for move in engine.moveLog:
+        game["moves"].append(toSAN(board, move))
+        game["comments"].append(None)
+        board.makeMove(move)
+
+    if (result is None):
+        result = "*"
+        if (not engine.findLegalMoves()):
+            result = "1/2-1/2" if (not engine.inCheck()) else ("0-1" if (engine.whiteToMove) else "1-0")
+    game["result"] = result
+    return game
+
+
+def formatGame(game, width=LINE_WIDTH):
+    """
+    :param game: dict (game)
+    :param width: int (longest movetext line)
+    :return: str (the game in PGN, ending with a blank line)
+    """
+    headers = dict(game["headers"])
+    headers["Result"] = game["result"]
+    tags = list(SEVEN_TAG_ROSTER) + [tag for tag in headers if (tag not in SEVEN_TAG_ROSTER)]
+    lines = []
+    for tag in tags:
+        value = str(headers.get(tag, TAG_DEFAULTS.get(tag, "?"))).replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'[{tag} "{value}"]')
+
+    # Numbering starts from the FEN's move number and side to move
+    fields = headers.get("FEN", START_FEN).split()
+    blackFirst = len(fields) > 1 and fields[1] == "b"
+    number = int(fields[5]) if (len(fields) > 5 and fields[5].isdigit()) else 1
+    tokens = []
+    for ply, san in enumerate(game["moves"]):
+        whiteMove = (ply + blackFirst) % 2 == 0
+        moveNumber = number + (ply + blackFirst) // 2
+        if (whiteMove):
+            tokens.append(f"{moveNumber}.")
+        elif (ply == 0 or game["comments"][ply - 1]):
+            tokens.append(f"{moveNumber}...")
+        tokens.append(san)
+        if (game["comments"][ply]):
+            tokens.append("{" + game["comments"][ply].replace("}", ")") + "}")
+    tokens.append(game["result"])
+
+    movetext = textwrap.fill(" ".join(tokens), width, break_long_words=False, break_on_hyphens=False)
+    return "\n".join(lines) + "\n\n" + movetext + "\n\n"
+
+
+def writeGame(file, game):
+    """
+    :param file: file (open for writing text)
+    :param game: dict (game)
+    :return: None
+    """
+    file.write(formatGame(game))
+
+
+def writeGames(path, games, append=False):
+    """
+    Writes games as they come, games can be a generator so they never all need to be in memory
+    :param path: str (PGN file)
+    :param games: iterable (game dicts)
+    :param append: bool (add to the end of the file rather than replacing it)
+    :return: int (number of games written)
+    """
+    count = 0
+    with open(path, "a" if (append) else "w", encoding="utf-8") as file:
+        for game in games:
+            writeGame(file, game)
+            count += 1
+    return count
@@ -0,0 +1,241 @@
+# selfplay.py
+"""
+Plays matches between two engine configurations for testing engine changes. Games are spread across a process
+pool, and each finished game is appended to a JSON lines file as it comes in (and optionally to a PGN file), along
+with a running summary, so a long run can be watched (or stopped) without losing anything.
+"""
+from engine import Engine, START_FEN
+from opponent import Opponent
+from notation import toSAN
+from pgn import newGame, writeGame
+from multiprocessing import Pool
+import argparse
+import json
+import time
+
+DEFAULT_OPENINGS = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"]
+
+
+def loadOpenings(path):
+    """
+    Reads opening positions, one FEN per line, blank lines and lines starting with # are skipped
+    :param path: str (file to read, None for the start position only)
+    :return: arr (list of FEN strings)
+    """
+    if (not path):
+        return list(DEFAULT_OPENINGS)
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+
+def gameOver(engine, legalMoves):
+    """
+    Decides whether the game has ended
+    :param engine: Engine (position after the last move)
+    :param legalMoves: arr (legal moves in the position)
+    :return: tuple (result "1-0", "0-1" or "1/2-1/2", reason) or None if the game goes on
+    """
+    if (not legalMoves):
+        if (engine.inCheck()):
+            return ("0-1" if (engine.whiteToMove) else "1-0"), "checkmate"
+        return "1/2-1/2", "stalemate"
+    if (engine.halfmoveClock >= 100):
+        return "1/2-1/2", "fifty moves"
+    if (engine.isRepetition()):  # Adjudicated on the first repeat, engines that repeat once will repeat again
+        return "1/2-1/2", "repetition"
+    return None
+
+
+def playGame(job):
+    """
+    Plays one game, runs in the pool's worker processes
+    :param job: tuple (game number, opening FEN, options for the white player, options for the black player,
+        name of the configuration playing white, maximum plies before the game is adjudicated a draw)
+    :return: dict (game record)
+    """
+    number, opening, whiteOptions, blackOptions, whiteName, maxPlies = job
+    engine = Engine(opening)
+    players = (Opponent(engine, **whiteOptions), Opponent(engine, **blackOptions))
+    for player in players:
+        player.onInfo = lambda info: None  # Keep the workers quiet
+    nodes = [0, 0]
+    thinking = [0.0, 0.0]
+    moves = []
+    sanMoves = []
+
+    legalMoves = engine.findLegalMoves()
+    outcome = gameOver(engine, legalMoves)
+    while (outcome is None and len(moves) < maxPlies):
+        side = 0 if (engine.whiteToMove) else 1
+        player = players[side]
+        start = time.perf_counter()
+        player.nodes = 0
+        move = player.getMove(legalMoves)
+        thinking[side] += time.perf_counter() - start
+        nodes[side] += player.nodes
+
+        sanMoves.append(toSAN(engine, move, legalMoves))
+        engine.makeMove(move)
+        moves.append(move.coordinates())
+        legalMoves = engine.findLegalMoves()
+        outcome = gameOver(engine, legalMoves)
+
+    result, reason = outcome if (outcome) else ("1/2-1/2", "move limit")
+    return {
+        "game": number,
+        "opening": opening,
+        "white": whiteName,
+        "black": "B" if (whiteName == "A") else "A",
+        "result": result,
+        "reason": reason,
+        "plies": len(moves),
+        "moves": moves,
+        "san": sanMoves,
+        "nodes": {"white": nodes[0], "black": nodes[1]},
+        "time": {"white": thinking[0], "black": thinking[1]}
+    }
+
+
+class MatchSummary:
+    """
+    Running totals for a match, from the point of view of configuration A
+    """
+    def __init__(self):
+        self.games = 0
+        self.wins = self.draws = self.losses = 0
+        self.plies = 0
+        self.nodes = {"A": 0, "B": 0}
+        self.time = {"A": 0.0, "B": 0.0}
+        self.reasons = {}
+
+    def add(self, record):
+        """
+        Counts a finished game
+        :param record: dict (game record from playGame)
+        :return: None
+        """
+        self.games += 1
+        self.plies += record["plies"]
+        self.reasons[record["reason"]] = self.reasons.get(record["reason"], 0) + 1
+        for colour in ("white", "black"):
+            self.nodes[record[colour]] += record["nodes"][colour]
+            self.time[record[colour]] += record["time"][colour]
+
+        if (record["result"] == "1/2-1/2"):
+            self.draws += 1
+        elif ((record["result"] == "1-0") == (record["white"] == "A")):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def asDict(self):
+        """
+        :return: dict (summary statistics)
+        """
+        return {
+            "games": self.games,
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+            "score": (self.wins + self.draws / 2) / self.games if (self.games) else 0.0,
+            "averagePlies": self.plies / self.games if (self.games) else 0.0,
+            "nps": {name: int(self.nodes[name] / self.time[name]) if (self.time[name]) else 0 for name in self.nodes},
+            "reasons": self.reasons
+        }
+
+
+def pgnGame(record):
+    """
+    :param record: dict (game record from playGame)
+    :return: dict (the game as a pgn.py game)
+    """
+    headers = {"Event": "Self-play", "Round": str(record["game"] + 1), "White": record["white"],
+               "Black": record["black"], "Result": record["result"], "Termination": record["reason"]}
+    if (record["opening"] != START_FEN):
+        headers.update(SetUp="1", FEN=record["opening"])
+    game = newGame(headers)
+    game["moves"] = list(record["san"])
+    game["comments"] = [None] * len(record["san"])
+    return game
+
+
+def runMatch(games, optionsA, optionsB, openings, output, summaryPath=None, processes=None, maxPlies=400,
+             pgnPath=None):
+    """
+    Plays a match, each opening is played twice with colours swapped
+    :param games: int (number of games)
+    :param optionsA, optionsB: dict (Opponent keyword arguments for each configuration)
+    :param openings: arr (list of opening FENs, cycled through)
+    :param output: str (JSON lines file each game record is appended to)
+    :param summaryPath: str (file the running summary is rewritten to after every game, None to skip)
+    :param processes: int (pool size, None for one per CPU)
+    :param maxPlies: int (plies before a game is adjudicated a draw)
+    :param pgnPath: str (PGN file each game is appended to, None to skip)
+    :return: dict (final summary)
+    """
+    jobs = []
+    for number in range(games):
+        opening = openings[(number // 2) % len(openings)]
+        if (number % 2 == 0):
+            jobs.append((number, opening, optionsA, optionsB, "A", maxPlies))
+        else:
+            jobs.append((number, opening, optionsB, optionsA, "B", maxPlies))
+
+    summary = MatchSummary()
+    pgnFile = open(pgnPath, "a", encoding="utf-8") if (pgnPath) else None
+    try:
+        with Pool(processes) as pool, open(output, "a") as gameFile:
+            for record in pool.imap_unordered(playGame, jobs):
+                gameFile.write(json.dumps(record) + "\n")
+                gameFile.flush()
+                if (pgnFile):
+                    writeGame(pgnFile, pgnGame(record))
+                    pgnFile.flush()
+
+                summary.add(record)
+                stats = summary.asDict()
+                if (summaryPath):
+                    with open(summaryPath, "w") as summaryFile:
+                        json.dump(stats, summaryFile, indent=2)
+                print(f"game {record['game']}: {record['result']} ({record['reason']}, {record['plies']} plies)  "
+                      f"A +{stats['wins']} ={stats['draws']} -{stats['losses']}  score {stats['score']:.3f}")
+    finally:
+        if (pgnFile):
+            pgnFile.close()
+
+    return summary.asDict()
+
+
+def engineOptions(timeLimit, nodes, depth, hashSizeMb):
+    """
+    Builds Opponent keyword arguments from the command line options
+    :param timeLimit: float (seconds per move)
+    :param nodes: int (nodes per move, None for no limit)
+    :param depth: int (maximum depth)
+    :param hashSizeMb: int (hash table size)
+    :return: dict
+    """
+    return {"timeLimit": timeLimit, "nodeLimit": nodes, "maxDepth": depth, "hashSizeMb": hashSizeMb}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Self-play match between two engine configurations")
+    parser.add_argument("--games", type=int, default=10, help="number of games")
+    parser.add_argument("--openings", help="file of opening FENs, one per line (default: start position)")
+    parser.add_argument("--output", default="games.jsonl", help="JSON lines file game records are appended to")
+    parser.add_argument("--summary", default="summary.json", help="file the running summary is written to")
+    parser.add_argument("--pgn", help="PGN file games are appended to")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--max-plies", type=int, default=400, help="plies before a game is adjudicated a draw")
+    parser.add_argument("--hash", type=int, default=16, help="hash table size in megabytes for each player")
+    for name in ("a", "b"):
+        parser.add_argument(f"--time-{name}", type=float, default=0.1, help=f"seconds per move for {name.upper()}")
+        parser.add_argument(f"--nodes-{name}", type=int, default=None, help=f"nodes per move for {name.upper()}")
+        parser.add_argument(f"--depth-{name}", type=int, default=64, help=f"maximum depth for {name.upper()}")
+    args = parser.parse_args()
+
+    optionsA = engineOptions(args.time_a, args.nodes_a, args.depth_a, args.hash)
+    optionsB = engineOptions(args.time_b, args.nodes_b, args.depth_b, args.hash)
+    final = runMatch(args.games, optionsA, optionsB, loadOpenings(args.openings), args.output, args.summary,
+                     args.processes, args.max_plies, args.pgn)
+    print(json.dumps(final, indent=2))
@@ -0,0 +1,180 @@
+# smp.py
+"""
+Lazy SMP: several processes search the same position at the same time, sharing one transposition table in shared
+memory. They don't split the work explicitly, each just runs its own iterative deepening (half of them a depth
+ahead), and what one finds is picked up by the others through the table. The deepest completed iteration wins.
+"""
+from engine import Engine
+from opponent import Opponent
+from transposition import TranspositionTable
+from worker import snapshot
+import argparse
+import multiprocessing
+import queue
+import threading
+import time
+
+
+def helperSearch(job):
+    """
+    Runs in each worker process, searches the position and reports every completed iteration
+    :param job: tuple (index, Engine snapshot, shared table name, table size in megabytes, search options dict,
+        result queue, shared stop flag)
+    :return: None
+    """
+    index, engine, tableName, hashSizeMb, options, results, stopFlag = job
+    table = TranspositionTable(hashSizeMb, name=tableName)
+    opponent = Opponent(engine, table=table, **options)
+
+    def report(info):
+        results.put(("info", index, info))
+        if (stopFlag.value):  # Catches a stop that came before the search started
+            opponent.stop()
+    opponent.onInfo = report
+
+    # The search polls its own stop flag, a thread copies the main process's flag into it. A plain shared value is
+    # used rather than a multiprocessing Event, whose set() waits on every waiter, including ones in exited workers.
+    def watchStopFlag():
+        while (not stopFlag.value):
+            time.sleep(0.005)
+        opponent.stop()
+    threading.Thread(target=watchStopFlag, daemon=True).start()
+
+    try:
+        move = opponent.search(engine.findLegalMoves(), startDepth=1 + index % 2)
+        results.put(("done", index, move.coordinates(), opponent.nodes))
+    finally:
+        table.close()
+
+
+def parallelSearch(engine, workers=2, timeLimit=1.0, maxDepth=64, nodeLimit=None, hashSizeMb=64, onInfo=None):
+    """
+    Searches the engine's position with several processes, returns when the time runs out, a worker reaches the
+    maximum depth, or every worker has finished
+    :param engine: Engine (position to search, not changed)
+    :param workers: int (number of search processes)
+    :param timeLimit: float (seconds to search, None for no limit)
+    :param maxDepth: int (stop once any worker completes this depth)
+    :param nodeLimit: int (node budget for each worker, None for no limit)
+    :param hashSizeMb: int (size of the shared transposition table)
+    :param onInfo: function (called with (worker index, info dict) for each iteration that goes deeper than any
+        before it)
+    :return: tuple (best Move or None if there are no legal moves, dict with depth, score, pv, nodes, time, nps)
+    """
+    legalMoves = engine.findLegalMoves()
+    if (not legalMoves):
+        return None, {}
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    stopFlag = context.RawValue("b", 0)
+    table = TranspositionTable(hashSizeMb, shared=True)
+    options = {"timeLimit": None, "nodeLimit": nodeLimit, "maxDepth": maxDepth}
+    position = snapshot(engine)
+
+    start = time.perf_counter()
+    processes = []
+    for index in range(workers):
+        job = (index, position, table.name, hashSizeMb, options, results, stopFlag)
+        process = context.Process(target=helperSearch, args=(job,), daemon=True)
+        process.start()
+        processes.append(process)
+
+    # --- Collect Results --- #
+    best = {"depth": 0}
+    nodes = {}  # Latest node count of each worker
+    finished = 0
+
+    def receive(message):
+        """
+        Takes in one worker message
+        :param message: tuple (("info", index, info dict) or ("done", index, move name, nodes))
+        :return: None
+        """
+        nonlocal best, finished
+        if (message[0] == "info"):
+            index, info = message[1], message[2]
+            nodes[index] = info["nodes"]
+            if (info["depth"] > best["depth"]):
+                best = dict(info)
+                if (onInfo):
+                    onInfo(index, info)
+            if (info["depth"] >= maxDepth):
+                stopFlag.value = 1
+        elif (message[0] == "done"):
+            nodes[message[1]] = message[3]
+            finished += 1
+            stopFlag.value = 1  # The others can't complete a deeper iteration than the one that finished
+
+    try:
+        while (finished < workers and any(process.is_alive() for process in processes)):
+            wait = 0.05
+            if (timeLimit is not None):
+                wait = min(wait, max(0.0, start + timeLimit - time.perf_counter()))
+            try:
+                receive(results.get(timeout=wait))
+            except queue.Empty:
+                pass
+
+            if (timeLimit is not None and time.perf_counter() - start >= timeLimit):
+                stopFlag.value = 1
+    finally:
+        stopFlag.value = 1
+        # Keep reading while the workers wind down, a worker can't exit until what it queued has been read off the
+        # pipe, then take whatever the last of them sent just before exiting (its final iteration and result)
+        while (any(process.is_alive() for process in processes)):
+            try:
+                receive(results.get(timeout=0.05))
+            except queue.Empty:
+                pass
+        while True:
+            try:
+                receive(results.get_nowait())
+            except queue.Empty:
+                break
+        for process in processes:
+            process.join()
+        table.close()
+
+    elapsed = time.perf_counter() - start
+    best["nodes"] = sum(nodes.values())
+    best["time"] = elapsed
+    best["nps"] = int(best["nodes"] / max(elapsed, 1e-9))
+
+    if (best["depth"] == 0):  # Stopped before any iteration completed
+        return legalMoves[0], best
+    names = [move.coordinates() for move in legalMoves]
+    return legalMoves[names.index(best["pv"][0])], best
+
+
+def benchmark(fenString, depth, workerCounts, hashSizeMb=64):
+    """
+    Times how long each number of workers takes to complete a depth, and their combined speed
+    :param fenString: str (position to search)
+    :param depth: int (depth to time)
+    :param workerCounts: arr (numbers of workers to try)
+    :param hashSizeMb: int (size of the shared transposition table)
+    :return: arr (list of (workers, seconds, nodes, nps) tuples)
+    """
+    rows = []
+    baseline = None
+    print(f"time to depth {depth}: {fenString}")
+    for workers in workerCounts:
+        move, info = parallelSearch(Engine(fenString), workers, timeLimit=None, maxDepth=depth,
+                                    hashSizeMb=hashSizeMb)
+        baseline = baseline or info["time"]
+        rows.append((workers, info["time"], info["nodes"], info["nps"]))
+        print(f"  workers {workers:>2}  time {info['time']:.2f}s  speedup {baseline / info['time']:.2f}  "
+              f"nodes {info['nodes']}  nps {info['nps']}  move {move.coordinates()}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lazy SMP search and scaling benchmark")
+    parser.add_argument("--fen", default=Engine().fenString, help="position to search (default: start position)")
+    parser.add_argument("--depth", type=int, default=5, help="depth to search to")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="worker counts to time")
+    parser.add_argument("--hash", type=int, default=64, help="shared hash table size in megabytes")
+    args = parser.parse_args()
+
+    benchmark(args.fen, args.depth, args.workers, args.hash)
@@ -0,0 +1,237 @@
+# tablebase.py
+"""
+Endgame tablebases for a few small endings, KQK, KRK, KPK and KRKP, generated offline by retrograde analysis (see
+tbgen.py) and probed by the search. Each table is a file with one byte per position, addressed by an index computed
+from the piece squares, so a probe is a single read from a memory-mapped file.
+
+A byte holds the result for the side to move and the distance to mate (DTM) in plies:
+- 0: draw (also unused indices, e.g. illegal positions)
+- 1-127: win, mate in 2v - 1 plies
+- 128-255: loss, mated in 2(v - 128) plies
+
+Positions are stored with the stronger side as white, probes flip colours when needed, and mirrored so the anchor
+piece (the pawn, or the white king if there is no pawn) is on files a-d. Castling rights and the fifty move rule
+are ignored.
+
+KRKP treats black promoting to a piece that white can't take at once as a draw, the endings that would follow
+(KRKQ, KRKR...) aren't generated. Wins for the rook are exact, a draw may hide a loss in those lines.
+"""
+from bitboard import PAWN, KING
+import mmap
+import os
+
+MAGIC = b"CMKTB001"  # File header
+TABLES = ("KQK", "KRK", "KPK", "KRKP")  # In build order, each only depends on the ones before it
+MAX_PIECES = 4
+INSUFFICIENT = ("KK", "KNK", "KKN", "KBK", "KKB")  # Material that can't mate, always a draw
+
+PIECE_LETTERS = "PNBRQK"
+DEFAULT_DIRECTORY = "ChessMKIII/src/assets/tablebases"
+
+# --- Results --- #
+DRAW, WIN, LOSS = 0, 1, 2
+
+
+def encode(result, dtm):
+    """
+    :param result: int (DRAW, WIN or LOSS for the side to move)
+    :param dtm: int (plies to mate, odd for wins and even for losses)
+    :return: int (table byte)
+    """
+    if (result == WIN):
+        return min((dtm + 1) // 2, 127)
+    if (result == LOSS):
+        return 128 + min(dtm // 2, 127)
+    return 0
+
+
+def decode(value):
+    """
+    :param value: int (table byte)
+    :return: tuple (DRAW, WIN or LOSS for the side to move, plies to mate, 0 for a draw)
+    """
+    if (value == 0):
+        return DRAW, 0
+    if (value < 128):
+        return WIN, 2 * value - 1
+    return LOSS, 2 * (value - 128)
+
+
+# --- Table Layout --- #
+class TableSpec:
+    """
+    The pieces of one table and how positions are numbered:
+        index = ((anchor slot * 2 + side) * 64 + square of piece 1) * 64 + square of piece 2...
+    The anchor slot is rank * 4 + file of the anchor piece, which is always on files a-d. Fixing the anchor fixes
+    a block of 2 * 64 ** (pieces - 1) positions, which the generator solves one at a time when the anchor is a pawn.
+    """
+    def __init__(self, name):
+        """
+        :param name: str (material, white's pieces then black's, e.g. "KRKP")
+        """
+        self.name = name
+        white, black = name[1:].split("K")
+        pieces = [KING] + [PIECE_LETTERS.index(char) for char in white] + \
+                 [KING + 6] + [PIECE_LETTERS.index(char) + 6 for char in black]
+        pawns = [piece for piece in pieces if (piece % 6 == PAWN)]
+        anchor = pawns[0] if (pawns) else KING
+        self.order = [anchor] + [piece for piece in pieces if (piece != anchor)]  # Piece codes in index order
+        self.pawn = anchor if (pawns) else None
+        self.slotSize = 2 * 64 ** (len(pieces) - 1)
+        self.size = 32 * self.slotSize
+
+    def index(self, squares, whiteToMove):
+        """
+        :param squares: arr (square of each piece, in index order, anchor on files a-d)
+        :param whiteToMove: bool
+        :return index: int
+        """
+        anchor = squares[0]
+        index = ((anchor >> 3) * 4 + (anchor & 7)) * 2 + (0 if (whiteToMove) else 1)
+        for square in squares[1:]:
+            index = index * 64 + square
+        return index
+
+    def position(self, index):
+        """
+        :param index: int
+        :return: tuple (list of (piece code, square), True if white is to move)
+        """
+        squares = []
+        for piece in range(len(self.order) - 1):
+            index, square = divmod(index, 64)
+            squares.append(square)
+        slot, side = divmod(index, 2)
+        squares.append((slot >> 2) * 8 + (slot & 3))
+        squares.reverse()
+        return list(zip(self.order, squares)), side == 0
+
+    def slotSquares(self):
+        """
+        :return: arr (anchor squares of the blocks that hold positions, pawns never stand on the back ranks)
+        """
+        rows = range(1, 7) if (self.pawn is not None) else range(8)
+        return [row * 8 + file for row in rows for file in range(4)]
+
+    def indexOf(self, pieces, whiteToMove):
+        """
+        Index of a position with this table's material, mirrored if needed but never colour flipped
+        :param pieces: arr (list of (piece code, square))
+        :param whiteToMove: bool
+        :return: int
+        """
+        squares = dict(pieces)
+        mirror = 7 if (squares[self.order[0]] & 7 >= 4) else 0
+        return self.index([squares[piece] ^ mirror for piece in self.order], whiteToMove)
+
+    def slot(self, square):
+        """
+        :param square: int (anchor square, file a-d)
+        :return: int (first index of the block with the anchor on the square)
+        """
+        return ((square >> 3) * 4 + (square & 7)) * self.slotSize
+
+
+SPECS = {name: TableSpec(name) for name in TABLES}
+
+
+def signature(pieces):
+    """
+    :param pieces: arr (list of (piece code, square))
+    :return: str (material, e.g. "KRKP")
+    """
+    white = sorted((piece for piece, square in pieces if (piece < KING)), reverse=True)
+    black = sorted((piece - 6 for piece, square in pieces if (KING + 6 > piece >= 6)), reverse=True)
+    return "K" + "".join(PIECE_LETTERS[piece] for piece in white) + \
+           "K" + "".join(PIECE_LETTERS[piece] for piece in black)
+
+
+def canonical(pieces, whiteToMove):
+    """
+    Finds the table and index of a position, flipping colours and mirroring files as needed
+    :param pieces: arr (list of (piece code, square))
+    :param whiteToMove: bool
+    :return: tuple (TableSpec and index, or None and the material signature if there is no such table)
+    """
+    name = signature(pieces)
+    if (name not in SPECS):
+        white, black = name[1:].split("K")
+        flipped = "K" + black + "K" + white
+        if (flipped not in SPECS):
+            return None, name
+        pieces = [((piece + 6) % 12, square ^ 56) for piece, square in pieces]
+        whiteToMove = not whiteToMove
+        name = flipped
+
+    spec = SPECS[name]
+    return spec, spec.indexOf(pieces, whiteToMove)
+
+
+# --- Probing --- #
+class Tablebases:
+    """
+    Memory-mapped tables, found in a directory as <material>.tb files. Missing tables are simply not probed.
+    """
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        """
+        :param directory: str (folder holding the .tb files)
+        """
+        self.directory = directory
+        self.files = {}
+        for name in TABLES:
+            path = os.path.join(directory, name + ".tb")
+            if (os.path.exists(path)):
+                with open(path, "rb") as file:
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if (data[:len(MAGIC)] != MAGIC or len(data) != len(MAGIC) + SPECS[name].size):
+                    data.close()
+                    raise ValueError(f"{path} is not a valid {name} table")
+                self.files[name] = data
+
+    def __len__(self):
+        """
+        :return: int (number of tables loaded)
+        """
+        return len(self.files)
+
+    def value(self, pieces, whiteToMove):
+        """
+        :param pieces: arr (list of (piece code, square))
+        :param whiteToMove: bool
+        :return: int (table byte for the side to move) or None if no loaded table covers the material
+        """
+        spec, index = canonical(pieces, whiteToMove)
+        if (spec is None):
+            return 0 if (index in INSUFFICIENT) else None
+        data = self.files.get(spec.name)
+        if (data is None):
+            return None
+        return data[len(MAGIC) + index]
+
+    def probe(self, engine):
+        """
+        Looks up an engine position
+        :param engine: Engine (position)
+        :return: tuple (DRAW, WIN or LOSS for the side to move, plies to mate) or None if not covered
+        """
+        occupied = engine.occupied
+        if (occupied.bit_count() > MAX_PIECES):
+            return None
+        pieces = []
+        while occupied:
+            bit = occupied & -occupied
+            occupied ^= bit
+            square = bit.bit_length() - 1
+            pieces.append((engine.mailbox[square], square))
+        value = self.value(pieces, engine.whiteToMove)
+        return None if (value is None) else decode(value)
+
+    def close(self):
+        """
+        Unmaps every table
+        :return: None
+        """
+        for data in self.files.values():
+            data.close()
+        self.files = {}
+
@@ -0,0 +1,436 @@
+# tbgen.py
+"""
+Generates the endgame tables read by tablebase.py, by retrograde analysis: every position is set up once, mates are
+found, and results are worked backwards from them a ply at a time. Tables with a pawn are split into blocks by the
+pawn's square, a pawn only moves forwards so the blocks can be solved from the promotion rank back, with the four
+files of each rank solved in parallel on a process pool. Tables without a pawn can't be split that way, king and
+piece moves link every block to every other at each ply, so each is solved whole by one worker. They don't depend
+on each other though, so they are all solved at the same time.
+
+    python tbgen.py --dir ChessMKIII/src/assets/tablebases
+    python tbgen.py --probe "8/8/8/8/8/2k5/8/KQ6 w - - 0 1"
+"""
+from bitboard import (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, KNIGHT_ATTACKS, KING_ATTACKS,
+                      PAWN_ATTACKS, bishopAttacks, rookAttacks)
+from tablebase import (MAGIC, TABLES, SPECS, INSUFFICIENT, DEFAULT_DIRECTORY, DRAW, WIN, LOSS, encode, decode,
+                       canonical, Tablebases)
+from multiprocessing import Pool
+import argparse
+import os
+import time
+
+# Tables reached by captures and promotions, which must be generated first
+DEPENDENCIES = {"KQK": (), "KRK": (), "KPK": ("KQK", "KRK"), "KRKP": ("KRK", "KPK")}
+
+
+def backUp(value):
+    """
+    Turns a position's value into the value of the move leading to it, for the player who made the move
+    :param value: int (table byte, for the side to move after the move)
+    :return: int (table byte, for the side that moved, one ply further from mate)
+    """
+    if (value == 0):
+        return 0
+    if (value < 128):  # Opponent wins in 2v - 1, so the mover is mated in 2v
+        return 128 + value
+    return min(value - 127, 127)  # Opponent is mated in 2(v - 128), so the mover mates one ply later
+
+
+def preference(value):
+    """
+    Orders values from the point of view of the side to move, the quickest win first and the slowest loss last
+    :param value: int (table byte)
+    :return: int (higher is better)
+    """
+    if (value == 0):
+        return 0
+    if (value < 128):
+        return 1000 - value
+    return value - 1128
+
+
+# --- Move Generation --- #
+def buildBetween():
+    """
+    :return: arr (64 x 64 bitboards of the squares strictly between two squares on a line, 0 if not on a line)
+    """
+    between = [[0] * 64 for square in range(64)]
+    for start in range(64):
+        for rankStep, fileStep in ((0, 1), (1, 0), (1, 1), (1, -1), (0, -1), (-1, 0), (-1, -1), (-1, 1)):
+            rank, file = divmod(start, 8)
+            squares = 0
+            while True:
+                rank += rankStep
+                file += fileStep
+                if (not (0 <= rank < 8 and 0 <= file < 8)):
+                    break
+                between[start][rank * 8 + file] = squares
+                squares |= 1 << (rank * 8 + file)
+    return between
+
+
+BETWEEN = buildBetween()
+SLIDERS = (BISHOP, ROOK, QUEEN)
+
+
+def pieceAttacks(piece, square, occupied):
+    """
+    :param piece: int (piece code)
+    :param square: int (square of the piece)
+    :param occupied: int (bitboard of all pieces)
+    :return: int (bitboard of attacked squares)
+    """
+    kind = piece % 6
+    if (kind == KING):
+        return KING_ATTACKS[square]
+    if (kind == ROOK):
+        return rookAttacks(square, occupied)
+    if (kind == QUEEN):
+        return rookAttacks(square, occupied) | bishopAttacks(square, occupied)
+    if (kind == KNIGHT):
+        return KNIGHT_ATTACKS[square]
+    if (kind == BISHOP):
+        return bishopAttacks(square, occupied)
+    return PAWN_ATTACKS[WHITE if (piece < 6) else BLACK][square]
+
+
+def inCheck(pieces, white):
+    """
+    :param pieces: arr (list of (piece code, square))
+    :param white: bool (colour of the king to test)
+    :return: bool (True if the king is attacked)
+    """
+    king = KING if (white) else KING + 6
+    occupied = 0
+    for piece, square in pieces:
+        occupied |= 1 << square
+        if (piece == king):
+            kingSquare = square
+    for piece, square in pieces:
+        if ((piece < 6) == white or not EMPTY_BOARD_ATTACKS[piece][square] >> kingSquare & 1):
+            continue
+        # A slider on the right line only attacks if nothing stands in between
+        if (piece % 6 not in SLIDERS or not BETWEEN[square][kingSquare] & occupied):
+            return True
+    return False
+
+
+def legalMoves(pieces, whiteToMove):
+    """
+    Generates the legal moves of a position
+    :param pieces: arr (list of (piece code, square))
+    :param whiteToMove: bool
+    :return: generator (yields (pieces after the move, True if the move is quiet, i.e. neither a capture nor a pawn
+        move, so the material and the pawn square stay the same))
+    """
+    occupied = own = 0
+    for piece, square in pieces:
+        occupied |= 1 << square
+        if ((piece < 6) == whiteToMove):
+            own |= 1 << square
+
+    for index, (piece, square) in enumerate(pieces):
+        if ((piece < 6) != whiteToMove):
+            continue
+        pawn = piece % 6 == PAWN
+        if (pawn):
+            step = -8 if (whiteToMove) else 8
+            targets = PAWN_ATTACKS[WHITE if (whiteToMove) else BLACK][square] & occupied & ~own
+            if (not occupied >> (square + step) & 1):
+                targets |= 1 << (square + step)
+                if (square >> 3 == (6 if (whiteToMove) else 1) and not occupied >> (square + 2 * step) & 1):
+                    targets |= 1 << (square + 2 * step)
+        else:
+            targets = pieceAttacks(piece, square, occupied) & ~own
+
+        others = pieces[:index] + pieces[index + 1:]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            end = bit.bit_length() - 1
+            capture = occupied & bit
+            rest = [other for other in others if (other[1] != end)] if (capture) else others
+            promotions = (piece,)
+            if (pawn and (end < 8 or end >= 56)):
+                promotions = tuple(piece - PAWN + kind for kind in (QUEEN, ROOK, BISHOP, KNIGHT))
+            for newPiece in promotions:
+                child = rest + [(newPiece, end)]
+                if (not inCheck(child, whiteToMove)):
+                    yield child, not (capture or pawn)
+
+
+def unmoves(pieces, whiteToMove):
+    """
+    Generates the positions a quiet move could have come from, the reverse of legalMoves' quiet moves
+    :param pieces: arr (list of (piece code, square))
+    :param whiteToMove: bool (side to move now, the other side made the move)
+    :return: generator (yields pieces before the move, the side that moved is to move in them)
+    """
+    occupied = 0
+    for piece, square in pieces:
+        occupied |= 1 << square
+
+    for index, (piece, square) in enumerate(pieces):
+        if ((piece < 6) == whiteToMove or piece % 6 == PAWN):
+            continue
+        # King, knight and sliding moves are reversible, and the square left behind was empty
+        targets = pieceAttacks(piece, square, occupied) & ~occupied
+        others = pieces[:index] + pieces[index + 1:]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            parent = others + [(piece, bit.bit_length() - 1)]
+            if (not inCheck(parent, whiteToMove)):  # The side not to move can't be in check
+                yield parent
+
+
+EMPTY_BOARD_ATTACKS = [[pieceAttacks(piece, square, 0) for square in range(64)] for piece in range(12)]
+
+
+# --- Generation --- #
+def unknownValue(pieces, whiteToMove, tables):
+    """
+    Values a position whose material has no table (only reached in KRKP after black promotes): mate and stalemate
+    are scored, and so is a capture into a known table that wins, anything else counts as a draw
+    :param pieces: arr (list of (piece code, square))
+    :param whiteToMove: bool
+    :param tables: Tablebases (tables built so far)
+    :return: int (table byte)
+    """
+    best = None
+    for child, quiet in legalMoves(pieces, whiteToMove):
+        if (best is None):
+            best = 0
+        if (not quiet):
+            value = tables.value(child, not whiteToMove)
+            if (value is not None and preference(backUp(value)) > preference(best)):
+                best = backUp(value)
+    if (best is None):
+        return encode(LOSS, 0) if (inCheck(pieces, whiteToMove)) else 0
+    return best if (0 < best < 128) else 0
+
+
+def solveBlock(job):
+    """
+    Solves a block of positions by retrograde analysis. Moves that leave the block (captures and pawn moves) are
+    valued from the tables already built, or the blocks already solved for pawns further up the board. Then mates
+    are worked backwards one ply at a time: a position is won in n if a move reaches one lost in n - 1, and lost in
+    n once every move has been found to reach a win, the slowest in n - 1.
+    :param job: tuple (table name, anchor square of the block or None for the whole table, tables directory, dict of
+        anchor square: bytes of blocks already solved for the same table)
+    :return: tuple (anchor square, bytes of the block's values)
+    """
+    name, anchor, directory, solved = job
+    spec = SPECS[name]
+    tables = Tablebases(directory)
+    base = spec.slot(anchor) if (anchor is not None) else 0
+    size = spec.slotSize if (anchor is not None) else spec.size
+
+    values = bytearray(size)
+    resolved = bytearray(size)
+    counters = bytearray(size)  # Quiet moves whose result is still unknown
+    outside = {}  # Best value of the moves leaving the block, for positions that have any
+    buckets = [[] for dtm in range(257)]  # Positions to resolve, by plies to mate
+
+    def outsideValue(child, whiteToMove):
+        childSpec, index = canonical(child, whiteToMove)
+        if (childSpec is spec):  # A pawn move, into a block already solved
+            return solvedValue(index)
+        if (childSpec is None):
+            return 0 if (index in INSUFFICIENT) else unknownValue(child, whiteToMove, tables)
+        return tables.value(child, whiteToMove)
+
+    def solvedValue(index):
+        slot, offset = divmod(index, spec.slotSize)
+        return solved[(slot >> 2) * 8 + (slot & 3)][offset]
+
+    # --- Moves Out Of The Block, Mates and Stalemates --- #
+    for local in range(size):
+        pieces, whiteToMove = spec.position(base + local)
+        if (len({square for piece, square in pieces}) < len(pieces) or inCheck(pieces, not whiteToMove)):
+            resolved[local] = 1  # Illegal
+            continue
+
+        quiet = 0
+        best = None
+        for child, isQuiet in legalMoves(pieces, whiteToMove):
+            if (isQuiet):
+                quiet += 1
+            else:
+                value = backUp(outsideValue(child, not whiteToMove))
+                if (best is None or preference(value) > preference(best)):
+                    best = value
+
+        if (quiet == 0 and best is None):
+            if (inCheck(pieces, whiteToMove)):
+                buckets[0].append(local)
+            else:
+                resolved[local] = 1  # Stalemate
+            continue
+        counters[local] = quiet
+        if (best is not None):
+            outside[local] = best
+            if (0 < best < 128):
+                buckets[decode(best)[1]].append(local)
+            elif (quiet == 0):
+                if (best >= 128):
+                    buckets[decode(best)[1]].append(local)
+                else:
+                    resolved[local] = 1  # Draw
+
+    # --- Retrograde Analysis --- #
+    for dtm in range(256):
+        for local in buckets[dtm]:
+            if (resolved[local]):
+                continue
+            resolved[local] = 1
+            lost = dtm % 2 == 0
+            values[local] = encode(LOSS if (lost) else WIN, dtm)
+
+            pieces, whiteToMove = spec.position(base + local)
+            for parent in unmoves(pieces, whiteToMove):
+                parentLocal = spec.indexOf(parent, not whiteToMove) - base
+                if (resolved[parentLocal]):
+                    continue
+                if (lost):
+                    buckets[dtm + 1].append(parentLocal)
+                    continue
+                counters[parentLocal] -= 1
+                if (counters[parentLocal] == 0):
+                    best = outside.get(parentLocal)
+                    if (best is None):
+                        buckets[dtm + 1].append(parentLocal)
+                    elif (best >= 128):
+                        buckets[max(dtm + 1, decode(best)[1])].append(parentLocal)
+        buckets[dtm] = None
+
+    tables.close()
+    return anchor, bytes(values)
+
+
+def pawnRows(spec):
+    """
+    :param spec: TableSpec (table with a pawn)
+    :return: arr (rows of the pawn, nearest to promotion first, the order the blocks have to be solved in)
+    """
+    return list(range(1, 7)) if (spec.pawn < 6) else list(range(6, 0, -1))
+
+
+def buildTable(name, directory, pool):
+    """
+    Generates one table and writes it to <directory>/<name>.tb, the tables it depends on must already be there.
+    A table with a pawn is solved a rank at a time, the four files of a rank in parallel. A table without one is
+    solved whole by a single worker, see startPawnless to build several of them at once.
+    :param name: str (material, e.g. "KRKP")
+    :param directory: str (output folder)
+    :param pool: Pool (worker processes)
+    :return: dict (name, size in bytes, seconds, and the number of won, drawn and lost positions)
+    """
+    missing = [other for other in DEPENDENCIES[name] if (not os.path.exists(os.path.join(directory, other + ".tb")))]
+    if (missing):
+        raise FileNotFoundError(f"{name} needs {', '.join(missing)} in {directory}, generate them first")
+
+    spec = SPECS[name]
+    start = time.perf_counter()
+    data = bytearray(spec.size)
+    if (spec.pawn is None):
+        anchor, values = pool.apply(solveBlock, ((name, None, directory, {}),))
+        data[:] = values
+    else:
+        solved = {}
+        for row in pawnRows(spec):
+            # Only the blocks a pawn move from this row can reach are sent along
+            step = -8 if (spec.pawn < 6) else 8
+            jobs = []
+            for file in range(4):
+                square = row * 8 + file
+                ahead = {target: solved[target] for target in (square + step, square + 2 * step) if (target in solved)}
+                jobs.append((name, square, directory, ahead))
+            for square, values in pool.map(solveBlock, jobs):
+                solved[square] = values
+                data[spec.slot(square):spec.slot(square) + spec.slotSize] = values
+
+    return writeTable(name, directory, data, start)
+
+
+def writeTable(name, directory, data, start):
+    """
+    Writes a solved table to <directory>/<name>.tb
+    :param name: str (material)
+    :param directory: str (output folder)
+    :param data: bytes (the table's values)
+    :param start: float (perf_counter time the table was started at)
+    :return: dict (name, size in bytes, seconds, and the number of won, drawn and lost positions)
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name + ".tb"), "wb") as file:
+        file.write(MAGIC)
+        file.write(data)
+
+    wins = sum(data.count(value) for value in range(1, 128))
+    losses = sum(data.count(value) for value in range(128, 256))
+    return {"name": name, "bytes": len(MAGIC) + len(data), "seconds": time.perf_counter() - start,
+            "wins": wins, "losses": losses, "draws": len(data) - wins - losses}
+
+
+def startPawnless(names, directory, pool):
+    """
+    Starts solving every table without a pawn or dependencies at once, one worker each
+    :param names: arr (tables to build)
+    :param directory: str (output folder)
+    :param pool: Pool (worker processes)
+    :return: dict (name: (start time, AsyncResult of solveBlock for the whole table))
+    """
+    started = {}
+    for name in names:
+        if (SPECS[name].pawn is None and not DEPENDENCIES[name]):
+            started[name] = (time.perf_counter(), pool.apply_async(solveBlock, ((name, None, directory, {}),)))
+    return started
+
+
+def generate(names, directory=DEFAULT_DIRECTORY, processes=None):
+    """
+    Generates tables in dependency order, printing each table's size and build time. Pawnless tables are solved
+    alongside each other, their times include any wait for a free worker.
+    :param names: arr (tables to build, in the order of TABLES)
+    :param directory: str (output folder)
+    :param processes: int (pool size, None for one per CPU)
+    :return: arr (list of result dicts from buildTable)
+    """
+    results = []
+    with Pool(processes) as pool:
+        started = startPawnless(names, directory, pool)
+        for name in TABLES:
+            if (name not in names):
+                continue
+            if (name in started):
+                start, solving = started[name]
+                result = writeTable(name, directory, solving.get()[1], start)
+            else:
+                result = buildTable(name, directory, pool)
+            results.append(result)
+            print(f"{name:<5} {result['bytes'] / 1024:9.0f} KiB  {result['seconds']:8.1f}s  "
+                  f"wins {result['wins']}  draws/unused {result['draws']}  losses {result['losses']}", flush=True)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="folder the .tb files are written to")
+    parser.add_argument("--tables", nargs="+", default=list(TABLES), choices=TABLES,
+                        help="tables to generate, the ones they depend on must already be in the folder")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--probe", metavar="FEN", help="look up a position in the tables instead of generating")
+    args = parser.parse_args()
+
+    if (args.probe):
+        from engine import Engine
+        entry = Tablebases(args.dir).probe(Engine(args.probe))
+        if (entry is None):
+            print("not in the tables")
+        else:
+            print(("draw", "win", "loss")[entry[0]] + (f", mate in {entry[1]} plies" if (entry[0] != DRAW) else ""))
+    else:
+        total = time.perf_counter()
+        generate(args.tables, args.dir, args.processes)
+        print(f"total {time.perf_counter() - total:.1f}s")
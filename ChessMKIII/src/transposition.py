@@ -0,0 +1,178 @@
+# transposition.py
+
+# --- Bound Types --- #
+EXACT, LOWER, UPPER = 1, 2, 3  # 0 marks an empty slot
+
+# --- Entry Layout --- #
+# Each slot is two unsigned 64-bit words: the Zobrist key XORed with the data, and the data packed as
+#   bits 0-15 move, 16-35 score (offset to be non-negative), 36-43 depth, 44-45 bound, 46-53 search generation
+# Storing key ^ data means an entry torn by two processes writing the same slot at once fails the key check on
+# probe, so a shared table needs no locks
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 19
+BUCKET_SIZE = 2  # Slot 0 keeps the deepest result, slot 1 always takes the newest
+
+
+def encodeMove(move):
+    """
+    Packs a move into 16 bits: from square, to square and promotion piece, the low bits of Move.moveId
+    :param move: Move
+    :return: int
+    """
+    return move.moveId & 0x7FFF
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table of search results, stored in one flat buffer rather than as Python objects so its memory
+    is set by the megabyte budget and doesn't grow during long sessions. The buffer can be shared memory, so
+    several search processes can use the same table.
+    """
+    def __init__(self, sizeMb=16, shared=False, name=None):
+        """
+        :param sizeMb: int (memory budget in megabytes)
+        :param shared: bool (allocate the table in shared memory, other processes can attach to it by name)
+        :param name: str (name of an existing shared table to attach to, instead of allocating a new one)
+        """
+        self.sizeMb = sizeMb
+        self.buckets = max(1, sizeMb * 1024 * 1024 // (ENTRY_BYTES * BUCKET_SIZE))
+        self.entries = self.buckets * BUCKET_SIZE
+
+        # --- Storage --- #
+        self.sharedMemory = None
+        if (name or shared):
+            from multiprocessing import shared_memory  # Imported here, it is slow to import and rarely needed
+        if (name):
+            self.sharedMemory = shared_memory.SharedMemory(name=name)
+        elif (shared):
+            self.sharedMemory = shared_memory.SharedMemory(create=True, size=ENTRY_BYTES * self.entries)
+        self.owner = shared and not name  # The process that allocated shared memory frees it
+        self.buffer = self.sharedMemory.buf if (self.sharedMemory) else bytearray(ENTRY_BYTES * self.entries)
+        view = memoryview(self.buffer)
+        self.keys = view[:8 * self.entries].cast("Q")
+        self.data = view[8 * self.entries:ENTRY_BYTES * self.entries].cast("Q")
+        self.generation = 0
+
+        # --- Statistics --- #
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0  # Stores that overwrote a different position
+
+    def clear(self):
+        """
+        Empties the table, e.g. between games
+        :return: None
+        """
+        self.buffer[:ENTRY_BYTES * self.entries] = bytes(ENTRY_BYTES * self.entries)
+        self.generation = 0
+        self.resetStats()
+
+    @property
+    def name(self):
+        """
+        Name other processes attach to the shared table with, None if the table isn't shared
+        :return: str
+        """
+        return self.sharedMemory.name if (self.sharedMemory) else None
+
+    def close(self):
+        """
+        Detaches from shared memory, and frees it if this table allocated it. The table can't be used afterwards.
+        :return: None
+        """
+        if (self.sharedMemory):
+            self.keys.release()
+            self.data.release()
+            self.sharedMemory.close()
+            if (self.owner):
+                self.sharedMemory.unlink()
+            self.sharedMemory = None
+
+    def resetStats(self):
+        """
+        Zeroes the hit and store counters
+        :return: None
+        """
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def newSearch(self):
+        """
+        Starts a new search generation, entries from older searches can be replaced even if they are deeper
+        :return: None
+        """
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        """
+        Looks up a position
+        :param key: int (Zobrist key of the position)
+        :return: tuple (depth, bound, score, move) or None if the position isn't stored
+        """
+        self.probes += 1
+        index = (key % self.buckets) * BUCKET_SIZE
+        keys = self.keys
+        for slot in (index, index + 1):
+            data = self.data[slot]
+            if (data and keys[slot] ^ data == key):
+                self.hits += 1
+                return ((data >> 36) & 0xFF, (data >> 44) & 0x3,
+                        ((data >> 16) & 0xFFFFF) - SCORE_OFFSET, data & 0xFFFF)
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Saves a search result. The first slot of the bucket is only overwritten by the same position, a result at
+        least as deep or a result from a newer search. Everything else goes in the second slot.
+        :param key: int (Zobrist key of the position)
+        :param depth: int (depth the position was searched to)
+        :param bound: int (EXACT, LOWER or UPPER)
+        :param score: int (score of the position)
+        :param move: int (best move from encodeMove, 0 if none)
+        :return: None
+        """
+        self.stores += 1
+        index = (key % self.buckets) * BUCKET_SIZE
+        stored = self.data[index]
+        if (stored and self.keys[index] ^ stored != key and depth < (stored >> 36) & 0xFF and
+                (stored >> 46) & 0xFF == self.generation):
+            index += 1
+            stored = self.data[index]
+
+        sameKey = stored and self.keys[index] ^ stored == key
+        if (stored and not sameKey):
+            self.replacements += 1
+        elif (sameKey and not move):
+            move = stored & 0xFFFF  # Keep the old best move rather than forget it
+
+        data = (move | (score + SCORE_OFFSET) << 16 | min(depth, 255) << 36 | bound << 44 | self.generation << 46)
+        self.data[index] = data
+        self.keys[index] = key ^ data
+
+    def hashfull(self):
+        """
+        Fill rate in parts per thousand, sampled from the first thousand slots like the UCI hashfull figure
+        :return: int
+        """
+        sample = min(1000, self.entries)
+        used = sum(1 for i in range(sample) if self.data[i] and (self.data[i] >> 46) & 0xFF == self.generation)
+        return used * 1000 // sample
+
+    def stats(self):
+        """
+        Usage statistics for sizing the table
+        :return: dict
+        """
+        return {
+            "sizeMb": self.sizeMb,
+            "entries": self.entries,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hitRate": self.hits / self.probes if (self.probes) else 0.0,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hashfull": self.hashfull()
+        }
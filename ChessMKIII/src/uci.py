@@ -0,0 +1,350 @@
+# uci.py
+"""
+Universal Chess Interface front end, so the engine can be run by tournament managers and chess GUIs. A thread reads
+standard input and the search runs on a SearchWorker, both feed one event queue that the main thread works
+through, so commands like stop and isready are answered while a search is running.
+"""
+from engine import Engine, START_FEN
+from opponent import Opponent, MATE_SCORE, MATE_BOUND
+from polyglot import OpeningBook
+from tablebase import Tablebases
+from transposition import TranspositionTable
+from worker import SearchWorker
+import queue
+import sys
+import threading
+
+ENGINE_NAME = "ChessMKIII"
+ENGINE_AUTHOR = "ChessMKIII authors"
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MOVES_TO_GO = 30  # Moves the remaining clock time is shared between when the GUI doesn't say
+MOVE_OVERHEAD = 0.05  # Seconds kept back each move for communication lag
+
+
+def formatScore(score):
+    """
+    :param score: int (search score, from the side to move's point of view)
+    :return: str (UCI score, "cp <centipawns>" or "mate <moves>", negative if the side to move is being mated)
+    """
+    if (abs(score) >= MATE_BOUND):
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        return f"mate {moves if (score > 0) else -moves}"
+    return f"cp {score}"
+
+
+def formatInfo(info):
+    """
+    :param info: dict (iteration report, see Opponent.report)
+    :return: str (UCI info line)
+    """
+    return (f"info depth {info['depth']} score {formatScore(info['score'])} nodes {info['nodes']} "
+            f"nps {info['nps']} time {int(info['time'] * 1000)} hashfull {info['hashfull']} pv {' '.join(info['pv'])}")
+
+
+def timeForMove(options, whiteToMove):
+    """
+    Works out how long to think from the go command's clock options
+    :param options: dict (go options, name: int)
+    :param whiteToMove: bool (side to move)
+    :return: float (seconds to search) or None to search until stopped
+    """
+    if ("movetime" in options):
+        return max(options["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+    remaining = options.get("wtime" if (whiteToMove) else "btime")
+    if (remaining is None):
+        return None
+    remaining /= 1000
+    increment = options.get("winc" if (whiteToMove) else "binc", 0) / 1000
+    movesToGo = options.get("movestogo") or MOVES_TO_GO
+    budget = remaining / movesToGo + increment * 0.8
+    return max(min(budget, remaining / 2) - MOVE_OVERHEAD, 0.01)
+
+
+def parseGo(tokens):
+    """
+    :param tokens: arr (words after "go")
+    :return: dict (option name: int, "infinite" and "ponder" map to True)
+    """
+    options = {}
+    index = 0
+    while (index < len(tokens)):
+        name = tokens[index]
+        if (name in ("infinite", "ponder")):
+            options[name] = True
+        elif (name in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes", "mate")
+              and index + 1 < len(tokens)):
+            index += 1
+            try:
+                options[name] = int(tokens[index])
+            except ValueError:
+                pass
+        index += 1
+    return options
+
+
+def parsePosition(tokens):
+    """
+    Builds the position from a position command
+    :param tokens: arr (words after "position")
+    :return: Engine (position with the moves played) or None if the command couldn't be understood
+    """
+    if (not tokens):
+        return None
+    movesAt = tokens.index("moves") if ("moves" in tokens) else len(tokens)
+    if (tokens[0] == "startpos"):
+        fenString = START_FEN
+    elif (tokens[0] == "fen"):
+        fenString = " ".join(tokens[1:movesAt])
+    else:
+        return None
+
+    try:
+        engine = Engine(fenString)
+    except ValueError as error:
+        print(f"info string {error}", flush=True)
+        return None
+    for name in tokens[movesAt + 1:]:
+        move = findMove(engine, name)
+        if (move is None):
+            print(f"info string illegal move {name}", flush=True)
+            break
+        engine.makeMove(move)
+    return engine
+
+
+def findMove(engine, name):
+    """
+    :param engine: Engine (position to play the move in)
+    :param name: str (move in coordinate notation, e.g. "e2e4" or "e7e8q")
+    :return: Move (the matching legal move) or None
+    """
+    name = name.lower()
+    for move in engine.findLegalMoves():
+        if (move.coordinates() == name):
+            return move
+    return None
+
+
+# --- UCI Class --- #
+class UCI:
+    """
+    Speaks UCI on standard input and output. Output only ever comes from the main thread.
+    """
+    def __init__(self, input=sys.stdin):
+        """
+        :param input: file (where commands are read from)
+        """
+        self.input = input
+        self.events = queue.Queue()  # ("line", text) from the reader, ("search",) when the worker has messages
+
+        self.engine = Engine(START_FEN)
+        self.opponent = Opponent(self.engine, hashSizeMb=DEFAULT_HASH_MB)
+        self.worker = SearchWorker(self.opponent, notify=lambda: self.events.put(("search",)))
+
+        self.searchId = None  # Id of the search whose best move hasn't been sent yet
+        self.infinite = False  # Hold the best move until stop, as go infinite requires
+        self.heldMove = None  # Best move found by an infinite search that hasn't been stopped yet
+        self.running = True
+
+    @staticmethod
+    def send(line):
+        """
+        :param line: str (line to send to the GUI)
+        :return: None
+        """
+        print(line, flush=True)
+
+    def readInput(self):
+        """
+        Reader thread, passes every line to the main thread, and quit when input ends
+        :return: None
+        """
+        for line in self.input:
+            self.events.put(("line", line.strip()))
+        self.events.put(("line", "quit"))
+
+    def run(self):
+        """
+        Main loop, handles commands and search messages until quit
+        :return: None
+        """
+        threading.Thread(target=self.readInput, name="UCIReader", daemon=True).start()
+        while (self.running):
+            event = self.events.get()
+            if (event[0] == "line"):
+                self.handleCommand(event[1])
+            else:
+                for message in self.worker.poll():
+                    self.handleSearchMessage(message)
+        self.worker.close()
+
+    # --- Commands --- #
+    def handleCommand(self, line):
+        """
+        :param line: str (one line of input)
+        :return: None
+        """
+        tokens = line.split()
+        if (not tokens):
+            return
+        command, arguments = tokens[0], tokens[1:]
+
+        if (command == "uci"):
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif (command == "isready"):
+            self.send("readyok")
+        elif (command == "ucinewgame"):
+            self.cancelSearch()
+            self.worker.newGame()
+            self.engine = Engine(START_FEN)
+        elif (command == "setoption"):
+            self.setOption(arguments)
+        elif (command == "position"):
+            engine = parsePosition(arguments)
+            if (engine is not None):
+                self.engine = engine
+        elif (command == "go"):
+            self.go(parseGo(arguments))
+        elif (command == "stop"):
+            self.stop()
+        elif (command == "ponderhit"):
+            self.stop()
+        elif (command == "quit"):
+            self.cancelSearch()
+            self.running = False
+
+    def setOption(self, arguments):
+        """
+        :param arguments: arr (words after "setoption", e.g. "name Hash value 64")
+        :return: None
+        """
+        if ("name" not in arguments or "value" not in arguments):
+            return
+        name = " ".join(arguments[arguments.index("name") + 1:arguments.index("value")]).lower()
+        value = " ".join(arguments[arguments.index("value") + 1:])
+        if (name == "hash"):
+            try:
+                sizeMb = min(max(int(value), 1), MAX_HASH_MB)
+            except ValueError:
+                return
+            self.cancelSearch()
+            self.opponent.table = TranspositionTable(sizeMb)
+        elif (name == "bookfile"):
+            self.cancelSearch()
+            if (self.opponent.book):
+                self.opponent.book.close()
+            self.opponent.book = None
+            if (value and value != "<empty>"):
+                try:
+                    self.opponent.book = OpeningBook(value)
+                except OSError as error:
+                    self.send(f"info string could not open book: {error}")
+        elif (name == "tablebasepath"):
+            self.cancelSearch()
+            if (self.opponent.tablebases):
+                self.opponent.tablebases.close()
+            self.opponent.tablebases = None
+            if (value and value != "<empty>"):
+                try:
+                    self.opponent.tablebases = Tablebases(value)
+                except (OSError, ValueError) as error:
+                    self.send(f"info string could not open tablebases: {error}")
+                else:
+                    self.send(f"info string {len(self.opponent.tablebases)} tablebases loaded")
+
+    def go(self, options):
+        """
+        Starts searching the current position, the best move is sent when the search finishes
+        :param options: dict (go options)
+        :return: None
+        """
+        self.cancelSearch()
+        self.infinite = bool(options.get("infinite") or options.get("ponder"))
+        self.opponent.timeLimit = None if (self.infinite) else timeForMove(options, self.engine.whiteToMove)
+        self.opponent.nodeLimit = options.get("nodes")
+        self.opponent.maxDepth = options.get("depth", 64)
+        if (options.get("mate")):
+            self.opponent.maxDepth = min(self.opponent.maxDepth, options["mate"] * 2)
+        self.searchId = self.worker.start(self.engine)
+
+    def stop(self):
+        """
+        Ends the running search, its best move is still sent
+        :return: None
+        """
+        if (self.searchId is None):
+            return
+        self.infinite = False
+        if (self.heldMove is not None):
+            self.sendBestMove(self.heldMove)
+        else:
+            self.worker.stop()
+
+    def cancelSearch(self):
+        """
+        Drops the running search. UCI expects a best move for every go, so one is still sent if it was owed.
+        :return: None
+        """
+        if (self.searchId is None):
+            return
+        self.stop()
+        while (self.searchId is not None):
+            for message in self.worker.poll():
+                self.handleSearchMessage(message)
+            if (self.searchId is not None):
+                self.waitForSearch()
+
+    def waitForSearch(self):
+        """
+        Blocks until the worker has something to say, commands arriving meanwhile are put back
+        :return: None
+        """
+        held = []
+        while True:
+            event = self.events.get()
+            if (event[0] == "search"):
+                break
+            held.append(event)
+        for event in held:
+            self.events.put(event)
+
+    # --- Search Messages --- #
+    def handleSearchMessage(self, message):
+        """
+        :param message: tuple (message from the worker)
+        :return: None
+        """
+        if (message[1] != self.searchId):
+            return
+        if (message[0] == "info"):
+            self.send(formatInfo(message[2]))
+        elif (message[0] == "error"):
+            print(message[2], file=sys.stderr, flush=True)
+            self.send(f"info string search failed: {message[2].strip().splitlines()[-1]}")
+        elif (message[0] == "move"):
+            move = message[2]
+            if (self.infinite):
+                self.heldMove = move
+            else:
+                self.sendBestMove(move)
+
+    def sendBestMove(self, move):
+        """
+        :param move: Move (best move, False if there were no legal moves)
+        :return: None
+        """
+        self.send(f"bestmove {move.coordinates() if (move) else '0000'}")
+        self.searchId = None
+        self.heldMove = None
+        self.infinite = False
+
+
+if __name__ == '__main__':
+    UCI().run()
@@ -0,0 +1,165 @@
+# worker.py
+from engine import Engine
+import queue
+import threading
+
+
+def snapshot(engine):
+    """
+    Copies a position, including the moves that led to it so the copy can still spot repetitions
+    :param engine: Engine (position to copy)
+    :return copy: Engine (independent engine in the same position)
+    """
+    copy = Engine(engine.fenString)
+    for move in engine.moveLog:
+        copy.makeMove(move)
+    return copy
+
+
+class SearchWorker:
+    """
+    Runs an opponent's search on a background thread so the caller never blocks. Each search works on a snapshot
+    of the position and reports through a queue, every message is tagged with the id start() returned so results
+    from a cancelled search can be told apart and thrown away.
+    Messages from poll():
+    - ("info", searchId, info dict): a completed search iteration, see Opponent.report
+    - ("move", searchId, move, key): the chosen move (False if there were none, or the search failed) and the Zobrist
+      key it was found for
+    - ("error", searchId, traceback str): the search raised, sent just before its ("move", searchId, False, key) so
+      callers waiting on the move still hear back
+    """
+    def __init__(self, opponent, notify=None):
+        """
+        :param opponent: Opponent (searches with its own settings, its engine is swapped for each snapshot)
+        :param notify: function (called from the worker thread whenever a message is queued, e.g. to wake an event
+            loop, None to rely on polling)
+        """
+        self.opponent = opponent
+        self.notify = notify
+
+        self.searchId = 0  # Id of the newest search, anything tagged with an older id is stale
+        self.stopId = 0  # Id of the last search asked to stop early
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.loop, name="SearchWorker", daemon=True)
+        self.thread.start()
+
+    def start(self, engine):
+        """
+        Starts searching the engine's current position, cancelling any search still running
+        :param engine: Engine (position to search, it is copied so the caller can keep using it)
+        :return: int (id the results of this search will be tagged with)
+        """
+        with self.lock:
+            self.searchId += 1
+            self.opponent.stop()
+            searchId = self.searchId
+        self.requests.put((searchId, snapshot(engine)))
+        return searchId
+
+    def cancel(self):
+        """
+        Stops the running search, its result is never delivered
+        :return: None
+        """
+        with self.lock:
+            self.searchId += 1
+            self.opponent.stop()
+
+    def stop(self):
+        """
+        Asks the running search to finish now, unlike cancel its best move so far is still delivered
+        :return: None
+        """
+        with self.lock:
+            self.stopId = self.searchId
+            self.opponent.stop()
+
+    def newGame(self):
+        """
+        Cancels any search and clears what the opponent learned from the previous game
+        :return: None
+        """
+        self.cancel()
+        self.requests.put("newGame")
+
+    def poll(self):
+        """
+        Takes every message queued since the last poll, without waiting. Stale messages are dropped here.
+        :return: arr (list of message tuples)
+        """
+        messages = []
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                return messages
+            if (message[1] == self.searchId):
+                messages.append(message)
+
+    def close(self):
+        """
+        Cancels any search and stops the thread
+        :return: None
+        """
+        self.cancel()
+        self.requests.put(None)
+        self.thread.join()
+
+    # --- Worker Thread --- #
+    def send(self, message):
+        """
+        Queues a message for the caller
+        :param message: tuple
+        :return: None
+        """
+        self.results.put(message)
+        if (self.notify):
+            self.notify()
+
+    def progress(self, searchId, info):
+        """
+        Passes on a completed iteration. A cancel or stop that lands just as a search starts can be undone by the
+        search resetting its stop flag, so a search that has gone stale or been stopped is stopped again here.
+        :param searchId: int (id of the search reporting)
+        :param info: dict (iteration report)
+        :return: None
+        """
+        if (searchId != self.searchId):
+            self.opponent.stop()
+            return
+        if (searchId == self.stopId):
+            self.opponent.stop()
+        self.send(("info", searchId, info))
+
+    def loop(self):
+        """
+        Runs searches one at a time until closed
+        :return: None
+        """
+        while True:
+            request = self.requests.get()
+            if (request is None):
+                return
+            if (request == "newGame"):
+                self.opponent.newGame()
+                continue
+
+            searchId, engine = request
+            with self.lock:
+                if (searchId != self.searchId):  # Cancelled before it started
+                    continue
+                self.opponent.engine = engine
+                self.opponent.stopped = False
+                self.opponent.onInfo = lambda info: self.progress(searchId, info)
+
+            key = engine.hash
+            try:
+                move = self.opponent.getMove(engine.findLegalMoves())
+            except Exception:  # Keep the thread alive, and the caller from waiting forever on a move
+                import traceback  # Imported here, it is slow to import and only a failed search needs it
+                self.send(("error", searchId, traceback.format_exc()))
+                move = False
+            self.send(("move", searchId, move, key))
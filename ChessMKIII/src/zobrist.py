@@ -0,0 +1,39 @@
+# zobrist.py
+"""
+Random keys for Zobrist hashing. A position's hash is the XOR of the key for every (piece, square) on the board,
+the key for the castling rights, the key for the en passant file (if there is an en passant square) and SIDE_KEY
+if black is to move. Making a move only changes a few of those terms, so the hash can be updated incrementally.
+
+The pawn key is the XOR of the piece keys of the pawns alone, it identifies the pawn structure for the pawn hash
+table (see pawns.py).
+"""
+
+
+def splitmix64(seed, count):
+    """
+    Generates pseudo random 64-bit numbers with SplitMix64, small enough to inline rather than importing the random
+    module, which costs more at start up than building every table here
+    :param seed: int (starting state)
+    :param count: int (number of values)
+    :return: arr (list of 64-bit ints)
+    """
+    values = []
+    for i in range(count):
+        seed = (seed + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = seed
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        values.append(z ^ (z >> 31))
+    return values
+
+
+# Fixed seed, so hashes are the same from run to run and between processes
+_keys = splitmix64(0x5A0B1257, 12 * 64 + 16 + 8 + 1)
+
+PIECE_KEYS = [_keys[piece * 64:piece * 64 + 64] for piece in range(12)]
+CASTLING_KEYS = _keys[768:784]
+EN_PASSANT_KEYS = _keys[784:792]
+SIDE_KEY = _keys[792]
+
+# Piece keys with every non-pawn row zeroed (and a zero row for EMPTY), so the pawn key is updated without a branch
+PAWN_KEYS = [PIECE_KEYS[piece] if (piece % 6 == 0) else [0] * 64 for piece in range(12)] + [[0] * 64]
@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The engine's modules import each other by name from src, as they do when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
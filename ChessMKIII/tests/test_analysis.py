@@ -0,0 +1,36 @@
+# test_analysis.py
+from analysis import analyseFile
+from pgn import readGames
+
+PGN = """[Event "first"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 *
+
+[Event "bad fen"]
+[SetUp "1"]
+[FEN "8/8/8 w - - 0 1"]
+[Result "*"]
+
+1. Kb2 *
+
+[Event "third"]
+[Result "*"]
+
+1. d4 d5 *
+"""
+
+OPTIONS = {"timeLimit": None, "nodeLimit": 200, "maxDepth": 2, "hashSizeMb": 1}
+
+
+def testBadFenDoesNotStopTheFile(tmp_path):
+    inputPath, outputPath = tmp_path / "in.pgn", tmp_path / "out.pgn"
+    inputPath.write_text(PGN)
+
+    totals = analyseFile(str(inputPath), str(outputPath), OPTIONS, processes=2, inFlight=2)
+
+    assert (totals["games"], totals["errors"]) == (3, 1)
+    games = list(readGames(str(outputPath)))
+    assert [game["headers"]["Event"] for game in games] == ["first", "bad fen", "third"]
+    assert all("[%eval" in comment for comment in games[0]["comments"] + games[2]["comments"])
+    assert games[1]["moves"] == ["Kb2"] and games[1]["comments"] == [None]
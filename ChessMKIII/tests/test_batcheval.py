@@ -0,0 +1,33 @@
+# test_batcheval.py
+import pytest
+
+pytest.importorskip("numpy")  # Optional dependency, see batcheval.py
+from batcheval import evaluateBatch, fenCodes, randomPositions, scalarEvaluate, toTensor
+from engine import Engine, START_FEN
+
+
+def testBatchMatchesScalar():
+    positions = randomPositions(300, seed=1)
+    assert evaluateBatch(positions).tolist() == scalarEvaluate(positions)
+
+
+def testEnginesAndFensEncodeTheSame():
+    positions = randomPositions(20, seed=2)
+    fromFens, fenSides = toTensor(positions)
+    fromEngines, engineSides = toTensor([Engine(fenString) for fenString in positions])
+    assert (fromFens == fromEngines).all() and (fenSides == engineSides).all()
+
+
+@pytest.mark.parametrize("placements", [
+    # 63 and 65 squares, together the right total
+    ("rnbqkbnr/ppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR", "rnbqkbnr/ppppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"),
+    # 64 squares in one FEN, but a 9 square rank beside a 7 square one
+    ("rnbqkbnr/ppppppppp/7/8/8/8/PPPPPPPP/RNBQKBNR",),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP",),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX",),
+])
+def testBadPlacementRaises(placements):
+    fenStrings = [START_FEN] + [placement + " w - - 0 1" for placement in placements]
+    with pytest.raises(ValueError, match="Bad piece placement") as error:
+        fenCodes(fenStrings)
+    assert fenStrings[1] in str(error.value)
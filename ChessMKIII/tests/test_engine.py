@@ -0,0 +1,37 @@
+# test_engine.py
+from engine import Engine, START_FEN
+import pytest
+
+BAD_FENS = [
+    ("garbage", "at least 4 fields"),
+    ("8/8/8 w - - 0 1", "8 ranks"),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNZ w KQkq - 0 1", "Bad rank"),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1", "Bad side to move"),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e9 0 1", "Bad en passant"),
+    ("8/8/8/8/8/8/8/K7 w - - 0 1", "one black king, not 0"),
+    ("kk6/8/8/8/8/8/8/K7 w - - 0 1", "one black king, not 2"),
+    ("k7/8/8/8/8/8/8/8 b - - 0 1", "one white king, not 0"),
+    ("7k/8/6KQ/8/8/8/8/8 w - - 0 1", "not to move is in check"),
+]
+
+
+@pytest.mark.parametrize("fenString, message", BAD_FENS)
+def testBadFenRaisesValueError(fenString, message):
+    with pytest.raises(ValueError, match=message):
+        Engine(fenString)
+
+
+def testLoadFenAfterBadFen():
+    engine = Engine()
+    with pytest.raises(ValueError):
+        engine.loadFEN("7k/8/6KQ/8/8/8/8/8 w - - 0 1")
+    engine.loadFEN("7k/8/6KQ/8/8/8/8/8 b - - 0 1")  # The same position with the checked side to move is fine
+    assert engine.inCheck()
+    assert sorted(move.coordinates() for move in engine.findLegalMoves()) == ["h8g8"]
+    engine.loadFEN(START_FEN)
+    assert len(engine.findLegalMoves()) == 20 and engine.toFEN() == START_FEN
+
+
+def testEpdFieldsLoad():
+    engine = Engine("1k1r4/pp1b1R2/3q2pp/4p3/2B5/4Q3/PPP2B2/2K5 b - - bm Qd1+; id \"BK.01\";")
+    assert not engine.whiteToMove and (engine.halfmoveClock, engine.fullmoveNumber) == (0, 1)
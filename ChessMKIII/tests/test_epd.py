@@ -0,0 +1,33 @@
+# test_epd.py
+from epd import SuiteRunner, parseEPD
+import json
+
+SUITE = """# Searched, unreadable, unplayable and only-move positions
+rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - bm e4 d4 Nf3 c4; id "start";
+garbage
+8/8/8/8/8/8/8/K7 w - - bm Ka2; id "no king";
+k7/8/8/8/8/8/1r6/K7 w - - bm Kxb2; id "only move";
+"""
+
+
+def testParseEPD():
+    fenString, operations = parseEPD('1k1r4/pp1b1R2/3q2pp/4p3/2B5/4Q3/PPP2B2/2K5 b - - bm Qd1+; id "BK.01"; hmvc 3;')
+    assert fenString == "1k1r4/pp1b1R2/3q2pp/4p3/2B5/4Q3/PPP2B2/2K5 b - - 3 1"
+    assert operations == {"bm": ["Qd1+"], "id": ["BK.01"], "hmvc": ["3"]}
+
+
+def testBadLinesDoNotStopTheSuite(tmp_path):
+    suitePath, outputPath = tmp_path / "suite.epd", tmp_path / "results.jsonl"
+    suitePath.write_text(SUITE)
+
+    summary = SuiteRunner(timeLimit=None, maxDepth=2).run(str(suitePath), str(outputPath))
+
+    results = [json.loads(line) for line in outputPath.read_text().splitlines()]
+    assert [result["id"] for result in results] == ["start", "3", "no king", "only move"]
+    assert (summary["positions"], summary["errors"]) == (4, 2)
+    assert "at least 4 fields" in results[1]["error"] and "black king" in results[2]["error"]
+    assert not results[1]["solved"] and not results[2]["solved"]
+
+    assert results[0]["error"] is None and results[0]["depth"] == 2
+    # Played without searching, so it reports no depth rather than the previous position's
+    assert results[3]["solved"] and results[3]["move"] == "a1b2" and results[3]["depth"] == 0
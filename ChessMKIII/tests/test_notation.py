@@ -0,0 +1,47 @@
+# test_notation.py
+from engine import Engine, START_FEN
+from notation import toSAN, parseSAN
+import pytest
+
+# Castling both ways, promotions with and without capture, en passant, and pieces that need disambiguating
+POSITIONS = [
+    START_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "7k/8/8/1N3N2/8/1N3N2/8/K7 w - - 0 1",
+    "4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1",
+]
+
+
+@pytest.mark.parametrize("fenString", POSITIONS)
+def testSanRoundTrip(fenString):
+    engine = Engine(fenString)
+    legalMoves = engine.findLegalMoves()
+    names = [toSAN(engine, move, legalMoves) for move in legalMoves]
+    assert len(set(names)) == len(names)
+    for move, name in zip(legalMoves, names):
+        assert parseSAN(engine, name, legalMoves) == move
+    assert engine.toFEN() == Engine(fenString).toFEN()  # toSAN leaves the position as it found it
+
+
+def testSanNames():
+    engine = Engine("7k/8/8/1N3N2/8/1N3N2/8/K7 w - - 0 1")
+    names = {toSAN(engine, move) for move in engine.findLegalMoves()}
+    assert {"Nb3d4", "Nb5d4", "Nbd2", "N3h4", "Ng7"} <= names
+    engine = Engine("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1")
+    names = {toSAN(engine, move) for move in engine.findLegalMoves()}
+    assert {"gxf1=Q+", "g1=N+", "gxh1=R", "Nab6"} <= names
+    engine = Engine("4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    assert {"O-O", "O-O-O", "Ra8+"} <= {toSAN(engine, move) for move in engine.findLegalMoves()}
+
+
+def testParseSanTolerance():
+    engine = Engine()
+    assert parseSAN(engine, "e2e4").coordinates() == "e2e4"
+    assert parseSAN(engine, "Nf3!?").coordinates() == "g1f3"
+    assert parseSAN(engine, "e5") is None  # Not legal
+    engine = Engine("7k/8/8/1N3N2/8/1N3N2/8/K7 w - - 0 1")
+    assert parseSAN(engine, "Nd4") is None  # Ambiguous
+    assert parseSAN(engine, "Nb3d4").coordinates() == "b3d4"
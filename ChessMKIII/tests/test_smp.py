@@ -0,0 +1,19 @@
+# test_smp.py
+from engine import Engine
+from smp import parallelSearch
+import time
+
+
+def testLastMessagesBeforeExitAreRead():
+    reports = []
+
+    def onInfo(index, info):
+        # Hold the main process up on the first report, so the workers finish and exit with messages still queued
+        if (not reports):
+            time.sleep(1.0)
+        reports.append(info["depth"])
+
+    move, info = parallelSearch(Engine(), workers=2, timeLimit=None, maxDepth=3, hashSizeMb=1, onInfo=onInfo)
+    assert info["depth"] == 3
+    assert move.coordinates() == info["pv"][0]
+    assert reports[-1] == 3
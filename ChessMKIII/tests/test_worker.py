@@ -0,0 +1,46 @@
+# test_worker.py
+from engine import Engine
+from opponent import Opponent
+from worker import SearchWorker
+
+
+def waitForMove(worker, searchId, timeout=10):
+    """
+    Reads the worker's messages for one search
+    :param worker: SearchWorker
+    :param searchId: int (search to wait on)
+    :param timeout: float (seconds to wait for each message)
+    :return: arr (messages of the search, up to and including its move)
+    """
+    messages = []
+    while (not messages or messages[-1][0] != "move"):
+        message = worker.results.get(timeout=timeout)
+        if (message[1] == searchId):
+            messages.append(message)
+    return messages
+
+
+def testFailedSearchStillSendsAMove():
+    engine = Engine()
+    opponent = Opponent(engine, timeLimit=None, maxDepth=1, onInfo=lambda info: None)
+    search = opponent.getMove
+    failures = [ValueError("negative shift count")]
+
+    def getMove(legal):
+        if (failures):
+            raise failures.pop()
+        return search(legal)
+    opponent.getMove = getMove
+
+    worker = SearchWorker(opponent)
+    try:
+        messages = waitForMove(worker, worker.start(engine))
+        assert [message[0] for message in messages] == ["error", "move"]
+        assert "ValueError: negative shift count" in messages[0][2]
+        assert messages[1][2] is False and messages[1][3] == engine.hash
+
+        # The thread survived and searches the next request as usual
+        move = waitForMove(worker, worker.start(engine))[-1][2]
+        assert move in engine.findLegalMoves()
+    finally:
+        worker.close()